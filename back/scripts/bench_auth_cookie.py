@@ -0,0 +1,95 @@
+"""
+認証 Cookie (ad) の gzip 形式と b1 形式のサイズとエンコード・デコード時間を比較する
+
+    python scripts/bench_auth_cookie.py
+    python scripts/bench_auth_cookie.py --number 20000
+
+Cognito のトークン (RS256 のアクセストークンと JWE のリフレッシュトークン)、
+ローカル認証のトークン (HS256、リフレッシュトークンなし)、MFA チャレンジ中の
+セッションの 3 種類を、router と同じキーと値で作る。トークンの中身はランダムな
+base64url で、実際のトークンと同じく gzip ではほとんど縮まない。
+b1 形式で往復した値が gzip 形式と同じになることも確認する。
+"""
+
+import argparse
+import base64
+import random
+import sys
+import timeit
+from collections.abc import Callable
+from pathlib import Path
+
+# プロジェクトのパスを追加
+sys.path.append((Path(__file__).resolve().parent.parent / "src").__str__())
+
+from tuto.auth import cookie_codec
+
+KEY = cookie_codec.derive_key("bench")
+
+
+def token(rng: random.Random, *sizes: int) -> str:
+    """ランダムなバイト列 (各 sizes バイト) の base64url を "." でつないだトークン"""
+    return ".".join(
+        base64.urlsafe_b64encode(rng.randbytes(size)).rstrip(b"=").decode("ascii")
+        for size in sizes
+    )
+
+
+def samples() -> dict[str, dict[str, str]]:
+    rng = random.Random(0)
+    return {
+        "cognito": {
+            "at": token(rng, 60, 600, 256),
+            "rt": token(rng, 90, 192, 1200, 12, 16),
+            "tt": "Bearer",
+            "exp": "3600",
+            "iss": "1760000000.123456",
+        },
+        "local": {
+            "at": token(rng, 27, 90, 32),
+            "tt": "bearer",
+            "exp": "720",
+            "iss": "1760000000.123456",
+        },
+        "challenge": {
+            "user": "user000123@example.com",
+            "sess": token(rng, 700),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    def best_us(func: Callable[[], object]) -> float:
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+        return best / args.number * 1_000_000
+
+    print(
+        f"{'cookie':>10} {'gzip B':>7} {'b1 B':>6} "
+        f"{'gzip dec us':>12} {'b1 dec us':>10} {'gzip enc us':>12} {'b1 enc us':>10}"
+    )
+    for name, data in samples().items():
+        legacy = cookie_codec.encode_legacy(data)
+        binary = cookie_codec.encode_binary(data, KEY)
+        assert cookie_codec.decode_binary(binary, KEY) == data
+        assert cookie_codec.decode_legacy(legacy) == data
+
+        timings = [
+            best_us(lambda legacy=legacy: cookie_codec.decode_legacy(legacy)),
+            best_us(lambda binary=binary: cookie_codec.decode_binary(binary, KEY)),
+            best_us(lambda data=data: cookie_codec.encode_legacy(data)),
+            best_us(lambda data=data: cookie_codec.encode_binary(data, KEY)),
+        ]
+        print(
+            f"{name:>10} {len(legacy):>7} {len(binary):>6} "
+            f"{timings[0]:>12.2f} {timings[1]:>10.2f} "
+            f"{timings[2]:>12.2f} {timings[3]:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
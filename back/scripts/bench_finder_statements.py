@@ -0,0 +1,110 @@
+"""
+Finder の SQL 準備コストを比較するマイクロベンチマーク (DB 接続不要)
+
+    python scripts/bench_finder_statements.py
+    python scripts/bench_finder_statements.py --number 100000
+
+legacy は StatementRegistry 導入前と同じく、呼び出しごとに remove_spaces と
+件数 SQL の導出 (re.findall / re.sub) を行い text() を作る。registry は
+StatementRegistry から準備済みの TextClause を取得する。
+"""
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+# プロジェクトのパスを追加
+sys.path.append((Path(__file__).resolve().parent.parent / "src").__str__())
+
+from sqlalchemy import text
+
+from tuto.core.finder import StatementRegistry, remove_spaces
+
+GET_BY_ID_SQL = """
+    SELECT
+        u.id,
+        u.username,
+        u.email,
+        u.nickname,
+        u.is_active,
+        u.created_at,
+        u.updated_at
+    FROM
+        user u
+    WHERE
+        u.id = :pk
+    AND u.deleted_at IS NULL
+"""
+
+FIND_SQL = """
+    SELECT
+        u.id,
+        u.username,
+        u.email,
+        u.nickname,
+        u.is_active,
+        u.created_at,
+        u.updated_at
+    FROM
+        user u
+    WHERE
+        u.deleted_at IS NULL
+"""
+
+PAGE_SUFFIX = """
+    ORDER BY u.id DESC
+    LIMIT :offset, :limit
+"""
+
+
+def legacy_get_by_id() -> None:
+    text(remove_spaces(GET_BY_ID_SQL))
+
+
+def legacy_find() -> None:
+    count_sql = re.findall(
+        r"SELECT(?:.+)FROM(?:.+)(?:WHERE(?:.*))?",
+        FIND_SQL,
+        flags=re.IGNORECASE | re.DOTALL,
+    )[0]
+    count_sql = re.sub(
+        r"SELECT(.+)FROM",
+        "SELECT COUNT(1) FROM",
+        count_sql,
+        flags=re.IGNORECASE | re.DOTALL,
+    )
+    text(remove_spaces(count_sql))
+    text(remove_spaces(FIND_SQL + PAGE_SUFFIX))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    statements = StatementRegistry()
+
+    def registry_get_by_id() -> None:
+        statements.get(GET_BY_ID_SQL)
+
+    def registry_find() -> None:
+        statements.count(FIND_SQL)
+        # UserFinder.find も呼び出しごとに SQL を連結してから取得する
+        statements.get(FIND_SQL + PAGE_SUFFIX)
+
+    print(f"{'case':<24} {'us/call':>10}")
+    for name, func in (
+        ("legacy get_by_id", legacy_get_by_id),
+        ("registry get_by_id", registry_get_by_id),
+        ("legacy find", legacy_find),
+        ("registry find", registry_find),
+    ):
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+        print(f"{name:<24} {best / args.number * 1_000_000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
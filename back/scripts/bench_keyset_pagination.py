@@ -0,0 +1,141 @@
+"""
+UserFinder.find のページング性能を offset 方式と cursor 方式で比較するベンチマーク
+
+    python scripts/bench_keyset_pagination.py --seed 200000
+    python scripts/bench_keyset_pagination.py --depths 0 1000 10000 100000
+    python scripts/bench_keyset_pagination.py --cleanup
+
+接続先は ASYNC_DB_URL で指定する。--seed で作成したユーザは username が
+bench_ で始まり、--cleanup で削除できる。
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+# プロジェクトのパスを追加
+sys.path.append((Path(__file__).resolve().parent.parent / "src").__str__())
+
+from sqlalchemy import text
+
+from tuto.core.user.finder import UserFinder
+from tuto.datasource.database import async_engine, async_session
+
+SEED_BATCH_SIZE = 5000
+
+
+async def seed(count: int) -> None:
+    """ベンチマーク用のユーザを作成する"""
+    sql = text(
+        """
+        INSERT INTO user (
+            username, email, nickname, is_active, auth_method,
+            password_is_temporary, created_at, updated_at
+        ) VALUES (
+            :username, :email, :nickname, 1, 'password',
+            0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+        )
+        """
+    )
+    async with async_session() as asession:
+        result = await asession.execute(
+            text("SELECT COUNT(1) FROM user WHERE username LIKE 'bench!_%' ESCAPE '!'")
+        )
+        first = result.scalar_one()
+        for batch_start in range(first, first + count, SEED_BATCH_SIZE):
+            batch_end = min(batch_start + SEED_BATCH_SIZE, first + count)
+            await asession.execute(
+                sql,
+                [
+                    {
+                        "username": f"bench_{i:08d}",
+                        "email": f"bench_{i:08d}@example.com",
+                        "nickname": f"bench {i}",
+                    }
+                    for i in range(batch_start, batch_end)
+                ],
+            )
+            await asession.commit()
+    await async_engine.dispose()
+    print(f"seeded {count} users")
+
+
+async def cleanup() -> None:
+    async with async_session() as asession:
+        await asession.execute(
+            text("DELETE FROM user WHERE username LIKE 'bench!_%' ESCAPE '!'")
+        )
+        await asession.commit()
+    await async_engine.dispose()
+    print("removed benchmark users")
+
+
+async def measure(finder: UserFinder, repeat: int, **kwargs: Any) -> float:
+    """UserFinder.find の所要時間の中央値 (ms)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await finder.find({}, ["id", "ASC"], **kwargs)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+async def run(depths: list[int], page_size: int, repeat: int) -> None:
+    async with async_session() as asession:
+        finder = UserFinder(asession)
+        total = (await finder.find({}, ["id", "ASC"], [0, 0])).total
+        print(f"total rows: {total}, page size: {page_size}, repeat: {repeat}")
+        print(f"{'depth':>10} {'offset ms':>10} {'cursor ms':>10}")
+
+        for depth in depths:
+            if depth >= total:
+                print(f"{depth:>10} {'-':>10} {'-':>10}  (beyond {total} rows)")
+                continue
+
+            query_range = [depth, depth + page_size - 1]
+            offset_ms = await measure(finder, repeat, query_range=query_range)
+
+            # 直前のページの末尾から cursor を得る (計測対象外)
+            if depth == 0:
+                cursor_ms = await measure(finder, repeat, query_range=query_range)
+            else:
+                previous = await finder.find({}, ["id", "ASC"], [depth - 1, depth - 1])
+                cursor_ms = await measure(
+                    finder,
+                    repeat,
+                    query_range=[0, page_size - 1],
+                    cursor=previous.next_cursor,
+                )
+            print(f"{depth:>10} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--depths",
+        type=int,
+        nargs="+",
+        default=[0, 1_000, 10_000, 50_000, 100_000, 200_000],
+    )
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0, help="作成するユーザ数")
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        asyncio.run(cleanup())
+        return
+    if args.seed:
+        asyncio.run(seed(args.seed))
+    asyncio.run(run(args.depths, args.page_size, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
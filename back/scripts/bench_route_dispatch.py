@@ -0,0 +1,117 @@
+"""
+バージョン付きルータのルート解決を比較する合成ベンチマーク (DB 接続不要)
+
+    python scripts/bench_route_dispatch.py
+    python scripts/bench_route_dispatch.py --versions 10 --routes 50 --number 5000
+
+linear は RouteIndex 導入前と同じく self.routes を先頭から順に matches() する。
+indexed は RouteIndex.resolve() で候補を絞ってから matches() する。
+ルートの半数はパスパラメータ付き。パスバージョニング (requested_version なし) と
+ヘッダバージョニング (requested_version あり) の両方を計測する。
+"""
+
+import argparse
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Any
+
+# プロジェクトのパスを追加
+sys.path.append((Path(__file__).resolve().parent.parent / "src").__str__())
+
+from fastapi import APIRouter
+from starlette.routing import BaseRoute, Match
+
+from tuto.versioning.dispatch import RouteIndex
+from tuto.versioning.routing import HeaderVersionedAPIRouter
+
+
+async def endpoint() -> None:
+    pass
+
+
+def build_router(versions: int, routes: int) -> HeaderVersionedAPIRouter:
+    root = HeaderVersionedAPIRouter(default_version="0.0")
+    for v in range(versions):
+        router = APIRouter()
+        for r in range(routes):
+            if r % 2:
+                path = f"/resource{r}/{{item_id}}"
+            else:
+                path = f"/resource{r}"
+            router.add_api_route(path, endpoint, methods=["GET", "POST"][r % 4 // 2 :])
+        root.include_router(router, prefix="/api", version=f"1.{v}")
+    return root
+
+
+def linear_resolve(routes: list[BaseRoute], scope: dict) -> BaseRoute | None:
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+        if match == Match.PARTIAL and partial is None:
+            partial = route
+    return partial
+
+
+def make_scope(path: str, method: str = "GET", **extra: Any) -> dict:
+    return {
+        "type": "http",
+        "path": path,
+        "root_path": "",
+        "method": method,
+        "headers": [],
+        **extra,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--versions", type=int, default=50)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    router = build_router(args.versions, args.routes)
+    started = time.perf_counter()
+    index = RouteIndex(router.routes)
+    print(
+        f"{len(router.routes)} routes, index built in "
+        f"{(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+
+    last = args.routes - 1
+    newest = f"1.{args.versions - 1}"
+    cases = {
+        "static, first route": make_scope("/api/resource0"),
+        "param, last route": make_scope(f"/api/resource{last}/42"),
+        "header version, last": make_scope(
+            f"/api/resource{last}/42", requested_version=newest
+        ),
+        "405 method": make_scope("/api/resource0", method="DELETE"),
+        "404 not found": make_scope("/api/unknown/path"),
+    }
+
+    print(f"{'case':<24} {'linear us':>10} {'indexed us':>11} {'speedup':>8}")
+    for name, scope in cases.items():
+        expected = linear_resolve(router.routes, scope)
+        assert index.resolve(scope)[0] is expected, name
+
+        timings = []
+        for func in (
+            lambda scope=scope: linear_resolve(router.routes, scope),
+            lambda scope=scope: index.resolve(scope),
+        ):
+            best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+            timings.append(best / args.number * 1_000_000)
+        print(
+            f"{name:<24} {timings[0]:>10.2f} {timings[1]:>11.2f} "
+            f"{timings[0] / timings[1]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
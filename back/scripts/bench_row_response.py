@@ -0,0 +1,116 @@
+"""
+ユーザ一覧のレスポンス生成を比較する合成ベンチマーク (DB 接続不要)
+
+    python scripts/bench_row_response.py
+    python scripts/bench_row_response.py --rows 100 1000 5000 --number 50
+
+pydantic は RowListResponse 導入前と同じく、Row を _asdict() して
+ListResponse[dict] を作り、FastAPI の serialize_response で
+ListResponse[UserSchema] として検証、jsonable_encoder を通してから
+JSONResponse で出力する。orjson は RowListResponse で Row から直接出力する。
+両者の出力が同じ JSON になることも確認する。
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# プロジェクトのパスを追加
+sys.path.append((Path(__file__).resolve().parent.parent / "src").__str__())
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import Row
+from sqlalchemy.engine.result import result_tuple
+
+from tuto.api.responses import RowEncoder, RowListResponse
+from tuto.api.schemas import ListResponse
+from tuto.api.user.schemas import UserSchema
+
+COLUMNS = (
+    "id",
+    "username",
+    "email",
+    "nickname",
+    "is_active",
+    "created_at",
+    "updated_at",
+)
+
+
+def make_rows(count: int) -> list[Row]:
+    """UserFinder.find と同じ列の Row (is_active は MySQL と同じく 0/1)"""
+    make_row = result_tuple(COLUMNS)
+    created = datetime(2024, 1, 1)
+    return [
+        make_row(
+            (
+                i,
+                f"user{i:06d}",
+                f"user{i:06d}@example.com",
+                f"ユーザ{i}",
+                int(i % 3 != 0),
+                created + timedelta(minutes=i),
+                created + timedelta(minutes=i, seconds=30),
+            )
+        )
+        for i in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    field = create_model_field(
+        "Response", ListResponse[UserSchema], mode="serialization"
+    )
+    encoder = RowEncoder(UserSchema)
+    loop = asyncio.new_event_loop()
+
+    def pydantic_body(rows: list[Row]) -> bytes:
+        users = [d._asdict() for d in rows]
+        content = loop.run_until_complete(
+            serialize_response(
+                field=field,
+                response_content=ListResponse[dict](data=users),
+                exclude_none=True,
+            )
+        )
+        return JSONResponse(content).body
+
+    def orjson_body(rows: list[Row]) -> bytes:
+        return RowListResponse(rows, encoder).body
+
+    print(f"{'rows':>6} {'pydantic ms':>12} {'orjson ms':>10} {'speedup':>8}")
+    for count in args.rows:
+        rows = make_rows(count)
+        assert json.loads(pydantic_body(rows)) == json.loads(orjson_body(rows))
+
+        timings = []
+        for func in (pydantic_body, orjson_body):
+            best = min(
+                timeit.repeat(
+                    lambda func=func, rows=rows: func(rows),
+                    number=args.number,
+                    repeat=args.repeat,
+                )
+            )
+            timings.append(best / args.number * 1000)
+        print(
+            f"{count:>6} {timings[0]:>12.3f} {timings[1]:>10.3f} "
+            f"{timings[0] / timings[1]:>7.1f}x"
+        )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
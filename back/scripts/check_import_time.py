@@ -0,0 +1,96 @@
+"""
+tuto.api のインポート時間を python -X importtime で計測し、予算を超えたら失敗する
+
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget-ms 1500 --runs 10 --top 20
+
+ワーカーの起動やオートスケール時のコールドスタートはインポート時間で決まる。
+中央値が --budget-ms を超えた場合と、初回利用まで遅延させている重い依存
+(boto3, python-jose など) がインポート時に読み込まれた場合に終了コード 1 を返す。
+CI では計測のばらつきを見込んで予算に余裕を持たせること。
+"""
+
+import argparse
+import collections
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# 認証バックエンドなどで初回利用時に読み込む依存
+LAZY_MODULES = (
+    "asyncpg",
+    "boto3",
+    "botocore",
+    "httpx",
+    "jinja2",
+    "jose",
+    "jwt",
+    "passlib",
+    "pyinstrument",
+    "tuto.auth.cognito_protocol",
+    "tuto.auth.local_protocol",
+)
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module: str) -> list[tuple[int, int, str]]:
+    """(self us, cumulative us, module) のリスト"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(SRC_DIR)},
+        check=False,
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if match := IMPORT_TIME_LINE.match(line):
+            rows.append((int(match[1]), int(match[2]), match[4]))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="tuto.api")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    for _ in range(args.runs):
+        rows = measure(args.module)
+        totals.append(next(c for _, c, name in rows if name == args.module) / 1000)
+    median = statistics.median(totals)
+
+    by_package: collections.Counter[str] = collections.Counter()
+    for self_us, _, name in rows:
+        by_package[name.split(".")[0]] += self_us
+    print(f"import {args.module}: median {median:.1f} ms over {args.runs} runs")
+    for package, self_us in by_package.most_common(args.top):
+        print(f"{self_us / 1000:>8.1f} ms  {package}")
+
+    imported = {name for _, _, name in rows}
+    eager = [m for m in LAZY_MODULES if m in imported]
+    failed = False
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: {median:.1f} ms is over the budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"OK: within the budget of {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
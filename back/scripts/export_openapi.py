@@ -0,0 +1,40 @@
+"""
+各 API バージョンの OpenAPI ドキュメントを JSON ファイルに書き出す
+
+    python scripts/export_openapi.py build/openapi
+    OPENAPI_DIR=build/openapi uvicorn tuto.api:app
+
+ビルド時に書き出しておき、OPENAPI_DIR で指定すると、起動時にスキーマを
+生成せずにファイルから読み込む。ファイル名は openapi-<version>.json。
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# プロジェクトのパスを追加
+sys.path.append((Path(__file__).resolve().parent.parent / "src").__str__())
+
+# 書き出すドキュメントは既存のファイルではなくルートから生成する
+os.environ["API_DOCS_ENABLED"] = "true"
+os.environ["OPENAPI_DIR"] = ""
+
+from tuto.api.app import app
+from tuto.versioning.openapi import document_filename
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("output", type=Path, help="書き出し先のディレクトリ")
+    args = parser.parse_args()
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    for version, document in app.state.openapi_documents.items():
+        path = args.output / document_filename(version)
+        path.write_bytes(document.body)
+        print(f"{path} ({len(document.body)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from tuto.api.router import v0_1_0, v0_1_1
+from tuto.api.compression import CompressionMiddleware
+from tuto.api.metrics import MetricsMiddleware, mark_process_dead
+from tuto.api.profiling import PROFILING_TOKEN, ProfilingMiddleware
+from tuto.api.router import metrics_router, v0_1_0, v0_1_1
+from tuto.auth import close_auth_services
 from tuto.auth.auth_helper import OAuth2PasswordOTPBearerUsingCookie
+from tuto.auth.cognito_gateway import cognito_gateway
+from tuto.auth.password_hasher import password_hasher
+from tuto.datasource.database import autosize_pools, dispose_engines
+from tuto.datasource.profiler import QueryProfilerMiddleware
 from tuto.versioning.fastapi import (
     CustomHeaderVersionMiddleware,
 )
@@ -12,6 +23,20 @@ from tuto.versioning.routing import (
     VersionedAPIRouter,
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None]:
+    await autosize_pools()
+    try:
+        yield
+    finally:
+        password_hasher.shutdown()
+        cognito_gateway.shutdown()
+        await close_auth_services()
+        await dispose_engines()
+        mark_process_dead()
+
+
 app = FastAPI(title="Tuto API", description="API for Tuto application")
 
 # API Versioning Examples
@@ -19,10 +44,11 @@ app = FastAPI(title="Tuto API", description="API for Tuto application")
 # https://github.com/tikon93/fastapi-header-versioning
 
 # Path Versioning
-root_router = VersionedAPIRouter(default_version="1.0")
+# app.router is replaced below, so the lifespan has to be set on the root router
+root_router = VersionedAPIRouter(default_version="1.0", lifespan=lifespan)
 
 # Header Versioning
-# root_router = HeaderVersionedAPIRouter(default_version="1")
+# root_router = HeaderVersionedAPIRouter(default_version="1", lifespan=lifespan)
 # app.add_middleware(CustomHeaderVersionMiddleware, version_header="x-api-version")
 
 # version 0.1 routes
@@ -48,6 +74,9 @@ root_router.include_router(
 app.router = root_router
 app = doc_generation(app)
 
+# Not versioned, so it is added after the versioned apps are generated
+app.include_router(metrics_router, tags=["sys"])
+
 
 # Yet another simple way of doing Path Versioning using code from DeanWay
 # https://github.com/DeanWay/fastapi-versioning
@@ -75,3 +104,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+app.add_middleware(CompressionMiddleware)
+
+app.add_middleware(QueryProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# Outermost, so that profiles cover the other middleware too
+if PROFILING_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
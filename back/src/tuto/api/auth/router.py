@@ -11,7 +11,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import tuto.core.user.repository as user_repository
 from tuto.api.auth.enum import AuthMethod
 from tuto.api.auth.schemas import ForgotPasswordRequest, ForgotPasswordResponse, Me
-from tuto.auth import get_auth_service
+from tuto.api.conditional import (
+    etag_matches,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
+from tuto.auth import (
+    get_auth_service,
+    get_cognito_auth_service,
+    get_local_auth_service,
+)
 from tuto.auth.auth_helper import (
     SECURE_HTTP_ONLY_COOKIE,
     OAuth2PasswordOTPBearerUsingCookie,
@@ -19,10 +29,9 @@ from tuto.auth.auth_helper import (
     encode_cookie_data,
     get_token_source,
 )
-from tuto.auth.cognito_protocol import CognitoAuthService
 from tuto.auth.exceptions import CodeMismatchError, NotAuthorizedError
 from tuto.auth.ip_restriction import verify_ip_access
-from tuto.auth.local_protocol import LocalAuthService
+from tuto.auth.parsed_token import parse_token, request_token
 from tuto.auth.protocol import (
     AuthProtocol,
     Challenge,
@@ -30,6 +39,8 @@ from tuto.auth.protocol import (
     Token,
     TokenData,
 )
+from tuto.auth.token_cache import discard_token_info, get_token_info
+from tuto.core.user.cache import principal_cache
 from tuto.core.user.models import User
 from tuto.datasource.database import get_async_session
 
@@ -53,6 +64,7 @@ MAX_AUTH_COOKIE_AGE_MARGIN = 60 * 60 * 24 * 30  # 30 days
 
 
 async def get_current_me(
+    request: Request,
     token: str | tuple[str, str | None, int, int] = Depends(oauth2_scheme),
     asession: AsyncSession = Depends(get_async_session),
 ) -> Me:
@@ -64,11 +76,14 @@ async def get_current_me(
         access_token: str = token
         expires_in = 0
         token_issued_time = 0
+    # Parsed once, then shared by the source detection, the kid lookup and the
+    # token info cache
+    access_token = request_token(request, access_token)
 
     auth_service: AuthProtocol = get_auth_service_by_token(access_token, asession)
 
-    token_data: TokenData = await auth_service.get_token_info(
-        access_token, expires_in, token_issued_time
+    token_data: TokenData = await get_token_info(
+        auth_service, access_token, expires_in, token_issued_time
     )
     api_user: Me = await get_me(token_data.username, asession)
 
@@ -93,9 +108,15 @@ async def get_current_me(
 )
 async def read_users_me(
     request: Request,
+    response: Response,
     current_user: Me = Depends(get_current_me),
-) -> Me:
+) -> Me | Response:
     verify_ip_access(request, current_user.username)
+    etag = make_etag(current_user.model_dump())
+    validators = validator_headers(etag)
+    if etag_matches(request, etag):
+        return not_modified(validators)
+    response.headers.update(validators)
     return current_user
 
 
@@ -137,7 +158,7 @@ async def verify_totp(
 
     form_data = await request.form()
     email_otp_code: str = form_data["mfa_code"]  # type: ignore
-    auth_service: AuthProtocol = CognitoAuthService()
+    auth_service: AuthProtocol = get_cognito_auth_service()
     try:
         token: Token = await auth_service.respond_to_email_otp_challenge(
             username, session, email_otp_code
@@ -198,10 +219,11 @@ async def discard_token(
     token: Annotated[tuple[str, str | None, int, int], Depends(oauth2_scheme)],
     asession: AsyncSession = Depends(get_async_session),
 ) -> JSONResponse:
-    access_token: str = token[0]
+    access_token: str = parse_token(token[0])
     refresh_token: str | None = token[1]
     auth_service: AuthProtocol = get_auth_service_by_token(access_token, asession)
     success = await auth_service.discard_token(access_token, refresh_token)  # type: ignore
+    discard_token_info(access_token)
 
     json_response = JSONResponse(
         content=jsonable_encoder(
@@ -297,9 +319,9 @@ async def forgot_password(
         )
 
     auth_service: AuthProtocol = (
-        CognitoAuthService()
+        get_cognito_auth_service()
         if user.auth_method == AuthMethod.COGNITO_EOTP
-        else LocalAuthService(asession)
+        else get_local_auth_service(asession)
     )
 
     try:
@@ -359,19 +381,25 @@ def set_auth_data_in_http_only_cookie(
 def get_auth_service_by_token(token: str, session: AsyncSession) -> AuthProtocol:
     issuer = get_token_source(token)
     if issuer == "cognito":
-        return CognitoAuthService()
-    return LocalAuthService(session)
+        return get_cognito_auth_service()
+    return get_local_auth_service(session)
 
 
 async def get_me(username: str, asession: AsyncSession) -> Me:
+    me: Me | None = principal_cache.get(username)
+    if me is not None:
+        return me
+
     user: User | None = await user_repository.get_by_username_or_email(
         username, asession
     )
     assert user is not None
     assert user.id is not None
-    return Me(
+    me = Me(
         username=user.username, id=user.id, nickname=user.nickname, email=user.email
     )
+    principal_cache.set(username, me)
+    return me
 
 
 def set_auth_cookie(response: Response, token_data: dict, max_age: int) -> None:
@@ -0,0 +1,348 @@
+import logging
+import os
+import time
+import zlib
+from collections.abc import Callable
+
+from prometheus_client import Counter
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from tuto.utils.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # the "compression" extra is not installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # the "compression" extra is not installed
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this many bytes are sent as they are
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Compress streamed responses (e.g. exports) chunk by chunk
+COMPRESSION_STREAMING = (
+    os.environ.get("COMPRESSION_STREAMING", "true").lower() == "true"
+)
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", "3"))
+# Compressed bodies kept for responses that do not change, see CompressionMiddleware
+COMPRESSION_CACHE_SIZE = int(os.environ.get("COMPRESSION_CACHE_SIZE", "64"))
+COMPRESSION_CACHE_TTL = float(os.environ.get("COMPRESSION_CACHE_TTL", "3600"))
+# Larger bodies are compressed every time rather than kept in the cache
+COMPRESSION_CACHE_MAX_BODY = int(
+    os.environ.get("COMPRESSION_CACHE_MAX_BODY", str(1024 * 1024))
+)
+
+COMPRESSION_CPU_SECONDS = Counter(
+    "tuto_http_compression_cpu_seconds_total",
+    "CPU time spent compressing response bodies, by content coding",
+    ["encoding"],
+)
+COMPRESSION_INPUT_BYTES = Counter(
+    "tuto_http_compression_input_bytes_total",
+    "Response bytes before compression, by content coding",
+    ["encoding"],
+)
+COMPRESSION_OUTPUT_BYTES = Counter(
+    "tuto_http_compression_output_bytes_total",
+    "Response bytes after compression, by content coding. The ratio to the input "
+    "bytes is the compression ratio",
+    ["encoding"],
+)
+
+# Media types worth compressing, besides text/*
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/json",
+        "application/javascript",
+        "application/x-ndjson",
+        "application/xml",
+        "image/svg+xml",
+    }
+)
+
+# Statuses whose responses have no body, or only a part of one
+_SKIPPED_STATUSES = frozenset({204, 206, 304})
+
+
+class _GzipCompressor:
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(
+            COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16
+        )
+
+    def process(self, data: bytes, flush: bool = False) -> bytes:
+        output = self._compressor.compress(data)
+        if flush:
+            output += self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return output
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def process(self, data: bytes, flush: bool = False) -> bytes:
+        output = self._compressor.process(data)
+        if flush:
+            output += self._compressor.flush()
+        return output
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self) -> None:
+        compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL)
+        self._compressor = compressor.compressobj()
+
+    def process(self, data: bytes, flush: bool = False) -> bytes:
+        output = self._compressor.compress(data)
+        if flush:
+            output += self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return output
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> dict[str, Callable[[], object]]:
+    """利用できる content coding とその圧縮器 (優先する順)"""
+    encodings: dict[str, Callable[[], object]] = {}
+    if brotli is not None:
+        encodings["br"] = _BrotliCompressor
+    if zstandard is not None:
+        encodings["zstd"] = _ZstdCompressor
+    encodings["gzip"] = _GzipCompressor
+    return encodings
+
+
+def negotiate(accept_encoding: str, encodings: list[str]) -> str | None:
+    """
+    The content coding to use for a request's Accept-Encoding, None to send the
+    body as is. The highest q-value wins, then the order of encodings.
+    """
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        qualities[coding] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+def _cache_key(scope: Scope, headers: Headers) -> str | None:
+    """
+    Key of a response whose compressed body can be reused, None for others. A
+    strong ETag names the exact bytes of the requested resource.
+    """
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        # ETags are only unique per resource, e.g. FileResponse's are made of the
+        # file's mtime and size
+        return f"{scope['method']} {scope['path']} {etag}"
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with gzip, or brotli and zstd when the
+    "compression" extra is installed, as negotiated with Accept-Encoding.
+
+    Bodies below minimum_size, responses that are already encoded (e.g. the
+    pre-compressed OpenAPI documents) and media types that do not compress are
+    sent as they are. Streamed responses are compressed chunk by chunk, each chunk
+    flushed so that the client sees it right away. The compressed bodies of
+    responses with a strong ETag (e.g. FileResponse) are cached. The OpenAPI
+    documents come precompressed from OpenAPIDocument and are not cached here.
+    Strong ETags are weakened, since the encoded bytes differ from the ones the
+    ETag was computed from.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        streaming: bool = COMPRESSION_STREAMING,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.streaming = streaming
+        self.compressors = available_encodings()
+        self.encodings = list(self.compressors)
+        self.cache: TTLCache[tuple[str, str], bytes] = TTLCache(
+            "compressed_body", COMPRESSION_CACHE_SIZE, COMPRESSION_CACHE_TTL
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, scope, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compress(
+        self, scope: Scope, encoding: str, body: bytes, headers: Headers
+    ) -> bytes:
+        key = None
+        if len(body) <= COMPRESSION_CACHE_MAX_BODY:
+            key = _cache_key(scope, headers)
+        if key is not None:
+            cached = self.cache.get((key, encoding))
+            if cached is not None:
+                return cached
+
+        compressor = self.compressors[encoding]()
+        compressed = _timed(encoding, body, lambda: compressor.process(body))
+        compressed += _timed(encoding, b"", compressor.finish)
+        if key is not None:
+            self.cache.set((key, encoding), compressed)
+        return compressed
+
+
+def _timed(encoding: str, data: bytes, compress: Callable[[], bytes]) -> bytes:
+    started = time.thread_time()
+    output = compress()
+    COMPRESSION_CPU_SECONDS.labels(encoding).inc(time.thread_time() - started)
+    COMPRESSION_INPUT_BYTES.labels(encoding).inc(len(data))
+    COMPRESSION_OUTPUT_BYTES.labels(encoding).inc(len(output))
+    return output
+
+
+class _CompressionResponder:
+    """Compresses the messages of one response"""
+
+    def __init__(
+        self, middleware: CompressionMiddleware, scope: Scope, encoding: str, send: Send
+    ) -> None:
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self._send = send
+        self.start: Message | None = None
+        self.compressor = None
+        self.passthrough = False
+
+    def _encoded_headers(self) -> MutableHeaders:
+        headers = MutableHeaders(scope=self.start)
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        return headers
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            status = message["status"]
+            if (
+                status < 200
+                or status in _SKIPPED_STATUSES
+                or not _compressible(headers)
+            ):
+                self.passthrough = True
+                await self._send(message)
+                return
+            self.start = message
+            return
+
+        if message_type != "http.response.body":
+            if self.start is not None and self.compressor is None:
+                # The start is still held, e.g. before an http.response.pathsend,
+                # whose body is not ours to compress
+                await self._flush(message)
+                return
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is not None:
+            # A streamed response, past its first chunk
+            output = _timed(
+                self.encoding,
+                body,
+                lambda: self.compressor.process(body, flush=more_body),
+            )
+            if not more_body:
+                output += _timed(self.encoding, b"", self.compressor.finish)
+            await self._send({**message, "body": output})
+            return
+
+        if not more_body:
+            headers = Headers(raw=self.start["headers"])
+            if len(body) < self.middleware.minimum_size:
+                await self._flush(message)
+                return
+            compressed = self.middleware.compress(
+                self.scope, self.encoding, body, headers
+            )
+            encoded = self._encoded_headers()
+            encoded["Content-Length"] = str(len(compressed))
+            await self._send(self.start)
+            await self._send({**message, "body": compressed})
+            return
+
+        if not self.middleware.streaming:
+            await self._flush(message)
+            return
+
+        encoded = self._encoded_headers()
+        del encoded["Content-Length"]
+        self.compressor = self.middleware.compressors[self.encoding]()
+        output = _timed(
+            self.encoding, body, lambda: self.compressor.process(body, flush=True)
+        )
+        await self._send(self.start)
+        await self._send({**message, "body": output})
+
+    async def _flush(self, message: Message) -> None:
+        """圧縮せずに送る"""
+        self.passthrough = True
+        await self._send(self.start)
+        await self._send(message)
@@ -0,0 +1,51 @@
+import hashlib
+from typing import Any
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Responses depend on the caller's authorization, so only the browser may keep
+# them, and it has to revalidate before each reuse
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Weak ETag of the parts, e.g. a table watermark and the request's parameters.
+
+    Weak, since the validator is not derived from the body bytes, which may also
+    be compressed on the way out.
+    """
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def is_conditional(request: Request) -> bool:
+    """
+    キャッシュ済みのレスポンスを ETag で検証するリクエストか
+
+    If-Modified-Since is not evaluated, and Last-Modified not sent: the latest
+    updated_at of a table does not change when a row is deleted.
+    """
+    return "if-none-match" in request.headers
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match が etag を含むか (弱い比較)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+def validator_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
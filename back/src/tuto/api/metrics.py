@@ -0,0 +1,81 @@
+import os
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, multiprocess
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_SECONDS = Histogram(
+    "tuto_http_request_duration_seconds",
+    "Time spent handling HTTP requests, by route template and API version",
+    ["method", "route", "api_version"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+REQUESTS = Counter(
+    "tuto_http_requests_total",
+    "Number of HTTP requests, by route template, API version and status code",
+    ["method", "route", "api_version", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "tuto_http_requests_in_flight",
+    "Number of HTTP requests being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+# Label of requests that matched no route, so that unknown paths cannot grow the
+# number of series
+UNMATCHED_ROUTE = "unmatched"
+# Methods labelled as they are. ASGI servers accept any token as the method, so
+# the others are labelled OTHER_METHOD
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+OTHER_METHOD = "other"
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and in-flight requests of each HTTP request.
+
+    Requests are labelled with the template of the route that handled them (e.g.
+    /api/users/{id}) and its VersionedAPIRoute.api_version, both read from the
+    scope after routing.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        if method not in KNOWN_METHODS:
+            method = OTHER_METHOD
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            version = getattr(route, "api_version", None) or ""
+            REQUEST_SECONDS.labels(method, template, version).observe(
+                time.perf_counter() - started
+            )
+            REQUESTS.labels(method, template, version, str(status)).inc()
+
+
+def mark_process_dead() -> None:
+    """終了するワーカのライブ系メトリクスを集計から外す"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
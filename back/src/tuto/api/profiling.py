@@ -0,0 +1,130 @@
+import asyncio
+import hmac
+import importlib.util
+import logging
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+if TYPE_CHECKING:
+    from pyinstrument import Profiler
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying this token in PROFILING_HEADER are profiled, empty disables it
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN", "")
+PROFILING_HEADER = os.environ.get("PROFILING_HEADER", "X-Profile-Token")
+PROFILING_DIR = Path(os.environ.get("PROFILING_DIR", "/tmp/tuto-profiles"))
+# Profiles kept in PROFILING_DIR, the oldest are removed first
+PROFILING_MAX_FILES = int(os.environ.get("PROFILING_MAX_FILES", "100"))
+# Seconds between samples
+PROFILING_INTERVAL = float(os.environ.get("PROFILING_INTERVAL", "0.001"))
+# Saved profiles are served under this path, to requests carrying the token
+PROFILING_PATH = "/debug/profiles/"
+
+PROFILE_NAME_PATTERN = re.compile(r"[\w.-]+\.speedscope\.json")
+
+
+def _profile_name(scope: Scope) -> str:
+    path = re.sub(r"[^\w-]+", "_", scope["path"]).strip("_") or "root"
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    suffix = uuid.uuid4().hex[:8]
+    return f"{stamp}-{scope['method']}-{path[:64]}-{suffix}.speedscope.json"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that carry the profiling token with pyinstrument.
+
+    The speedscope profile (open it at https://www.speedscope.app) is written to
+    PROFILING_DIR after the response is sent. The response's X-Profile-Url header
+    links to it, and the file is served from PROFILING_PATH to requests carrying
+    the same token. Put this middleware outermost, so that the profile covers the
+    other middleware, routing and the endpoint. bcrypt hashing runs in the password
+    hasher's process pool and only shows as the time spent awaiting it.
+
+    pyinstrument is imported by the first profiled request, not at startup.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        token: str = PROFILING_TOKEN,
+        header: str = PROFILING_HEADER,
+        directory: Path = PROFILING_DIR,
+    ) -> None:
+        self.app = app
+        self.token = token
+        self.header = header.lower()
+        self.directory = directory
+        # find_spec locates the "profiling" extra without importing it
+        self.available = (
+            bool(token) and importlib.util.find_spec("pyinstrument") is not None
+        )
+        if token and not self.available:
+            logger.warning(
+                "PROFILING_TOKEN is set but pyinstrument is not installed, "
+                "install the profiling extra to profile requests"
+            )
+
+    def _authorized(self, scope: Scope) -> bool:
+        supplied = Headers(scope=scope).get(self.header)
+        return supplied is not None and hmac.compare_digest(
+            supplied.encode(), self.token.encode()
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.available or not self._authorized(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"].startswith(PROFILING_PATH):
+            response = self._profile_file(scope["path"].removeprefix(PROFILING_PATH))
+            await response(scope, receive, send)
+            return
+
+        name = _profile_name(scope)
+
+        async def send_with_link(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Profile-Url", f"{PROFILING_PATH}{name}")
+            await send(message)
+
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=PROFILING_INTERVAL, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_link)
+        finally:
+            profiler.stop()
+            await asyncio.to_thread(self._save, profiler, name)
+
+    def _profile_file(self, name: str) -> FileResponse | PlainTextResponse:
+        path = self.directory / name
+        if not PROFILE_NAME_PATTERN.fullmatch(name) or not path.is_file():
+            return PlainTextResponse("Not Found", status_code=404)
+        return FileResponse(path, media_type="application/json")
+
+    def _save(self, profiler: "Profiler", name: str) -> None:
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / name).write_text(profiler.output(SpeedscopeRenderer()))
+            profiles = sorted(
+                self.directory.glob("*.speedscope.json"),
+                key=lambda p: p.stat().st_mtime,
+            )
+            for old in profiles[:-PROFILING_MAX_FILES]:
+                old.unlink(missing_ok=True)
+        except OSError as exc:
+            logger.warning(f"Could not save profile {name}: {exc}")
@@ -0,0 +1,92 @@
+import operator
+from collections.abc import Callable, Mapping, Sequence
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import Row
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+from tuto.api.schemas import ListResponse
+
+# ListResponse up to its data, as FastAPI writes it with response_model_exclude_none
+_LIST_FIELDS = ListResponse().model_dump(exclude_none=True, exclude={"data"})
+_LIST_PREFIX = orjson.dumps(_LIST_FIELDS)[:-1] + b',"data":'
+
+
+class RowEncoder:
+    """
+    Converts finder rows to dicts holding the fields of a response schema.
+
+    The field list and the converters are worked out once per schema, the column
+    positions once per column list. Rows come from our own queries, so they are
+    not validated against the schema: values are written as the driver returned
+    them, except for bool fields, which MySQL returns as 0/1.
+    """
+
+    def __init__(self, schema: type[BaseModel]) -> None:
+        self.fields: tuple[str, ...] = tuple(schema.model_fields)
+        self.converters: dict[str, Callable[[Any], Any]] = {
+            name: bool
+            for name, field in schema.model_fields.items()
+            if field.annotation is bool
+        }
+        self._getters: dict[tuple[str, ...], Callable[[Row], tuple]] = {}
+
+    def _getter(self, columns: tuple[str, ...]) -> Callable[[Row], tuple]:
+        getter = self._getters.get(columns)
+        if getter is None:
+            missing = [field for field in self.fields if field not in columns]
+            if missing:
+                msg = f"Rows have no column for {', '.join(missing)}"
+                raise ValueError(msg)
+            positions = [columns.index(field) for field in self.fields]
+            if len(positions) > 1:
+                getter = operator.itemgetter(*positions)
+            else:
+                (position,) = positions
+
+                def getter(row: Row) -> tuple:
+                    return (row[position],)
+
+            self._getters[columns] = getter
+        return getter
+
+    def to_dicts(self, rows: Sequence[Row]) -> list[dict[str, Any]]:
+        if not rows:
+            return []
+        getter = self._getter(tuple(rows[0]._fields))
+        fields = self.fields
+        items = [dict(zip(fields, getter(row))) for row in rows]
+        for name, convert in self.converters.items():
+            for item in items:
+                item[name] = convert(item[name])
+        return items
+
+
+class RowListResponse(Response):
+    """
+    A ListResponse of finder rows, serialized straight to JSON with orjson.
+
+    Return it from a route with response_model=ListResponse[Schema] (kept for the
+    OpenAPI document) and RowEncoder(Schema): FastAPI sends a returned Response as
+    is, skipping the response model validation and jsonable_encoder. Headers set
+    on an injected Response are not applied to it, pass them as headers.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        rows: Sequence[Row],
+        encoder: RowEncoder,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+    ) -> None:
+        self.encoder = encoder
+        super().__init__(rows, status_code, headers, background=background)
+
+    def render(self, content: Sequence[Row]) -> bytes:
+        return _LIST_PREFIX + orjson.dumps(self.encoder.to_dicts(content)) + b"}"
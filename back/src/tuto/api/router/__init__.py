@@ -1,5 +1,6 @@
 from ..auth.router import router as auth_router
 from .healthcheck_router import router as healthcheck_router
+from .metrics_router import router as metrics_router
 from ..user.router import router as user_router
 
-__all__ = ["auth_router", "healthcheck_router", "user_router"]
+__all__ = ["auth_router", "healthcheck_router", "metrics_router", "user_router"]
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import os
+from collections.abc import AsyncIterator, Sequence
+from datetime import date, datetime
+from enum import StrEnum
+from typing import Any
+
+from sqlalchemy import Row
+
+from tuto.core.user.finder import UserFinder
+from tuto.datasource.database import read_session
+
+# Rows fetched from the server-side cursor and written per response chunk
+EXPORT_PARTITION_SIZE = int(os.environ.get("USER_EXPORT_PARTITION_SIZE", "1000"))
+
+EXPORT_FIELDS = (
+    "id",
+    "username",
+    "email",
+    "nickname",
+    "is_active",
+    "created_at",
+    "updated_at",
+)
+
+
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+    @property
+    def media_type(self) -> str:
+        if self == ExportFormat.CSV:
+            return "text/csv; charset=utf-8"
+        return "application/x-ndjson"
+
+
+def _to_value(field: str, value: Any) -> Any:
+    if field == "is_active":
+        return bool(value)
+    if isinstance(value, datetime | date):
+        return value.isoformat()
+    return value
+
+
+def encode_ndjson(rows: Sequence[Row]) -> bytes:
+    lines = [
+        json.dumps(
+            {f: _to_value(f, v) for f, v in zip(EXPORT_FIELDS, row, strict=True)},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        for row in rows
+    ]
+    lines.append("")
+    return "\n".join(lines).encode("utf-8")
+
+
+def encode_csv(rows: Sequence[Row], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows(
+        [_to_value(f, v) for f, v in zip(EXPORT_FIELDS, row, strict=True)]
+        for row in rows
+    )
+    return buffer.getvalue().encode("utf-8")
+
+
+async def export_users(
+    criteria: dict, sort: list | None, export_format: ExportFormat
+) -> AsyncIterator[bytes]:
+    """
+    ユーザを NDJSON または CSV で出力する
+
+    Opens its own read-only session: the request's session dependency is closed
+    before a streaming body is sent. Rows are pulled from the server-side cursor only as
+    fast as the client reads the previous chunk.
+    """
+    async with read_session() as asession:
+        finder = UserFinder(asession)
+        partitions = finder.stream(criteria, sort, EXPORT_PARTITION_SIZE)
+
+        if export_format == ExportFormat.CSV:
+            yield encode_csv([], header=True)
+            async for rows in partitions:
+                yield encode_csv(rows)
+        else:
+            async for rows in partitions:
+                yield encode_ndjson(rows)
@@ -1,48 +1,143 @@
 import json
 from ast import literal_eval
-from collections.abc import Sequence
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query, Response
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from tuto.api.auth import router as auth_router
 from tuto.api.auth.schemas import Me
+from tuto.api.conditional import (
+    etag_matches,
+    is_conditional,
+    make_etag,
+    not_modified,
+    validator_headers,
+)
+from tuto.api.responses import RowEncoder, RowListResponse
 from tuto.api.schemas import ListResponse
+from tuto.api.user.export import ExportFormat, export_users
 from tuto.api.user.schemas import UserSchema
-from tuto.core.finder import PaginationResult
+from tuto.core.finder import (
+    CountStrategy,
+    InvalidQueryError,
+    PaginationResult,
+    Watermark,
+)
 from tuto.core.user.finder import UserFinder
-from tuto.datasource.database import get_async_session
+from tuto.datasource.database import get_read_async_session
 
 router = APIRouter()
 
+user_row_encoder = RowEncoder(UserSchema)
+
 
 @router.get(
     "/users",
     summary="",
     description="",
     response_description="",
-    response_model_exclude_none=True,
+    # Documents the body, which RowListResponse writes without validating it
+    response_model=ListResponse[UserSchema],
 )
 async def get_list(
+    request: Request,
     criteria: Annotated[str, Query(alias="filter")],
     sort: str,
     query_range: Annotated[str, Query(alias="range")],
     current_user: Annotated[Me, Depends(auth_router.get_current_me)],
-    response: Response,
-    asession: Annotated[AsyncSession, Depends(get_async_session)],
-) -> ListResponse[UserSchema]:
+    asession: Annotated[AsyncSession, Depends(get_read_async_session)],
+    cursor: str | None = None,
+    count: CountStrategy = CountStrategy.EXACT,
+) -> Response:
     """Get Users"""
     criteria: dict = json.loads(criteria)
     sort: list = literal_eval(sort)
     query_range: list = literal_eval(query_range)
 
     finder: UserFinder = UserFinder(asession)
-    result: PaginationResult = await finder.find(criteria, sort, query_range)
+    # The watermark scans an index of the table, so it is read when it can answer
+    # a conditional request, or when it replaces the count of an unfiltered list
+    watermark: Watermark | None = None
+    validators: dict[str, str] = {}
+    if is_conditional(request) or (not criteria and count == CountStrategy.EXACT):
+        watermark = await finder.watermark()
+        etag = make_etag(watermark, request.url.path, request.url.query)
+        validators = validator_headers(etag)
+        # Answered from the watermark alone when the client's page is still current
+        if etag_matches(request, etag):
+            return not_modified(validators)
+
+    try:
+        result: PaginationResult = await finder.find(
+            criteria,
+            sort,
+            query_range,
+            cursor,
+            count,
+            unfiltered_total=watermark.live_rows if watermark else None,
+        )
+    except InvalidQueryError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
+
+    # An approximate total is marked with "~"
+    total = f"~{result.total}" if result.total_is_estimate else result.total
+    headers = {
+        **validators,
+        "Content-Range": f"appls {result.start}-{result.end}/{total}",
+    }
+    if result.next_cursor:
+        headers["X-Next-Cursor"] = result.next_cursor
+    if result.prev_cursor:
+        headers["X-Prev-Cursor"] = result.prev_cursor
+    headers["Access-Control-Expose-Headers"] = (
+        "Content-Range, X-Next-Cursor, X-Prev-Cursor"
+    )
+    return RowListResponse(result.data, user_row_encoder, headers=headers)
+
+
+@router.get(
+    "/users/export",
+    summary="",
+    description="",
+    response_description="",
+    response_class=StreamingResponse,
+)
+async def export(
+    current_user: Annotated[Me, Depends(auth_router.get_current_me)],
+    criteria: Annotated[str, Query(alias="filter")] = "{}",
+    sort: str = "[]",
+    export_format: Annotated[ExportFormat, Query(alias="format")] = (
+        ExportFormat.NDJSON
+    ),
+) -> StreamingResponse:
+    """Export Users"""
+    criteria: dict = json.loads(criteria)
+    sort: list = literal_eval(sort)
+
+    # Reject invalid filters before the response starts streaming
+    try:
+        UserFinder.query_compiler.compile(criteria, sort)
+    except InvalidQueryError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from exc
 
-    users: Sequence[dict] = [d._asdict() for d in result.data]
-    response.headers["Content-Range"] = (
-        f"appls {result.start}-{result.end}/{result.total}"
+    return StreamingResponse(
+        export_users(criteria, sort, export_format),
+        media_type=export_format.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="users.{export_format}"'
+        },
     )
-    response.headers["Access-Control-Expose-Headers"] = "Content-Range"
-    return ListResponse[dict](data=users)
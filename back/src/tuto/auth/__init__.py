@@ -1,22 +1,22 @@
-from tuto.core.user.models import User
-from .protocol import AuthProtocol
-from .cognito_protocol import CognitoAuthService
-from .local_protocol import LocalAuthService
-
-from sqlmodel import select
+import importlib
+from typing import Any
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from .protocol import AuthProtocol
+from .services import (
+    close_auth_services,
+    get_auth_service,
+    get_cognito_auth_service,
+    get_local_auth_service,
+)
 
 
-async def get_auth_service(
-    username: str,
-    asession: AsyncSession,
-) -> AuthProtocol:
-    user: User | None = await asession.scalar(
-        select(User).where(User.username == username)
-    )
-    if user is None:
-        raise ValueError(f"User with username {username} not found")
-    if user.auth_method == "cognito_eotp":
-        return CognitoAuthService()
-    return LocalAuthService(asession)
+def __getattr__(name: str) -> Any:
+    # The backends are imported on first use, see tuto.auth.services
+    backends = {
+        "CognitoAuthService": ".cognito_protocol",
+        "LocalAuthService": ".local_protocol",
+    }
+    if name in backends:
+        return getattr(importlib.import_module(backends[name], __name__), name)
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
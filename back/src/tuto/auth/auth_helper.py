@@ -1,18 +1,15 @@
-import base64
-import gzip
-import json
 import logging
 import os
 import sys
 from datetime import UTC, datetime, timedelta, timezone
-from typing import Annotated, Any, cast
+from functools import cache
+from typing import TYPE_CHECKING, Annotated, Any, cast
 
-import jwt
 from fastapi import Response
 from fastapi.exceptions import HTTPException
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 from fastapi.security import OAuth2
-from passlib.context import CryptContext
+from prometheus_client import Counter
 from sqlalchemy import Result, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Session
@@ -22,6 +19,12 @@ from starlette.status import HTTP_401_UNAUTHORIZED
 # TODO: import from typing when deprecating Python 3.9
 from typing_extensions import Doc
 
+from tuto.auth import cookie_codec
+from tuto.auth.parsed_token import MalformedTokenError, parse_token
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
 logger = logging.getLogger(__name__)
 formatter = logging.Formatter("%(levelname)s: %(asctime)s - %(message)s")
 handler = logging.StreamHandler(sys.stdout)
@@ -30,8 +33,6 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # to get a string like this run:
 # openssl rand -hex 32
 SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
@@ -42,18 +43,62 @@ SECURE_HTTP_ONLY_COOKIE = (
     os.environ.get("SECURE_HTTP_ONLY_COOKIE", "False").lower() == "true"
 )
 
+# Key the b1 cookies are signed with (openssl rand -hex 32). Without it b1 cookies
+# are neither written nor accepted
+AUTH_COOKIE_KEY = os.environ.get("AUTH_COOKIE_KEY", "")
+# Format of newly written "ad" cookies: "b1" (signed binary, needs AUTH_COOKIE_KEY)
+# or "gzip" (legacy, to roll back while instances that only read gzip are still
+# serving). b1 when AUTH_COOKIE_KEY is set
+AUTH_COOKIE_FORMAT = os.environ.get(
+    "AUTH_COOKIE_FORMAT", "b1" if AUTH_COOKIE_KEY else "gzip"
+)
+if AUTH_COOKIE_FORMAT == "b1" and not AUTH_COOKIE_KEY:
+    # Signing with the SECRET_KEY constant would let anyone forge cookies
+    msg = "AUTH_COOKIE_FORMAT=b1 requires AUTH_COOKIE_KEY"
+    raise RuntimeError(msg)
+# Keep reading gzip cookies written before b1. Turn off once they have expired,
+# see tuto_auth_cookie_decoded_total{format="gzip"}
+AUTH_COOKIE_READ_LEGACY = (
+    os.environ.get("AUTH_COOKIE_READ_LEGACY", "True").lower() == "true"
+)
+_cookie_key = cookie_codec.derive_key(AUTH_COOKIE_KEY) if AUTH_COOKIE_KEY else None
+
+AUTH_COOKIE_DECODED = Counter(
+    "tuto_auth_cookie_decoded_total",
+    "Auth cookies decoded, by format and result (ok or rejected)",
+    ["format", "result"],
+)
+
+
+@cache
+def get_pwd_context() -> "CryptContext":
+    """パスワードのハッシュ設定 (passlib は初回のみインポートする)"""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def __getattr__(name: str) -> Any:
+    # pwd_context used to be created at import time
+    if name == "pwd_context":
+        return get_pwd_context()
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """パスワードの検証"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def hash_password(password: str) -> str:
     """パスワードをハッシュ化"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
+    import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(UTC) + expires_delta
@@ -66,76 +111,56 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
 
 def get_token_source(token: str) -> str | None:
     """JWTトークンのヘッダーを見て、どちらが発行したトークンか判別する"""
-    try:
-        # JWTを '.' で分割してヘッダー部分を取得
-        header_b64 = token.split(".")[0]
-
-        # Base64URLデコード（パディング調整）
-        # Base64URLでは '-' を '+' に、'_' を '/' に置換
-        header_b64 += "=" * (4 - len(header_b64) % 4)  # パディング調整
-        header_b64 = header_b64.replace("-", "+").replace("_", "/")
-
-        # Base64デコードしてJSONパース
-        header_json = base64.b64decode(header_b64).decode("utf-8")
-        header = json.loads(header_json)
-
-        # アルゴリズムで判別
-        if header.get("alg") == "HS256":
-            return "old"
-        if header.get("alg") == "RS256":
-            return "cognito"
-
-        # issuerがヘッダーにある場合（稀ですが）
-        if header.get("iss") and "cognito" in header.get("iss"):
-            return "cognito"
-
-        return "unknown"
-
-    except Exception as e:
-        print(f"トークン解析エラー: {e}")
-        return "invalid"
+    return parse_token(token).source
 
 
 def get_token_source_by_payload(token: str) -> str | None:
     """JWTトークンのペイロードのissuerを見て判別する"""
     try:
-        # ペイロード部分を取得
-        payload_b64 = token.split(".")[1]
-
-        # Base64URLデコード
-        payload_b64 += "=" * (4 - len(payload_b64) % 4)
-        payload_b64 = payload_b64.replace("-", "+").replace("_", "/")
-
-        payload_json = base64.b64decode(payload_b64).decode("utf-8")
-        payload = json.loads(payload_json)
+        claims = parse_token(token).claims
+    except MalformedTokenError as e:
+        logger.warning("Malformed token: %s", e)
+        return "invalid"
 
-        # issuerで判別
-        if payload.get("iss") and "cognito-idp" in payload.get("iss"):
-            return "cognito"
+    # issuerで判別
+    issuer = claims.get("iss")
+    if isinstance(issuer, str) and "cognito-idp" in issuer:
+        return "cognito"
 
-        return "old"
-
-    except Exception as e:
-        print(f"トークン解析エラー: {e}")
-        return "invalid"
+    return "old"
 
 
 def encode_cookie_data(data: dict[str, Any]) -> str:
     """複数の値を1つのCookieにエンコード"""
-    json_str = json.dumps(data, separators=(",", ":"))
-    compressed = gzip.compress(json_str.encode("utf-8"))
-    return base64.b64encode(compressed).decode("utf-8")
+    if _cookie_key is None or AUTH_COOKIE_FORMAT == "gzip":
+        return cookie_codec.encode_legacy(data)
+    return cookie_codec.encode_binary(data, _cookie_key)
 
 
 def decode_cookie_data(cookie_value: str) -> dict[str, Any]:
     """エンコードされたCookieデータをデコード"""
+    if cookie_value.startswith(cookie_codec.BINARY_PREFIX):
+        try:
+            if _cookie_key is None:
+                msg = "AUTH_COOKIE_KEY is not set"
+                raise cookie_codec.CookieFormatError(msg)
+            data = cookie_codec.decode_binary(cookie_value, _cookie_key)
+        except cookie_codec.CookieFormatError as e:
+            logger.warning("Rejected auth cookie: %s", e)
+            data = {}
+        AUTH_COOKIE_DECODED.labels("b1", "ok" if data else "rejected").inc()
+        return data
+
+    if not AUTH_COOKIE_READ_LEGACY:
+        AUTH_COOKIE_DECODED.labels("gzip", "rejected").inc()
+        return {}
     try:
-        compressed = base64.b64decode(cookie_value.encode("utf-8"))
-        json_str = gzip.decompress(compressed).decode("utf-8")
-        return json.loads(json_str)
+        data = cookie_codec.decode_legacy(cookie_value)
     except Exception:
         logger.exception("Failed to decode cookie data unexpectedly")
-        return {}
+        data = {}
+    AUTH_COOKIE_DECODED.labels("gzip", "ok" if data else "rejected").inc()
+    return data
 
 
 class OAuth2PasswordOTPBearerUsingCookie(OAuth2):
@@ -0,0 +1,70 @@
+import os
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
+AWS_REGION = os.environ.get("AWS_DEFAULT_REGION", "ap-northeast-1")
+# HTTP connections kept per client. Should be at least the number of threads
+# calling the client concurrently (see COGNITO_EXECUTOR_WORKERS).
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "16"))
+AWS_CONNECT_TIMEOUT = float(os.environ.get("AWS_CONNECT_TIMEOUT", "3"))
+AWS_READ_TIMEOUT = float(os.environ.get("AWS_READ_TIMEOUT", "10"))
+# Requests made per call, the first one included
+AWS_MAX_ATTEMPTS = int(os.environ.get("AWS_MAX_ATTEMPTS", "3"))
+
+_clients: dict[tuple[str, str], "BaseClient"] = {}
+_clients_pid: int = os.getpid()
+_lock = threading.Lock()
+
+
+def get_client(service_name: str, region_name: str | None = None) -> "BaseClient":
+    """
+    boto3 client for service_name, created on first use and shared by the process.
+
+    boto3 clients are thread safe, so one client (and its connection pool) serves
+    every request of a worker. Clients are not shared across a fork.
+    """
+    global _clients_pid
+
+    key = (service_name, region_name or AWS_REGION)
+    client = _clients.get(key)
+    if client is not None and _clients_pid == os.getpid():
+        return client
+
+    with _lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+
+        client = _clients.get(key)
+        if client is None:
+            client = _create_client(*key)
+            _clients[key] = client
+        return client
+
+
+def _create_client(service_name: str, region_name: str) -> "BaseClient":
+    # Imported here so that deployments without AWS auth never load boto3
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        tcp_keepalive=True,
+        # "max_attempts" would count the retries only
+        retries={"total_max_attempts": AWS_MAX_ATTEMPTS, "mode": "standard"},
+    )
+    # A session per client: creating clients from the default session is not
+    # thread safe
+    return boto3.session.Session().client(
+        service_name, region_name=region_name, config=config
+    )
+
+
+def reset_clients() -> None:
+    with _lock:
+        _clients.clear()
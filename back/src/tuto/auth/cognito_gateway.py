@@ -0,0 +1,147 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from prometheus_client import Gauge, Histogram
+
+from tuto.auth.exceptions import CognitoUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# Threads dedicated to blocking Cognito/SES calls, so that they never wait behind
+# (or starve) other work on the default executor
+COGNITO_EXECUTOR_WORKERS = int(os.environ.get("COGNITO_EXECUTOR_WORKERS", "16"))
+# Calls allowed in flight at once, callers beyond it wait within their timeout
+COGNITO_MAX_CONCURRENCY = int(
+    os.environ.get("COGNITO_MAX_CONCURRENCY", str(COGNITO_EXECUTOR_WORKERS))
+)
+# Seconds a call may take, including the wait for a free slot
+COGNITO_CALL_TIMEOUT = float(os.environ.get("COGNITO_CALL_TIMEOUT", "10"))
+
+CALL_SECONDS = Histogram(
+    "tuto_cognito_call_seconds",
+    "Time spent waiting for and running a blocking AWS auth call",
+    ["operation", "outcome"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+CALLS_IN_FLIGHT = Gauge(
+    "tuto_cognito_calls_in_flight",
+    "Number of blocking AWS auth calls running on the gateway executor",
+    multiprocess_mode="livesum",
+)
+
+
+class CognitoGateway:
+    """
+    Runs blocking boto3 calls for Cognito (and SES) off the event loop.
+
+    Calls run on a dedicated thread pool, at most max_concurrency at a time, and
+    fail with CognitoUnavailableError when they do not finish within their timeout.
+    A timed out call keeps its slot until the thread returns, so a hanging AWS
+    endpoint cannot pile up threads. Exceptions raised by the call (including the
+    client's modeled ClientError subclasses) propagate unchanged.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = COGNITO_EXECUTOR_WORKERS,
+        max_concurrency: int = COGNITO_MAX_CONCURRENCY,
+        timeout: float = COGNITO_CALL_TIMEOUT,
+    ) -> None:
+        self.max_workers: int = max_workers
+        self.max_concurrency: int = max_concurrency
+        self.timeout: float = timeout
+        self._executor: ThreadPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="cognito"
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def call(
+        self,
+        operation: str,
+        func: Callable[..., Any],
+        *args: Any,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Run func(*args, **kwargs) on the gateway executor.
+
+        :param operation: Name of the AWS operation, used as the metric label.
+        :param func: Blocking callable, usually a boto3 client or wrapper method.
+        :param timeout: Seconds to wait, defaults to the gateway's timeout.
+        :return: The return value of func.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+        semaphore = self._get_semaphore()
+        started = time.perf_counter()
+        outcome = "success"
+        try:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    await semaphore.acquire()
+            except TimeoutError:
+                outcome = "timeout"
+                msg = f"Timed out waiting for a free slot for {operation}"
+                raise CognitoUnavailableError(msg) from None
+
+            try:
+                future = loop.run_in_executor(
+                    self._get_executor(), functools.partial(func, *args, **kwargs)
+                )
+            except BaseException:
+                semaphore.release()
+                raise
+            CALLS_IN_FLIGHT.inc()
+            future.add_done_callback(self._release)
+
+            try:
+                async with asyncio.timeout_at(deadline):
+                    # Shielded so that the slot is held until the thread is done
+                    return await asyncio.shield(future)
+            except TimeoutError:
+                outcome = "timeout"
+                logger.warning(f"Cognito call {operation} timed out")
+                msg = f"Timed out calling {operation}"
+                raise CognitoUnavailableError(msg) from None
+        except CognitoUnavailableError:
+            raise
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            CALL_SECONDS.labels(operation, outcome).observe(
+                time.perf_counter() - started
+            )
+
+    def _release(self, future: asyncio.Future) -> None:
+        CALLS_IN_FLIGHT.dec()
+        if self._semaphore is not None:
+            self._semaphore.release()
+        if not future.cancelled():
+            # Retrieve the exception of calls nobody awaits anymore
+            future.exception()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+cognito_gateway = CognitoGateway()
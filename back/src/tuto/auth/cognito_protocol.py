@@ -1,16 +1,19 @@
 import logging
 import os
 import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
 
-import boto3
-from asyncpg import CaseNotFoundError
 from fastapi import HTTPException, status
 
+from tuto.auth.aws_clients import get_client
+from tuto.auth.cognito_gateway import CognitoGateway, cognito_gateway
 from tuto.auth.cognito_idp_action import CognitoIdentityProviderWrapper
 from tuto.auth.cognito_token_manager import AuthenticationSession, CognitoTokenManager
 from tuto.auth.exceptions import (
     CodeMismatchError,
     CognitoPasswordResetError,
+    CognitoUnavailableError,
     EmailDeliveryError,
     EmailTemplateError,
     InvalidAccessTokenError,
@@ -21,32 +24,102 @@ from tuto.auth.exceptions import (
 )
 from tuto.auth.protocol import AuthProtocol, Challenge, Token, TokenData
 
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
 logger = logging.getLogger(__name__)
 
-COGNITO_USER_POOL_ID = os.environ["AWS_COGNITO_USER_POOL_ID"]
-COGNITO_CLIENT_ID = os.environ["AWS_COGNITO_CLIENT_ID"]
 REGION_NAME = os.environ.get("AWS_DEFAULT_REGION", "ap-northeast-1")
 
-cognito_idp_client = boto3.client("cognito-idp", region_name=REGION_NAME)
+_cog_wrapper: CognitoIdentityProviderWrapper | None = None
+_token_manager: CognitoTokenManager | None = None
 
-cog_wrapper = CognitoIdentityProviderWrapper(
-    cognito_idp_client,
-    COGNITO_USER_POOL_ID,
-    COGNITO_CLIENT_ID,
-)
-token_manager = CognitoTokenManager(
-    cognito_idp_client,
-    COGNITO_USER_POOL_ID,
-    COGNITO_CLIENT_ID,
-    REGION_NAME,
-)
+
+def get_cog_wrapper() -> CognitoIdentityProviderWrapper:
+    """Cognito のアクションを生成する (初回のみ)"""
+    global _cog_wrapper
+    if _cog_wrapper is None:
+        _cog_wrapper = CognitoIdentityProviderWrapper(
+            get_client("cognito-idp", REGION_NAME),
+            os.environ["AWS_COGNITO_USER_POOL_ID"],
+            os.environ["AWS_COGNITO_CLIENT_ID"],
+        )
+    return _cog_wrapper
+
+
+def get_token_manager() -> CognitoTokenManager:
+    """トークンマネージャを生成する (初回のみ)"""
+    global _token_manager
+    if _token_manager is None:
+        _token_manager = CognitoTokenManager(
+            get_client("cognito-idp", REGION_NAME),
+            os.environ["AWS_COGNITO_USER_POOL_ID"],
+            os.environ["AWS_COGNITO_CLIENT_ID"],
+            REGION_NAME,
+        )
+    return _token_manager
+
+
+async def aclose() -> None:
+    """生成済みのリソースを解放する"""
+    if _token_manager is not None:
+        await _token_manager.key_store.aclose()
+
+
+def __getattr__(name: str) -> Any:
+    # The clients used to be created at import time under these names
+    if name == "cognito_idp_client":
+        return get_client("cognito-idp", REGION_NAME)
+    if name == "cog_wrapper":
+        return get_cog_wrapper()
+    if name == "token_manager":
+        return get_token_manager()
+    if name == "COGNITO_USER_POOL_ID":
+        return os.environ["AWS_COGNITO_USER_POOL_ID"]
+    if name == "COGNITO_CLIENT_ID":
+        return os.environ["AWS_COGNITO_CLIENT_ID"]
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
+
+def _cognito_unavailable_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is temporarily unavailable",
+        headers={"Retry-After": "1"},
+    )
 
 
 class CognitoAuthService(AuthProtocol):
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        wrapper: CognitoIdentityProviderWrapper | None = None,
+        manager: CognitoTokenManager | None = None,
+        gateway: CognitoGateway | None = None,
+    ) -> None:
+        """
+        :param wrapper: Cognito actions, e.g. around a stubbed client in tests.
+        :param manager: Token manager using the same client.
+        :param gateway: Executor for the blocking calls.
+        """
         super().__init__()
-        self.cog_wrapper = cog_wrapper
-        self.token_manager = token_manager
+        self.cog_wrapper = wrapper or get_cog_wrapper()
+        self.token_manager = manager or get_token_manager()
+        self.gateway = gateway or cognito_gateway
+
+    @property
+    def client(self) -> "BaseClient":
+        """The boto3 client, for its modeled exception classes"""
+        return self.cog_wrapper.cognito_idp_client
+
+    async def _call(
+        self, operation: str, func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        """Run a blocking Cognito call through the gateway"""
+        try:
+            return await self.gateway.call(operation, func, *args, **kwargs)
+        except CognitoUnavailableError as exc:
+            raise _cognito_unavailable_exception() from exc
 
     async def signin(
         self,
@@ -55,13 +128,22 @@ class CognitoAuthService(AuthProtocol):
         challenge_name: str = "",
     ) -> Token | Challenge:
         try:
-            auth_session: AuthenticationSession = self.cog_wrapper.initiate_auth(
-                username, password
+            response: dict = await self._call(
+                "admin_initiate_auth",
+                self.cog_wrapper.start_sign_in,
+                username,
+                password,
+            )
+        except self.client.exceptions.UserNotFoundException:
+            raise UserNotFoundError(
+                f"User {username} not found",
+                username=username,
+                error_code="USER_NOT_FOUND",
             )
-        except self.cog_wrapper.client.exceptions.UserNotFoundException:
-            raise CaseNotFoundError("User not found")
-        except self.cog_wrapper.client.exceptions.NotAuthorizedException:
+        except self.client.exceptions.NotAuthorizedException:
             raise NotAuthorizedError("Incorrect username or password")
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Unexpected error during sign-in: {e}")
             raise HTTPException(
@@ -69,35 +151,33 @@ class CognitoAuthService(AuthProtocol):
                 detail="Internal server error",
             )
 
-        if (
-            auth_session.challenge_name == "NEW_PASSWORD_REQUIRED"
-            or auth_session.challenge_name == "SMS_MFA"
-            or auth_session.challenge_name == "SOFTWARE_TOKEN_MFA"
+        next_challenge_name = response.get("ChallengeName")
+        if next_challenge_name in (
+            "NEW_PASSWORD_REQUIRED",
+            "SMS_MFA",
+            "SOFTWARE_TOKEN_MFA",
+            "EMAIL_OTP",
         ):
             return Challenge(
-                challenge_name=auth_session.challenge_name,
+                challenge_name=next_challenge_name,
                 username=username,
-                session=auth_session.session,
-            )
-        elif auth_session.challenge_name is None:
-            tokens = self.token_manager.decode_tokens(
-                auth_session.authentication_result
+                session=response["Session"],
             )
+        elif next_challenge_name is None:
+            auth_tokens: dict = response["AuthenticationResult"]
             return Token(
-                access_token=tokens["access_token"],
-                id_token=tokens.get("id_token"),
-                refresh_token=tokens.get("refresh_token"),
-                token_type=auth_session.authentication_result.get(
-                    "TokenType", "Bearer"
-                ),
-                expires_in=auth_session.authentication_result.get("ExpiresIn", 3600),
+                access_token=auth_tokens["AccessToken"],
+                id_token=auth_tokens.get("IdToken"),
+                refresh_token=auth_tokens.get("RefreshToken"),
+                token_type=auth_tokens.get("TokenType", "Bearer"),
+                expires_in=auth_tokens.get("ExpiresIn", 3600),
                 token_issued_time=time.time(),
             )
         else:
-            logger.error(f"Unsupported challenge: {auth_session.challenge_name}")
+            logger.error(f"Unsupported challenge: {next_challenge_name}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported challenge: {auth_session.challenge_name}",
+                detail=f"Unsupported challenge: {next_challenge_name}",
             )
 
     async def respond_to_new_password_challenge(
@@ -110,7 +190,9 @@ class CognitoAuthService(AuthProtocol):
         username = username.strip()
         new_password = new_password.strip()
 
-        response = respond_to_require_new_password(username, session, new_password)
+        response = await self._respond_to_require_new_password(
+            username, session, new_password
+        )
 
         if "AuthenticationResult" in response:
             auth_tokens: dict = response["AuthenticationResult"]
@@ -147,7 +229,9 @@ class CognitoAuthService(AuthProtocol):
         username = username.strip()
         email_otp_code = email_otp_code.strip()
 
-        auth_tokens: dict = verify_mfa_code(username, session, email_otp_code)
+        auth_tokens: dict = await self._verify_mfa_code(
+            username, session, email_otp_code
+        )
         return Token(
             access_token=auth_tokens["AccessToken"],
             id_token=auth_tokens["IdToken"],
@@ -167,8 +251,8 @@ class CognitoAuthService(AuthProtocol):
             "RefreshToken": refresh_token,
         }
 
-        session = AuthenticationSession(token_manager, auth_tokens)
-        session.refresh()
+        session = AuthenticationSession(self.token_manager, auth_tokens)
+        await self._call("refresh_tokens", session.refresh)
 
         return Token(
             access_token=session.access_token,
@@ -189,8 +273,8 @@ class CognitoAuthService(AuthProtocol):
             "RefreshToken": refresh_token,
         }
 
-        session = AuthenticationSession(token_manager, auth_tokens)
-        return session.sign_out()
+        session = AuthenticationSession(self.token_manager, auth_tokens)
+        return await self._call("sign_out", session.sign_out)
 
     async def get_token_info(
         self,
@@ -204,16 +288,20 @@ class CognitoAuthService(AuthProtocol):
             "TokenIssuedTime": token_issued_time if token_issued_time else time.time(),
         }
 
-        session = AuthenticationSession(token_manager, auth_tokens)
+        session = AuthenticationSession(self.token_manager, auth_tokens)
         # Run lightweight token validation
-        session.validate_token()
+        session.check_expiration()
         # Also perform detailed verification
-        claims = token_manager.verify_token(session.access_token, verify_signature=True)
+        claims = await self.token_manager.averify_token(session.access_token)
         username = claims.get("username")
         if username is None:
             msg = "username is None"
             raise InvalidAccessTokenError(msg)
-        return TokenData(username=username)
+        # check_expiration treats the token as expired 5 minutes early
+        expires_at = session.token_issued_time + session.expires_in - 300
+        if "exp" in claims:
+            expires_at = min(expires_at, claims["exp"])
+        return TokenData(username=username, expires_at=expires_at)
 
     async def change_password(
         self,
@@ -228,8 +316,10 @@ class CognitoAuthService(AuthProtocol):
         auth_tokens = {
             "AccessToken": access_token,
         }
-        session = AuthenticationSession(token_manager, auth_tokens)
-        session.change_password(old_password, new_password)
+        session = AuthenticationSession(self.token_manager, auth_tokens)
+        await self._call(
+            "change_password", session.change_password, old_password, new_password
+        )
 
     async def forgot_password(self, username: str, email: str = None) -> dict:
         """
@@ -241,8 +331,8 @@ class CognitoAuthService(AuthProtocol):
         :return: Information about the password reset process.
         """
         try:
-            from auth.utils.email_sender import send_temporary_password_email
-            from auth.utils.password_generator import generate_temporary_password
+            from tuto.auth.utils.email_sender import send_temporary_password_email
+            from tuto.auth.utils.password_generator import generate_temporary_password
 
             # Generate secure temporary password
             try:
@@ -256,15 +346,21 @@ class CognitoAuthService(AuthProtocol):
 
             # Set temporary password for the user (permanent=False forces password change)
             try:
-                cog_wrapper.admin_set_user_password(
-                    username, temporary_password, permanent=False
+                await self._call(
+                    "admin_set_user_password",
+                    self.cog_wrapper.admin_set_user_password,
+                    username,
+                    temporary_password,
+                    permanent=False,
                 )
-            except cognito_idp_client.exceptions.UserNotFoundException as e:
+            except self.client.exceptions.UserNotFoundException as e:
                 logger.warning(f"User not found during password set: {username}")
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="User not found",
                 ) from e
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Failed to set temporary password for {username}: {e}")
                 raise CognitoPasswordResetError(
@@ -275,8 +371,10 @@ class CognitoAuthService(AuthProtocol):
 
             # Get user's email address for sending temporary password
             try:
-                user_info = cognito_idp_client.admin_get_user(
-                    UserPoolId=cog_wrapper.user_pool_id,
+                user_info = await self._call(
+                    "admin_get_user",
+                    self.client.admin_get_user,
+                    UserPoolId=self.cog_wrapper.user_pool_id,
                     Username=username,
                 )
 
@@ -301,8 +399,12 @@ class CognitoAuthService(AuthProtocol):
 
                 # Send temporary password via email
                 try:
-                    message_id = send_temporary_password_email(
-                        user_email, username, temporary_password
+                    message_id = await self._call(
+                        "send_email",
+                        send_temporary_password_email,
+                        user_email,
+                        username,
+                        temporary_password,
                     )
                     masked_email = (
                         user_email[:2] + "***@***" + user_email[user_email.rfind(".") :]
@@ -331,7 +433,7 @@ class CognitoAuthService(AuthProtocol):
                         detail="Failed to send temporary password email",
                     ) from e
 
-            except cognito_idp_client.exceptions.UserNotFoundException:
+            except self.client.exceptions.UserNotFoundException:
                 # This should be caught by the outer handler, but adding here for safety
                 raise UserNotFoundError(
                     f"User {username} not found",
@@ -351,17 +453,17 @@ class CognitoAuthService(AuthProtocol):
         except HTTPException:
             # Re-raise HTTP exceptions as-is
             raise
-        except cognito_idp_client.exceptions.UserNotFoundException as exc:
+        except self.client.exceptions.UserNotFoundException as exc:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found",
             ) from exc
-        except cognito_idp_client.exceptions.LimitExceededException as exc:
+        except self.client.exceptions.LimitExceededException as exc:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail="Request limit exceeded, please try again later",
             ) from exc
-        except cognito_idp_client.exceptions.InvalidParameterException as exc:
+        except self.client.exceptions.InvalidParameterException as exc:
             logger.error(f"Invalid parameter for password reset: {exc}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -386,7 +488,9 @@ class CognitoAuthService(AuthProtocol):
         :return: Information about the created user.
         """
         try:
-            response = cog_wrapper.admin_create_user(
+            response = await self._call(
+                "admin_create_user",
+                self.cog_wrapper.admin_create_user,
                 user_name=username,
                 email=email,
                 temporary_password=temporary_password,
@@ -402,18 +506,20 @@ class CognitoAuthService(AuthProtocol):
                 "created": True,
             }
 
-        except cognito_idp_client.exceptions.UsernameExistsException as e:
+        except self.client.exceptions.UsernameExistsException as e:
             logger.warning(f"User already exists in Cognito: {username}")
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="User already exists in Cognito",
             ) from e
-        except cognito_idp_client.exceptions.InvalidParameterException as e:
+        except self.client.exceptions.InvalidParameterException as e:
             logger.error(f"Invalid parameter for user creation: {e}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid parameters for creating Cognito user",
             ) from e
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to create Cognito user {username}: {e}")
             raise HTTPException(
@@ -442,7 +548,9 @@ class CognitoAuthService(AuthProtocol):
 
             # Update email if provided
             if email:
-                cog_wrapper.admin_update_user_attributes(
+                await self._call(
+                    "admin_update_user_attributes",
+                    self.cog_wrapper.admin_update_user_attributes,
                     user_name=username,
                     user_attributes={
                         "email": email,
@@ -455,7 +563,9 @@ class CognitoAuthService(AuthProtocol):
             if password:
                 # Permanent = not password_is_temporary
                 permanent = not password_is_temporary
-                cog_wrapper.admin_set_user_password(
+                await self._call(
+                    "admin_set_user_password",
+                    self.cog_wrapper.admin_set_user_password,
                     user_name=username,
                     password=password,
                     permanent=permanent,
@@ -468,18 +578,20 @@ class CognitoAuthService(AuthProtocol):
                 "updated": True,
             }
 
-        except cognito_idp_client.exceptions.UserNotFoundException as e:
+        except self.client.exceptions.UserNotFoundException as e:
             logger.warning(f"User not found in Cognito: {username}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found in Cognito",
             ) from e
-        except cognito_idp_client.exceptions.InvalidParameterException as e:
+        except self.client.exceptions.InvalidParameterException as e:
             logger.error(f"Invalid parameter for user update: {e}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid parameters for updating Cognito user",
             ) from e
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to update Cognito user {username}: {e}")
             raise HTTPException(
@@ -495,19 +607,25 @@ class CognitoAuthService(AuthProtocol):
         :return: Information about the deleted user.
         """
         try:
-            cog_wrapper.admin_delete_user(user_name=username)
+            await self._call(
+                "admin_delete_user",
+                self.cog_wrapper.admin_delete_user,
+                user_name=username,
+            )
 
             return {
                 "username": username,
                 "deleted": True,
             }
 
-        except cognito_idp_client.exceptions.UserNotFoundException as e:
+        except self.client.exceptions.UserNotFoundException as e:
             logger.warning(f"User not found in Cognito: {username}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found in Cognito",
             ) from e
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to delete Cognito user {username}: {e}")
             raise HTTPException(
@@ -515,43 +633,43 @@ class CognitoAuthService(AuthProtocol):
                 detail="Failed to delete Cognito user",
             ) from e
 
-
-def start_sign_in(username: str, password: str) -> dict:
-    try:
-        response = cog_wrapper.start_sign_in(username, password)
-    except cognito_idp_client.exceptions.NotAuthorizedException as exc:
-        raise NotAuthorizedError(exc.response["Error"]["Message"]) from exc
-    else:
+    async def _verify_mfa_code(
+        self, username: str, session: str, email_otp_code: str
+    ) -> dict:
+        try:
+            response: dict = await self._call(
+                "admin_respond_to_auth_challenge",
+                self.cog_wrapper.respond_to_email_otp_challenge,
+                username,
+                session,
+                email_otp_code,
+            )
+        except self.client.exceptions.CodeMismatchException as exc:
+            raise CodeMismatchError(exc.response["Error"]["Message"]) from exc
+        except self.client.exceptions.NotAuthorizedException as exc:
+            raise NotAuthorizedError(exc.response["Error"]["Message"]) from exc
         return response
 
-
-def verify_mfa_code(username: str, session: str, email_otp_code: str) -> dict:
-    try:
-        response: dict = cog_wrapper.respond_to_email_otp_challenge(
-            username,
-            session,
-            email_otp_code,
-        )
-    except cognito_idp_client.exceptions.CodeMismatchException as exc:
-        raise CodeMismatchError(exc.response["Error"]["Message"]) from exc
-    except cognito_idp_client.exceptions.NotAuthorizedException as exc:
-        raise NotAuthorizedError(exc.response["Error"]["Message"]) from exc
-    return response
-
-
-def respond_to_require_new_password(username: str, session: str, new_password: str):
-    try:
-        response = cog_wrapper.respond_to_new_password_challenge(
-            username,
-            session,
-            new_password,
-        )
-    except cognito_idp_client.exceptions.NotAuthorizedException as exc:
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"{exc.response['Error']['Code']}: {exc.response['Error']['Message']}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-        raise credentials_exception
-    else:
-        return response
+    async def _respond_to_require_new_password(
+        self, username: str, session: str, new_password: str
+    ) -> dict:
+        try:
+            response = await self._call(
+                "admin_respond_to_auth_challenge",
+                self.cog_wrapper.respond_to_new_password_challenge,
+                username,
+                session,
+                new_password,
+            )
+        except self.client.exceptions.NotAuthorizedException as exc:
+            credentials_exception = HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=(
+                    f"{exc.response['Error']['Code']}: "
+                    f"{exc.response['Error']['Message']}"
+                ),
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            raise credentials_exception
+        else:
+            return response
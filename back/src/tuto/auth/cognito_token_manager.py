@@ -2,10 +2,11 @@ import logging
 import sys
 import time
 from logging import INFO, StreamHandler, getLogger
+from typing import Any
 
-import requests
 from botocore.exceptions import ClientError
 from jose import JWTError, jwt
+from jose.backends.base import Key
 
 from tuto.auth.exceptions import (
     AccessTokenExpirationError,
@@ -13,6 +14,8 @@ from tuto.auth.exceptions import (
     InvalidAccessTokenError,
     NotAuthorizedError,
 )
+from tuto.auth.jwks import JWKSKeyStore
+from tuto.auth.parsed_token import MalformedTokenError, parse_token
 
 logger = getLogger(__name__)
 formatter = logging.Formatter("%(levelname)s: %(asctime)s - %(message)s")
@@ -32,55 +35,55 @@ class CognitoTokenManager:
         self.client_id = client_id
         self.region = region
         self.jwks_url = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}/.well-known/jwks.json"
-        self._jwks_cache = None
-        self._jwks_cache_time = 0
-
-    def get_jwks(self):
-        """Get JWKS keys (with caching functionality)"""
-        current_time = time.time()
-        # Cache for 1 hour
-        if self._jwks_cache is None or current_time - self._jwks_cache_time > 3600:
-            try:
-                response = requests.get(self.jwks_url, timeout=10)
-                response.raise_for_status()
-                self._jwks_cache = response.json()
-                self._jwks_cache_time = current_time
-            except requests.RequestException as e:
-                logger.error(f"Failed to retrieve JWKS: {e}")
-                raise
-        return self._jwks_cache
-
-    def verify_token(self, access_token, verify_signature=True):
+        self.key_store = JWKSKeyStore(self.jwks_url)
+
+    async def averify_token(self, access_token: str) -> dict[str, Any]:
+        """
+        Verify Access Token, fetching the signing key without blocking the event loop
+
+        :param access_token: Access Token to verify
+        :return: Claims if token is valid
+        """
+        try:
+            kid = parse_token(access_token).kid
+        except MalformedTokenError as e:
+            logger.error(f"Token verification error: {e}")
+            raise InvalidAccessTokenError(f"Token verification error: {e}") from e
+
+        key = await self.key_store.get_key(kid)
+        if key is None:
+            # Checked here, verify_token would fetch the key set again, blocking
+            logger.error("Token verification error: Corresponding JWK not found")
+            raise InvalidAccessTokenError(
+                "Token verification error: Corresponding JWK not found"
+            )
+        return self.verify_token(access_token, key=key)
+
+    def verify_token(self, access_token, verify_signature=True, key: Key | None = None):
         """
         Verify Access Token
 
         :param access_token: Access Token to verify
         :param verify_signature: Whether to perform signature verification
+        :param key: Signing key, looked up in the JWKS key store by kid if omitted.
+            Prefer averify_token in async code, the lookup may block on a fetch
         :return: Claims if token is valid, None if invalid
         """
         try:
             if verify_signature:
-                # Perform signature verification using JWKS
-                jwks = self.get_jwks()
-
-                # Get token header and check kid
-                unverified_header = jwt.get_unverified_header(access_token)
-                kid = unverified_header.get("kid")
+                if key is None:
+                    # Look up the key by the kid in the token header, fetching
+                    # the key set (blocking) if it is not known yet
+                    kid = parse_token(access_token).kid
+                    key = self.key_store.get_key_blocking(kid)
 
-                # Find corresponding JWK
-                jwk = None
-                for key in jwks["keys"]:
-                    if key["kid"] == kid:
-                        jwk = key
-                        break
-
-                if not jwk:
+                if not key:
                     raise JWTError("Corresponding JWK not found")
 
                 # Verify and decode token
                 claims = jwt.decode(
                     access_token,
-                    jwk,
+                    key,
                     algorithms=["RS256"],
                     audience=self.client_id,
                     issuer=f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}",
@@ -248,8 +251,8 @@ class AuthenticationSession:
         self.expires_in = auth_tokens.get("ExpiresIn", 3600)
         self.token_issued_time = auth_tokens.get("TokenIssuedTime", time.time())
 
-    def validate_token(self):
-        """Validate Access Token"""
+    def check_expiration(self) -> None:
+        """Lightweight time-based check of Access Token"""
         if not self.access_token:
             raise InvalidAccessTokenError("Access Token is empty")
 
@@ -258,6 +261,10 @@ class AuthenticationSession:
         if elapsed_time >= (self.expires_in - 300):  # 5 minutes buffer
             raise AccessTokenExpirationError("Access Token is approaching expiration")
 
+    def validate_token(self):
+        """Validate Access Token"""
+        self.check_expiration()
+
         # Actual token verification
         self.token_manager.verify_token(self.access_token)
 
@@ -0,0 +1,200 @@
+import base64
+import binascii
+import gzip
+import hashlib
+import hmac
+import json
+import struct
+from typing import Any
+
+# Codecs of the "ad" auth cookie.
+#
+# The legacy format is base64 of gzip-compressed JSON, unsigned. The binary format
+# is "b1." followed by base64 of
+#
+#     bitmap (1 byte, bit i set when FIELDS[i] is present)
+#     the present fields in FIELDS order:
+#         str    length (2 bytes, big endian) + UTF-8
+#         token  segment count (1 byte) + each "."-separated base64url segment
+#                decoded, as length (2 bytes) + bytes. Values that are not
+#                unpadded base64url segments are stored as count 0 + str
+#         int    8 bytes, big endian, signed
+#         float  8 bytes, big endian IEEE 754
+#     tag (16 bytes): HMAC-SHA256 of "b1." + bitmap + fields, truncated
+#
+# so decoding is a MAC check and a few struct unpacks, and a tampered cookie is
+# rejected before any of it is read. Tokens are JWTs, already base64url: storing
+# their bytes keeps Cognito cookies, which hold two tokens, under the 4 KB limit.
+BINARY_PREFIX = "b1."
+_PREFIX_BYTES = BINARY_PREFIX.encode("ascii")
+TAG_SIZE = 16
+
+# Cookie keys in bitmap order. Values of int and float fields are kept as the
+# strings the router writes (str(expires_in), str(token_issued_time))
+FIELDS: tuple[tuple[str, str], ...] = (
+    ("at", "token"),
+    ("rt", "token"),
+    ("tt", "str"),
+    ("exp", "int"),
+    ("iss", "float"),
+    ("user", "str"),
+    ("sess", "token"),
+)
+
+_LENGTH = struct.Struct(">H")
+_TO_URLSAFE = bytes.maketrans(b"+/", b"-_")
+_FROM_URLSAFE = bytes.maketrans(b"-_", b"+/")
+_NUMBERS: dict[str, tuple[type, struct.Struct]] = {
+    "int": (int, struct.Struct(">q")),
+    "float": (float, struct.Struct(">d")),
+}
+
+
+class CookieFormatError(ValueError):
+    """Cookie の値が壊れているか改ざんされている"""
+
+
+def derive_key(secret: str) -> bytes:
+    """署名用の鍵 (JWT と同じ鍵を直接使わない)"""
+    return hmac.new(
+        secret.encode("utf-8"), b"tuto auth cookie b1", hashlib.sha256
+    ).digest()
+
+
+def _tag(key: bytes, payload: bytes) -> bytes:
+    return hmac.digest(key, _PREFIX_BYTES + payload, hashlib.sha256)[:TAG_SIZE]
+
+
+def _token_segments(value: str) -> list[bytes] | None:
+    """base64url (パディングなし) を "." でつないだ値なら各部分のバイト列"""
+    segments = []
+    for segment in value.split("."):
+        encoded = segment.encode("ascii", "replace")
+        padding = b"=" * (-len(encoded) % 4)
+        try:
+            raw = binascii.a2b_base64(
+                encoded.translate(_FROM_URLSAFE) + padding, strict_mode=True
+            )
+        except binascii.Error:
+            return None
+        if _b64url(raw) != encoded:
+            return None
+        segments.append(raw)
+    if len(segments) > 255:
+        return None
+    return segments
+
+
+def _b64url(raw: bytes) -> bytes:
+    return binascii.b2a_base64(raw, newline=False).translate(_TO_URLSAFE).rstrip(b"=")
+
+
+def _pack_str(value: str, parts: list[bytes]) -> None:
+    encoded = value.encode("utf-8")
+    parts.append(_LENGTH.pack(len(encoded)))
+    parts.append(encoded)
+
+
+def encode_binary(data: dict[str, Any], key: bytes) -> str:
+    """
+    Encodes data in the binary format. None values are left out, unknown keys
+    raise CookieFormatError.
+    """
+    unknown = data.keys() - {name for name, _ in FIELDS}
+    if unknown:
+        msg = f"Unknown cookie fields: {', '.join(sorted(unknown))}"
+        raise CookieFormatError(msg)
+
+    bitmap = 0
+    parts = [b""]
+    for bit, (name, kind) in enumerate(FIELDS):
+        value = data.get(name)
+        if value is None:
+            continue
+        bitmap |= 1 << bit
+        if kind == "str":
+            _pack_str(value, parts)
+        elif kind == "token":
+            segments = _token_segments(value)
+            if segments is None:
+                parts.append(b"\x00")
+                _pack_str(value, parts)
+                continue
+            parts.append(bytes((len(segments),)))
+            for segment in segments:
+                parts.append(_LENGTH.pack(len(segment)))
+                parts.append(segment)
+        else:
+            convert, number = _NUMBERS[kind]
+            parts.append(number.pack(convert(value)))
+    parts[0] = bytes((bitmap,))
+    payload = b"".join(parts)
+    raw = payload + _tag(key, payload)
+    return BINARY_PREFIX + binascii.b2a_base64(raw, newline=False).decode("ascii")
+
+
+def decode_binary(cookie_value: str, key: bytes) -> dict[str, Any]:
+    """Decodes the binary format, raising CookieFormatError on a bad or forged value"""
+    encoded = cookie_value.removeprefix(BINARY_PREFIX)
+    try:
+        raw = binascii.a2b_base64(encoded, strict_mode=True)
+    except (binascii.Error, ValueError) as e:
+        msg = "Cookie is not base64"
+        raise CookieFormatError(msg) from e
+    if len(raw) <= TAG_SIZE:
+        msg = "Cookie is too short"
+        raise CookieFormatError(msg)
+
+    payload, tag = raw[:-TAG_SIZE], raw[-TAG_SIZE:]
+    if not hmac.compare_digest(tag, _tag(key, payload)):
+        msg = "Cookie signature does not match"
+        raise CookieFormatError(msg)
+
+    bitmap = payload[0]
+    offset = 1
+    data: dict[str, Any] = {}
+    try:
+        for bit, (name, kind) in enumerate(FIELDS):
+            if not bitmap & (1 << bit):
+                continue
+            if kind in _NUMBERS:
+                _, number = _NUMBERS[kind]
+                (value,) = number.unpack_from(payload, offset)
+                data[name] = str(value)
+                offset += number.size
+                continue
+
+            count = 0
+            if kind == "token":
+                count = payload[offset]
+                offset += 1
+            if count == 0:
+                (length,) = _LENGTH.unpack_from(payload, offset)
+                offset += _LENGTH.size
+                data[name] = payload[offset : offset + length].decode("utf-8")
+                offset += length
+                continue
+
+            segments = []
+            for _ in range(count):
+                (length,) = _LENGTH.unpack_from(payload, offset)
+                offset += _LENGTH.size
+                segments.append(_b64url(payload[offset : offset + length]))
+                offset += length
+            data[name] = b".".join(segments).decode("ascii")
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        msg = "Cookie fields are truncated"
+        raise CookieFormatError(msg) from e
+    return data
+
+
+def encode_legacy(data: dict[str, Any]) -> str:
+    json_str = json.dumps(data, separators=(",", ":"))
+    compressed = gzip.compress(json_str.encode("utf-8"))
+    return base64.b64encode(compressed).decode("utf-8")
+
+
+def decode_legacy(cookie_value: str) -> dict[str, Any]:
+    compressed = base64.b64decode(cookie_value.encode("utf-8"))
+    json_str = gzip.decompress(compressed).decode("utf-8")
+    return json.loads(json_str)
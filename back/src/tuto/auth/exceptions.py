@@ -26,6 +26,14 @@ class AccessDeniedError(Exception):
     pass
 
 
+class PasswordHasherBusyError(Exception):
+    pass
+
+
+class CognitoUnavailableError(Exception):
+    pass
+
+
 """
 Password reset specific exceptions
 """
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any
+
+import httpx
+from jose import jwk
+from jose.backends.base import Key
+from jose.exceptions import JWKError
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+JWKS_REFRESH = Counter(
+    "tuto_jwks_refresh_total",
+    "Number of JWKS fetches by result",
+    ["result"],
+)
+
+
+class JWKSKeyStore:
+    """
+    Public keys of a JWKS endpoint, parsed once and indexed by kid.
+
+    Keys are fetched asynchronously and refreshed in the background shortly before
+    they reach max_age. An unknown kid triggers an early refresh, at most once every
+    min_refresh_interval seconds. When a fetch fails the previous keys keep being
+    served. get_key_blocking serves synchronous callers, fetching with a blocking
+    request when the kid is unknown.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        *,
+        max_age: float = 3600,
+        refresh_ahead: float = 300,
+        min_refresh_interval: float = 30,
+        timeout: float = 10,
+    ) -> None:
+        self.jwks_url: str = jwks_url
+        self.max_age: float = max_age
+        self.refresh_ahead: float = refresh_ahead
+        self.min_refresh_interval: float = min_refresh_interval
+        self.timeout: float = timeout
+        self._keys: dict[str, Key] = {}
+        self._fetched_at: float | None = None
+        self._last_attempt: float | None = None
+        self._lock = asyncio.Lock()
+        self._blocking_lock = threading.Lock()
+        self._refresh_task: asyncio.Task | None = None
+        self._client: httpx.AsyncClient | None = None
+
+    def get_cached_key(self, kid: str | None) -> Key | None:
+        """Return the key for kid without doing any I/O"""
+        if kid is None:
+            return None
+        return self._keys.get(kid)
+
+    async def get_key(self, kid: str | None) -> Key | None:
+        """Return the key for kid, refreshing the key set if kid is unknown"""
+        self._ensure_background_refresh()
+        if kid is None:
+            return None
+
+        key = self._keys.get(kid)
+        if key is None:
+            # The user pool may have rotated its signing keys
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def refresh(self) -> bool:
+        """Fetch the key set, at most once every min_refresh_interval seconds"""
+        attempt_seen = self._last_attempt
+        async with self._lock:
+            if self._last_attempt != attempt_seen:
+                # Another coroutine refreshed while we were waiting for the lock
+                return self._last_attempt == self._fetched_at
+
+            now = self._begin_attempt()
+            if now is None:
+                return False
+            try:
+                keys = self._parse(await self._fetch())
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                JWKS_REFRESH.labels("failure").inc()
+                logger.error(f"Failed to retrieve JWKS: {e}")
+                return False
+            return self._store(keys, now)
+
+    def get_key_blocking(self, kid: str | None) -> Key | None:
+        """Return the key for kid, fetching the key set (blocking) if kid is unknown"""
+        if kid is None:
+            return None
+
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh_blocking()
+            key = self._keys.get(kid)
+        return key
+
+    def refresh_blocking(self) -> bool:
+        """Refresh without an event loop, for the synchronous verify_token"""
+        attempt_seen = self._last_attempt
+        with self._blocking_lock:
+            if self._last_attempt != attempt_seen:
+                return self._last_attempt == self._fetched_at
+
+            now = self._begin_attempt()
+            if now is None:
+                return False
+            try:
+                response = httpx.get(self.jwks_url, timeout=self.timeout)
+                response.raise_for_status()
+                keys = self._parse(response.json())
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                JWKS_REFRESH.labels("failure").inc()
+                logger.error(f"Failed to retrieve JWKS: {e}")
+                return False
+            return self._store(keys, now)
+
+    def _begin_attempt(self) -> float | None:
+        """取得を試みてよければ試行時刻を記録して返す (間隔が短すぎれば None)"""
+        now = time.monotonic()
+        if (
+            self._last_attempt is not None
+            and now - self._last_attempt < self.min_refresh_interval
+        ):
+            JWKS_REFRESH.labels("throttled").inc()
+            return None
+        self._last_attempt = now
+        return now
+
+    def _store(self, keys: dict[str, Key], fetched_at: float) -> bool:
+        self._keys = keys
+        self._fetched_at = fetched_at
+        JWKS_REFRESH.labels("success").inc()
+        return True
+
+    async def _fetch(self) -> dict[str, Any]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.get(self.jwks_url)
+        response.raise_for_status()
+        return response.json()
+
+    def _parse(self, jwks: dict[str, Any]) -> dict[str, Key]:
+        keys: dict[str, Key] = {}
+        for key_data in jwks["keys"]:
+            try:
+                keys[key_data["kid"]] = jwk.construct(
+                    key_data, key_data.get("alg", "RS256")
+                )
+            except (JWKError, KeyError) as e:
+                logger.warning(f"Skipping unusable JWK {key_data.get('kid')}: {e}")
+        return keys
+
+    def _ensure_background_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self._refresh_periodically()
+            )
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            if self._fetched_at is None:
+                await self.refresh()
+            else:
+                # Refresh shortly before the keys expire. A failed fetch leaves
+                # _fetched_at as is, so it is retried every min_refresh_interval.
+                next_refresh = self._fetched_at + self.max_age - self.refresh_ahead
+                await asyncio.sleep(
+                    max(next_refresh - time.monotonic(), self.min_refresh_interval)
+                )
+                await self.refresh()
+
+            if self._fetched_at is None:
+                await asyncio.sleep(self.min_refresh_interval)
+
+    async def aclose(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -12,8 +12,6 @@ from tuto.auth.auth_helper import (
     ALGORITHM,
     SECRET_KEY,
     create_access_token,
-    hash_password,
-    verify_password,
 )
 from tuto.auth.exceptions import (
     AccessTokenRefreshError,
@@ -21,12 +19,15 @@ from tuto.auth.exceptions import (
     EmailTemplateError,
     InvalidAccessTokenError,
     NotAuthorizedError,
+    PasswordHasherBusyError,
     SystemConfigurationError,
     TemporaryPasswordGenerationError,
 )
+from tuto.auth.password_hasher import password_hasher
 from tuto.auth.protocol import AuthProtocol, Challenge, Token, TokenData
 from tuto.auth.utils.email_sender import send_temporary_password_email
 from tuto.auth.utils.password_generator import generate_temporary_password
+from tuto.core.user.cache import invalidate_user
 from tuto.core.user.models import User
 
 logging.getLogger("passlib").setLevel(logging.ERROR)
@@ -38,6 +39,18 @@ class LocalAuthService(AuthProtocol):
         super().__init__()
         self.asession: AsyncSession = asession
 
+    async def _verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        try:
+            return await password_hasher.verify(plain_password, hashed_password)
+        except PasswordHasherBusyError as exc:
+            raise _hasher_busy_exception() from exc
+
+    async def _hash_password(self, password: str) -> str:
+        try:
+            return await password_hasher.hash(password)
+        except PasswordHasherBusyError as exc:
+            raise _hasher_busy_exception() from exc
+
     async def signin(
         self,
         username: str,
@@ -58,7 +71,7 @@ class LocalAuthService(AuthProtocol):
 
         # Verify password
         assert user.hashed_password is not None
-        if not verify_password(password, user.hashed_password):
+        if not await self._verify_password(password, user.hashed_password):
             msg = "Incorrect username or password"
             raise NotAuthorizedError(msg)
 
@@ -161,17 +174,20 @@ class LocalAuthService(AuthProtocol):
                 )
 
             # Update password and clear temporary flags
-            user.password = hash_password(new_password)
+            user.hashed_password = await self._hash_password(new_password)
             user.password_is_temporary = False
             user.password_expires_at = None
 
+            # The commit expires the loaded attributes, read them beforehand
+            user_id, user_name, user_email = user.id, user.username, user.email
             self.asession.add(user)
             await self.asession.commit()
+            invalidate_user(user_id, user_name, user_email)
 
             # Create access token for successful authentication
             access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
             access_token = create_access_token(
-                data={"sub": user.username},
+                data={"sub": user_name},
                 expires_delta=access_token_expires,
             )
 
@@ -234,7 +250,7 @@ class LocalAuthService(AuthProtocol):
         if username is None:
             msg = "username is None"
             raise InvalidAccessTokenError(msg)
-        return TokenData(username=username)
+        return TokenData(username=username, expires_at=payload.get("exp"))
 
     async def change_password(
         self,
@@ -253,15 +269,18 @@ class LocalAuthService(AuthProtocol):
             username, self.asession
         )
 
-        if not verify_password(old_password, user.hashed_password):
+        if not await self._verify_password(old_password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect old password",
             )
 
-        user.hashed_password = hash_password(new_password)
+        user.hashed_password = await self._hash_password(new_password)
+        # The commit expires the loaded attributes, read them beforehand
+        user_id, user_name, user_email = user.id, user.username, user.email
         self.asession.add(user)
         await self.asession.commit()
+        invalidate_user(user_id, user_name, user_email)
 
     async def forget_password(
         self,
@@ -307,21 +326,24 @@ class LocalAuthService(AuthProtocol):
             # Set temporary password and expiration (24 hours from now)
             password_expiry = datetime.utcnow() + timedelta(hours=24)
 
-            user.password = hash_password(temporary_password)
+            user.hashed_password = await self._hash_password(temporary_password)
             user.password_is_temporary = True
             user.password_expires_at = password_expiry
 
+            # The commit expires the loaded attributes, read them beforehand
+            user_id, user_name, user_email = user.id, user.username, user.email
             self.asession.add(user)
             await self.asession.commit()
+            invalidate_user(user_id, user_name, user_email)
 
             # Send temporary password via email
             try:
                 message_id = send_temporary_password_email(
-                    user.email, username, temporary_password
+                    user_email, username, temporary_password
                 )
                 masked_email = (
-                    user.email[:2] + "***@***" + user.email[user.email.rfind(".") :]
-                    if user.email
+                    user_email[:2] + "***@***" + user_email[user_email.rfind(".") :]
+                    if user_email
                     else "***@***.***"
                 )
 
@@ -358,3 +380,11 @@ class LocalAuthService(AuthProtocol):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to process forgot password request",
             ) from exc
+
+
+def _hasher_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please try again later",
+        headers={"Retry-After": "1"},
+    )
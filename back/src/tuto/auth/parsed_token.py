@@ -0,0 +1,104 @@
+import binascii
+import hashlib
+import json
+import logging
+from functools import cached_property
+from typing import Any
+
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+
+class MalformedTokenError(ValueError):
+    """JWT として読めないトークン"""
+
+
+def _decode_segment(token: str, index: int) -> dict[str, Any]:
+    """JWT の index 番目の部分 (base64url の JSON) をデコードする"""
+    segments = token.split(".", index + 1)
+    if len(segments) <= index:
+        msg = f"Token has no segment {index}"
+        raise MalformedTokenError(msg)
+    segment = segments[index].encode("ascii", "replace")
+    segment = segment.replace(b"-", b"+").replace(b"_", b"/")
+    try:
+        decoded = json.loads(binascii.a2b_base64(segment + b"=" * (-len(segment) % 4)))
+    except ValueError as e:  # binascii.Error, JSONDecodeError, UnicodeDecodeError
+        msg = f"Token segment {index} is not base64url JSON: {e}"
+        raise MalformedTokenError(msg) from e
+    if not isinstance(decoded, dict):
+        msg = f"Token segment {index} is not a JSON object"
+        raise MalformedTokenError(msg)
+    return decoded
+
+
+class ParsedToken(str):
+    """
+    An access token whose JWT header and claims are decoded once, on first use.
+
+    It is a str, so it goes wherever a token does (auth services, the token info
+    cache, AuthenticationSession), and the stages that need the decoded parts
+    (source detection, the JWKS kid lookup, the cache digest) share them instead
+    of decoding the token again. The header and claims are not verified.
+    """
+
+    @cached_property
+    def header(self) -> dict[str, Any]:
+        """Raises MalformedTokenError when the token is not a JWT"""
+        return _decode_segment(self, 0)
+
+    @cached_property
+    def claims(self) -> dict[str, Any]:
+        """Raises MalformedTokenError when the token is not a JWT"""
+        return _decode_segment(self, 1)
+
+    @property
+    def kid(self) -> str | None:
+        return self.header.get("kid")
+
+    @cached_property
+    def digest(self) -> bytes:
+        """キャッシュのキーにするダイジェスト"""
+        return hashlib.sha256(self.encode("utf-8")).digest()
+
+    @cached_property
+    def source(self) -> str:
+        """
+        Who issued the token, from its header: "cognito", "old" (local auth),
+        "unknown", or "invalid" when the token is not a JWT.
+        """
+        try:
+            header = self.header
+        except MalformedTokenError as e:
+            logger.warning("Malformed token: %s", e)
+            return "invalid"
+
+        # アルゴリズムで判別
+        if header.get("alg") == "HS256":
+            return "old"
+        if header.get("alg") == "RS256":
+            return "cognito"
+
+        # issuerがヘッダーにある場合（稀ですが）
+        issuer = header.get("iss")
+        if isinstance(issuer, str) and "cognito" in issuer:
+            return "cognito"
+
+        return "unknown"
+
+
+def parse_token(token: str) -> ParsedToken:
+    """ParsedToken ならそのまま返す"""
+    if isinstance(token, ParsedToken):
+        return token
+    return ParsedToken(token)
+
+
+def request_token(request: Request, token: str) -> ParsedToken:
+    """リクエスト中の各段階で同じ ParsedToken を使うよう request.state に置く"""
+    parsed: ParsedToken | None = getattr(request.state, "parsed_token", None)
+    if parsed is None or parsed != token:
+        parsed = parse_token(token)
+        request.state.parsed_token = parsed
+    return parsed
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from tuto.auth.auth_helper import hash_password, verify_password
+from tuto.auth.exceptions import PasswordHasherBusyError
+
+logger = logging.getLogger(__name__)
+
+# Number of worker processes used for bcrypt.
+# 0 runs bcrypt on the default thread pool instead (bcrypt releases the GIL).
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))
+)
+# Requests beyond this number of queued/running hash operations are rejected
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "64"))
+
+HASH_SECONDS = Histogram(
+    "tuto_password_hash_seconds",
+    "Time spent waiting for and running a bcrypt operation",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0, 10.0),
+)
+HASH_PENDING = Gauge(
+    "tuto_password_hash_pending",
+    "Number of bcrypt operations queued or running",
+    multiprocess_mode="livesum",
+)
+HASH_REJECTED = Counter(
+    "tuto_password_hash_rejected_total",
+    "Number of bcrypt operations rejected because the queue was full",
+    ["operation"],
+)
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification outside of the event loop"""
+
+    def __init__(self, max_workers: int, max_pending: int) -> None:
+        self.max_workers: int = max_workers
+        self.max_pending: int = max_pending
+        self._executor: Executor | None = None
+        self._pending: int = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor | None:
+        # Created on first use so that each uvicorn worker owns its own pool
+        if self._executor is None and self.max_workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def _run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            HASH_REJECTED.labels(operation).inc()
+            msg = f"Too many pending password {operation} operations"
+            raise PasswordHasherBusyError(msg)
+
+        self._pending += 1
+        HASH_PENDING.inc()
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            logger.exception("Password hasher process pool is broken, recreating it")
+            self._executor = None
+            raise
+        finally:
+            self._pending -= 1
+            HASH_PENDING.dec()
+            HASH_SECONDS.labels(operation).observe(time.perf_counter() - started)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """パスワードの検証"""
+        return await self._run(
+            "verify", verify_password, plain_password, hashed_password
+        )
+
+    async def hash(self, password: str) -> str:
+        """パスワードをハッシュ化"""
+        return await self._run("hash", hash_password, password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
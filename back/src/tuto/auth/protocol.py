@@ -26,6 +26,8 @@ class Challenge(BaseModel):
 
 class TokenData(BaseModel):
     username: str
+    # Epoch seconds after which the verification result must not be reused
+    expires_at: float | None = None
 
 
 class AuthProtocol(Protocol):
@@ -0,0 +1,45 @@
+import sys
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from tuto.core.user.models import User
+
+from .protocol import AuthProtocol
+
+
+# The auth backends pull in boto3, python-jose, PyJWT, jinja2 and httpx, so they
+# are imported on first use instead of with this module
+def get_cognito_auth_service() -> AuthProtocol:
+    """Cognito の認証サービス (初回にバックエンドをインポートする)"""
+    from .cognito_protocol import CognitoAuthService
+
+    return CognitoAuthService()
+
+
+def get_local_auth_service(asession: AsyncSession) -> AuthProtocol:
+    """ローカル DB の認証サービス (初回にバックエンドをインポートする)"""
+    from .local_protocol import LocalAuthService
+
+    return LocalAuthService(asession)
+
+
+async def close_auth_services() -> None:
+    """インポート済みのバックエンドのリソースを解放する"""
+    cognito_protocol = sys.modules.get(f"{__package__}.cognito_protocol")
+    if cognito_protocol is not None:
+        await cognito_protocol.aclose()
+
+
+async def get_auth_service(
+    username: str,
+    asession: AsyncSession,
+) -> AuthProtocol:
+    user: User | None = await asession.scalar(
+        select(User).where(User.username == username)
+    )
+    if user is None:
+        raise ValueError(f"User with username {username} not found")
+    if user.auth_method == "cognito_eotp":
+        return get_cognito_auth_service()
+    return get_local_auth_service(asession)
@@ -0,0 +1,41 @@
+import os
+
+from tuto.auth.parsed_token import parse_token
+from tuto.auth.protocol import AuthProtocol, TokenData
+from tuto.utils.cache import TTLCache
+
+# Seconds a verified token is trusted without verifying its signature again.
+# Entries never outlive the token itself. Revocation through /auth/discard_token
+# only evicts the entry in the worker handling it, so keep this short.
+TOKEN_INFO_CACHE_TTL = float(os.environ.get("AUTH_TOKEN_INFO_CACHE_TTL", "60"))
+TOKEN_INFO_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_INFO_CACHE_SIZE", "10000"))
+
+token_info_cache: TTLCache[bytes, TokenData] = TTLCache(
+    "token_info", TOKEN_INFO_CACHE_SIZE, TOKEN_INFO_CACHE_TTL
+)
+
+
+def token_digest(access_token: str) -> bytes:
+    """トークン本体ではなくダイジェストをキャッシュのキーにする"""
+    return parse_token(access_token).digest
+
+
+async def get_token_info(
+    auth_service: AuthProtocol,
+    access_token: str,
+    expires_in: int = 3600,
+    token_issued_time: float = 0,
+) -> TokenData:
+    """AuthProtocol.get_token_info with the verified result cached per token"""
+    digest = token_digest(access_token)
+    token_data = token_info_cache.get(digest)
+    if token_data is None:
+        token_data = await auth_service.get_token_info(
+            access_token, expires_in, token_issued_time
+        )
+        token_info_cache.set(digest, token_data, token_data.expires_at)
+    return token_data
+
+
+def discard_token_info(access_token: str) -> None:
+    token_info_cache.pop(token_digest(access_token))
@@ -2,10 +2,7 @@ import logging
 import os
 from pathlib import Path
 
-import boto3
-import jinja2
-from botocore.exceptions import ClientError
-
+from tuto.auth.aws_clients import get_client
 from tuto.auth.exceptions import (
     EmailDeliveryError,
     EmailTemplateError,
@@ -21,12 +18,15 @@ DEFAULT_FROM_EMAIL = os.environ.get("AUTH_FROM_EMAIL", "noreply@example.com")
 
 
 def _get_ses_client():
-    """Get SES client instance"""
-    return boto3.client("sesv2", region_name=AWS_REGION)
+    """Get the shared SES client instance"""
+    return get_client("sesv2", AWS_REGION)
 
 
 def _render_template(template_name: str, **kwargs) -> str:
     """Render email template using jinja2"""
+    # Imported here, so that only workers that send emails load jinja2 and botocore
+    import jinja2
+
     try:
         # Get template directory relative to this file
         template_dir = Path(__file__).parent.parent / "templates" / "auth"
@@ -74,6 +74,8 @@ def _send_email(
     config_set: str = None,
 ) -> str:
     """Send email using AWS SES"""
+    from botocore.exceptions import ClientError
+
     # Validate configuration
     sender_email = from_email or DEFAULT_FROM_EMAIL
     if not sender_email or sender_email == "noreply@example.com":
@@ -1,12 +1,65 @@
+import base64
 import dataclasses
+import functools
+import json
+import logging
+import os
 import re
-from collections.abc import Sequence
+from collections.abc import Callable, Iterable, Sequence
+from datetime import datetime
+from enum import StrEnum
 from typing import Any, Protocol, TypeVar
 
-from sqlalchemy import Row
+from sqlalchemy import Row, TextClause, bindparam, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tuto.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 PK = TypeVar("PK", contravariant=True)  # primary key
 
+# Page size used in cursor mode when no range is given
+DEFAULT_CURSOR_PAGE_SIZE = 25
+
+# Totals memoized by CountStrategy.CACHED. Writes in this worker invalidate them,
+# writes in other workers are picked up after the TTL.
+COUNT_CACHE_TTL = float(os.environ.get("FINDER_COUNT_CACHE_TTL", "60"))
+COUNT_CACHE_SIZE = int(os.environ.get("FINDER_COUNT_CACHE_SIZE", "1000"))
+
+# Name of the COUNT(*) OVER() column added by CountStrategy.WINDOW
+WINDOW_COUNT_COLUMN = "total_count"
+
+# Number of distinct statements each StatementRegistry keeps
+STATEMENT_CACHE_SIZE = int(os.environ.get("FINDER_STATEMENT_CACHE_SIZE", "512"))
+
+# Number of filter/sort shapes whose SQL each QueryCompiler keeps
+QUERY_PLAN_CACHE_SIZE = int(os.environ.get("FINDER_QUERY_PLAN_CACHE_SIZE", "256"))
+
+EQUALITY_OPERATORS = frozenset({"eq", "in"})
+RANGE_OPERATORS = frozenset({"gte", "gt", "lte", "lt"})
+# Filter keys other than eq are written as <field>_<operator>
+_SUFFIX_OPERATORS = ("in", "prefix", "gte", "gt", "lte", "lt")
+_COMPARISONS = {"eq": "=", "gte": ">=", "gt": ">", "lte": "<=", "lt": "<"}
+
+
+class CountStrategy(StrEnum):
+    """How a finder computes PaginationResult.total"""
+
+    EXACT = "exact"  # COUNT(1) in a separate query
+    CACHED = "cached"  # exact count memoized per query until a write or the TTL
+    ESTIMATED = "estimated"  # row count from table statistics, approximate
+    WINDOW = "window"  # COUNT(*) OVER() in the page query itself
+
+
+class InvalidQueryError(ValueError):
+    pass
+
+
+class InvalidCursorError(InvalidQueryError):
+    pass
+
 
 @dataclasses.dataclass
 class PaginationResult:
@@ -14,6 +67,9 @@ class PaginationResult:
     start: int
     end: int
     data: Sequence[Row[tuple[Any, ...]]]
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+    total_is_estimate: bool = False
 
 
 class FinderProtocol(Protocol[PK]):
@@ -24,8 +80,487 @@ class FinderProtocol(Protocol[PK]):
         criteria: dict,
         sort: list | None = None,
         query_range: list | None = None,
+        cursor: str | None = None,
+        count_strategy: CountStrategy = CountStrategy.EXACT,
     ) -> PaginationResult: ...
 
 
+@dataclasses.dataclass(frozen=True)
+class SortKey:
+    name: str  # column name in the result row
+    column: str  # SQL expression
+    descending: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class Cursor:
+    """
+    Opaque position in a keyset paginated result.
+
+    keys are the sort key values of the row next to the requested page: the last
+    row of the previous page when paging forward, the first row of the next page
+    when paging backward. offset is the index of that page boundary and is only
+    used to keep Content-Range meaningful.
+    """
+
+    keys: tuple[Any, ...]
+    offset: int
+    backward: bool = False
+
+    @classmethod
+    def from_row(
+        cls,
+        row: Row,
+        sort_keys: Sequence[SortKey],
+        offset: int,
+        backward: bool = False,
+    ) -> "Cursor":
+        mapping = row._mapping
+        return cls(tuple(mapping[key.name] for key in sort_keys), offset, backward)
+
+    def encode(self) -> str:
+        payload = json.dumps(
+            [list(self.keys), self.offset, self.backward], separators=(",", ":")
+        )
+        return base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+
+    @classmethod
+    def decode(cls, value: str) -> "Cursor":
+        try:
+            padded = value + "=" * (-len(value) % 4)
+            keys, offset, backward = json.loads(base64.urlsafe_b64decode(padded))
+            return cls(tuple(keys), int(offset), bool(backward))
+        except (ValueError, TypeError) as e:
+            msg = f"Invalid cursor: {value}"
+            raise InvalidCursorError(msg) from e
+
+
+def order_by_clause(sort_keys: Sequence[SortKey], backward: bool = False) -> str:
+    terms = [
+        f"{key.column} {'DESC' if key.descending != backward else 'ASC'}"
+        for key in sort_keys
+    ]
+    return " ORDER BY " + ", ".join(terms)
+
+
+def seek_condition(
+    sort_keys: Sequence[SortKey], backward: bool = False
+) -> tuple[str, list[str]]:
+    """
+    WHERE condition selecting the rows after the cursor in sort order (before it
+    when backward). Returns the condition and the names of its bind parameters,
+    which take the cursor keys in order.
+    """
+    names = [f"cursor_{i}" for i in range(len(sort_keys))]
+    ops = [">" if key.descending == backward else "<" for key in sort_keys]
+
+    if len(set(ops)) == 1:
+        # All keys sort in the same direction: a row value comparison can seek
+        # the index directly
+        if len(sort_keys) == 1:
+            return f"{sort_keys[0].column} {ops[0]} :{names[0]}", names
+        columns = ", ".join(key.column for key in sort_keys)
+        params = ", ".join(f":{name}" for name in names)
+        return f"({columns}) {ops[0]} ({params})", names
+
+    terms = []
+    for i, key in enumerate(sort_keys):
+        equals = [f"{k.column} = :{names[j]}" for j, k in enumerate(sort_keys[:i])]
+        terms.append(
+            "(" + " AND ".join([*equals, f"{key.column} {ops[i]} :{names[i]}"]) + ")"
+        )
+    return "(" + " OR ".join(terms) + ")", names
+
+
+def to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ("true", "false", "1", "0"):
+        return value.lower() in ("true", "1")
+    msg = f"Not a boolean: {value!r}"
+    raise ValueError(msg)
+
+
+def to_datetime(value: Any) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def escape_like(value: str, escape: str = "!") -> str:
+    for char in (escape, "%", "_"):
+        value = value.replace(char, escape + char)
+    return value
+
+
+@dataclasses.dataclass(frozen=True)
+class FilterField:
+    """Column a finder can be filtered on"""
+
+    column: str  # SQL expression
+    operators: frozenset[str] = EQUALITY_OPERATORS
+    convert: Callable[[Any], Any] = str  # parses a filter value
+
+
+@dataclasses.dataclass(frozen=True)
+class SortField:
+    """Column a finder can be sorted on, which should be the head of an index"""
+
+    column: str  # SQL expression
+    unique: bool = False  # later sort keys never matter after a unique column
+
+
+@dataclasses.dataclass(frozen=True)
+class QueryPlan:
+    """SQL compiled for one filter shape and sort order"""
+
+    where: str  # conditions to AND to the finder's WHERE clause
+    bindings: tuple[tuple[str, str, str], ...]  # (parameter, field, operator)
+    expanding: tuple[str, ...]  # parameters bound to a list
+    sort_keys: tuple[SortKey, ...]
+
+    @property
+    def order_by(self) -> str:
+        return order_by_clause(self.sort_keys)
+
+
+class QueryCompiler:
+    """
+    Compiles react-admin filter and sort parameters into SQL for a finder.
+
+    Filters are {"<field>": value} (a list means IN) or {"<field>_<operator>":
+    value} with operator in, prefix, gte, gt, lte or lt, on whitelisted fields
+    only. Values are always bound. sort is [field, order], optionally followed by
+    more field/order pairs; unknown sort fields fall back to default_sort and the
+    tie_breaker field is appended until a unique field makes the order total.
+    The plan of each filter shape and sort order is compiled once and reused.
+    """
+
+    def __init__(
+        self,
+        filters: dict[str, FilterField],
+        sorts: dict[str, SortField],
+        default_sort: Sequence[tuple[str, bool]],
+        tie_breaker: str = "id",
+        plan_cache_size: int = QUERY_PLAN_CACHE_SIZE,
+    ) -> None:
+        self.filters: dict[str, FilterField] = filters
+        self.sorts: dict[str, SortField] = sorts
+        self.default_sort: tuple[tuple[str, bool], ...] = tuple(default_sort)
+        self.tie_breaker: str = tie_breaker
+        self._plan = functools.lru_cache(maxsize=plan_cache_size)(self._build_plan)
+
+    def compile(
+        self, criteria: dict | None, sort: list | None = None
+    ) -> tuple[QueryPlan, dict[str, Any]]:
+        """Return the plan for criteria and sort, and its bind parameters"""
+        terms = self._parse_filter(criteria or {})
+        shape = tuple(sorted((field, operator) for field, operator, _ in terms))
+        plan = self._plan(shape, self._parse_sort(sort))
+
+        values = {(field, operator): value for field, operator, value in terms}
+        params = {
+            param: self._convert(field, operator, values[field, operator])
+            for param, field, operator in plan.bindings
+        }
+        return plan, params
+
+    def _parse_filter(self, criteria: dict) -> list[tuple[str, str, Any]]:
+        terms: list[tuple[str, str, Any]] = []
+        seen: set[tuple[str, str]] = set()
+        for key, value in criteria.items():
+            if value is None:
+                continue
+
+            field, operator = key, "eq"
+            for suffix in _SUFFIX_OPERATORS:
+                if (
+                    key.endswith(f"_{suffix}")
+                    and key[: -len(suffix) - 1] in self.filters
+                ):
+                    field, operator = key[: -len(suffix) - 1], suffix
+                    break
+            if field not in self.filters:
+                msg = f"Unknown filter: {key}"
+                raise InvalidQueryError(msg)
+            if operator == "eq" and isinstance(value, list):
+                operator = "in"
+            if operator not in self.filters[field].operators:
+                msg = f"Unsupported filter: {key}"
+                raise InvalidQueryError(msg)
+            if (field, operator) in seen:
+                msg = f"Duplicate filter: {key}"
+                raise InvalidQueryError(msg)
+
+            seen.add((field, operator))
+            terms.append((field, operator, value))
+        return terms
+
+    def _parse_sort(self, sort: list | None) -> tuple[tuple[str, bool], ...]:
+        if sort and not isinstance(sort[0], list):
+            # [field, order, field, order, ...]
+            sort = [sort[i : i + 2] for i in range(0, len(sort), 2)]
+
+        keys: list[tuple[str, bool]] = []
+        for item in sort or []:
+            if len(item) != 2 or item[0] not in self.sorts:
+                # Not sortable on an index
+                break
+            field, order = item
+            if str(order).upper() not in ("ASC", "DESC"):
+                msg = f"Invalid sort order: {order}"
+                raise InvalidQueryError(msg)
+            if field not in (name for name, _ in keys):
+                keys.append((field, str(order).upper() == "DESC"))
+        if not keys:
+            keys = list(self.default_sort)
+
+        for i, (field, _) in enumerate(keys):
+            if self.sorts[field].unique:
+                return tuple(keys[: i + 1])
+        return (*keys, (self.tie_breaker, keys[-1][1]))
+
+    def _build_plan(
+        self,
+        shape: tuple[tuple[str, str], ...],
+        sort: tuple[tuple[str, bool], ...],
+    ) -> QueryPlan:
+        conditions: list[str] = []
+        bindings: list[tuple[str, str, str]] = []
+        expanding: list[str] = []
+        for field, operator in shape:
+            column = self.filters[field].column
+            param = f"filter_{field}_{operator}"
+            if operator == "in":
+                conditions.append(f"{column} IN :{param}")
+                expanding.append(param)
+            elif operator == "prefix":
+                conditions.append(f"{column} LIKE :{param} ESCAPE '!'")
+            else:
+                conditions.append(f"{column} {_COMPARISONS[operator]} :{param}")
+            bindings.append((param, field, operator))
+
+        return QueryPlan(
+            where="".join(f" AND {condition}" for condition in conditions),
+            bindings=tuple(bindings),
+            expanding=tuple(expanding),
+            sort_keys=tuple(
+                SortKey(field, self.sorts[field].column, descending)
+                for field, descending in sort
+            ),
+        )
+
+    def _convert(self, field: str, operator: str, value: Any) -> Any:
+        convert = self.filters[field].convert
+        try:
+            if operator == "in":
+                values = value if isinstance(value, list) else [value]
+                return [convert(v) for v in values]
+            if operator == "prefix":
+                return escape_like(str(convert(value))) + "%"
+            return convert(value)
+        except (ValueError, TypeError) as e:
+            msg = f"Invalid value for filter {field}: {value!r}"
+            raise InvalidQueryError(msg) from e
+
+
+count_cache: TTLCache[tuple, int] = TTLCache(
+    "finder_count", COUNT_CACHE_SIZE, COUNT_CACHE_TTL
+)
+_write_generations: dict[str, int] = {}
+
+
+def invalidate_counts(table: str) -> None:
+    """テーブルへの書き込み時にキャッシュ済みの件数を無効にする"""
+    _write_generations[table] = _write_generations.get(table, 0) + 1
+
+
+def to_count_sql(sql: str) -> str:
+    """SELECT 文から件数取得用の SQL を作る"""
+    count_sql = re.findall(
+        r"SELECT(?:.+)FROM(?:.+)(?:WHERE(?:.*))?",
+        sql,
+        flags=re.IGNORECASE | re.DOTALL,
+    )[0]
+
+    count_sql = re.sub(
+        r"SELECT(.+)FROM",
+        "SELECT COUNT(1) FROM",
+        count_sql,
+        flags=re.IGNORECASE | re.DOTALL,
+    )
+    return remove_spaces(count_sql)
+
+
+def to_window_count_sql(sql: str) -> str:
+    """SELECT 句に COUNT(*) OVER() を追加する"""
+    return re.sub(
+        r"\sFROM\s",
+        f", COUNT(*) OVER() AS {WINDOW_COUNT_COLUMN} FROM ",
+        sql,
+        count=1,
+        flags=re.IGNORECASE,
+    )
+
+
+def _hashable(value: Any) -> Any:
+    if isinstance(value, list | tuple | set):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def to_text(sql: str, expanding: Iterable[str] = ()) -> TextClause:
+    """text() with the given parameters bound as expanding (IN) parameters"""
+    statement = text(sql)
+    expanding_params = [bindparam(name, expanding=True) for name in expanding]
+    if expanding_params:
+        statement = statement.bindparams(*expanding_params)
+    return statement
+
+
+class StatementRegistry:
+    """
+    TextClause objects for a finder's hand-written SQL.
+
+    A statement is normalized with remove_spaces and wrapped in text() the first
+    time it is requested, as are the count variants derived from it. Entries are
+    keyed by the SQL as written, so SQL assembled from a QueryPlan is prepared
+    once per filter shape and sort order.
+    """
+
+    def __init__(self, maxsize: int = STATEMENT_CACHE_SIZE) -> None:
+        self._prepare = functools.lru_cache(maxsize=maxsize)(self._build)
+
+    def get(self, sql: str, expanding: tuple[str, ...] = ()) -> TextClause:
+        return self._prepare(sql, expanding, "select")
+
+    def count(self, sql: str, expanding: tuple[str, ...] = ()) -> TextClause:
+        """COUNT(1) of the rows sql selects, see to_count_sql"""
+        return self._prepare(sql, expanding, "count")
+
+    def window_count(self, sql: str, expanding: tuple[str, ...] = ()) -> TextClause:
+        """The statement with a COUNT(*) OVER() column, see to_window_count_sql"""
+        return self._prepare(sql, expanding, "window_count")
+
+    def _build(self, sql: str, expanding: tuple[str, ...], variant: str) -> TextClause:
+        sql = remove_spaces(sql).strip()
+        if variant == "count":
+            sql = to_count_sql(sql)
+        elif variant == "window_count":
+            sql = to_window_count_sql(sql)
+        return to_text(sql, expanding)
+
+
+statements = StatementRegistry()
+
+
+async def count_exact(
+    asession: AsyncSession, count_statement: TextClause, params: dict
+) -> int:
+    result = await asession.execute(count_statement, params=params)
+    return result.scalar_one()
+
+
+async def count_cached(
+    asession: AsyncSession, table: str, count_statement: TextClause, params: dict
+) -> int:
+    key = (
+        table,
+        _write_generations.get(table, 0),
+        count_statement.text,
+        tuple(sorted((k, _hashable(v)) for k, v in params.items())),
+    )
+    total = count_cache.get(key)
+    if total is None:
+        total = await count_exact(asession, count_statement, params)
+        count_cache.set(key, total)
+    return total
+
+
+async def estimate_count(asession: AsyncSession, table: str) -> int | None:
+    """
+    Row count of table from the database statistics, None when the dialect has
+    none or they are not collected yet. Includes soft deleted rows.
+    """
+    dialect = asession.get_bind().dialect.name
+    if dialect == "mysql":
+        sql = """
+            SELECT TABLE_ROWS FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+        """
+    elif dialect == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"
+    else:
+        return None
+
+    try:
+        result = await asession.execute(statements.get(sql), {"table": table})
+    except DBAPIError:
+        logger.warning(f"Failed to read table statistics of {table}", exc_info=True)
+        return None
+    estimate = result.scalar_one_or_none()
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+async def count_rows(
+    asession: AsyncSession,
+    strategy: CountStrategy,
+    table: str,
+    count_statement: TextClause,
+    params: dict,
+    filtered: bool = False,
+) -> tuple[int, bool]:
+    """
+    Total number of rows matched by count_statement and whether it is an estimate.
+
+    Table statistics cannot answer a filtered query, so ESTIMATED uses the cached
+    count then, as it does when the dialect has no statistics. WINDOW is resolved
+    by the finder and counts exactly here.
+    """
+    if strategy == CountStrategy.ESTIMATED and not filtered:
+        estimate = await estimate_count(asession, table)
+        if estimate is not None:
+            return estimate, True
+    if strategy in (CountStrategy.CACHED, CountStrategy.ESTIMATED):
+        return await count_cached(asession, table, count_statement, params), False
+    return await count_exact(asession, count_statement, params), False
+
+
+@dataclasses.dataclass(frozen=True)
+class Watermark:
+    """
+    Summary of the writes to a table, read with one aggregate query.
+
+    Inserts change rows and max_id, deletes change rows, updates change
+    updated_at (through the column's onupdate). Two updates within the
+    precision of updated_at, with no other write in between, are not told apart.
+    live_rows, the rows that are not soft deleted, is the unfiltered total of a
+    finder.
+    """
+
+    rows: int
+    live_rows: int
+    max_id: int | None
+    updated_at: datetime | None
+
+
+async def read_watermark(asession: AsyncSession, table: str) -> Watermark:
+    """
+    テーブルの書き込み状況を取得する (論理削除された行も含む)
+
+    An index on (updated_at, deleted_at) covers the query, so it reads the index
+    instead of the table.
+    """
+    sql = f"""
+        SELECT COUNT(1), COUNT(1) - COUNT(deleted_at), MAX(id), MAX(updated_at)
+        FROM {table}
+    """
+    result = await asession.execute(statements.get(sql))
+    rows, live_rows, max_id, updated_at = result.one()
+    return Watermark(rows, live_rows, max_id, updated_at)
+
+
 def remove_spaces(sql: str) -> str:
     return re.sub(r"[\u3000\s]+", " ", sql, flags=re.DOTALL)
@@ -0,0 +1,26 @@
+import os
+from typing import Any
+
+from tuto.core.finder import invalidate_counts
+from tuto.utils.cache import TTLCache
+
+# The authenticated principal (tuto.api.auth.schemas.Me) resolved from the user
+# table, keyed by the username in the token. Writes in this worker invalidate it,
+# writes in other workers are picked up after the TTL.
+PRINCIPAL_CACHE_TTL = float(os.environ.get("USER_PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("USER_PRINCIPAL_CACHE_SIZE", "1000"))
+
+principal_cache: TTLCache[str, Any] = TTLCache(
+    "user_principal", PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+)
+
+
+def invalidate_user(user_id: int | None, *names: str | None) -> None:
+    """ユーザの更新・削除時にキャッシュを破棄する"""
+    invalidate_counts("user")
+    for name in names:
+        if name:
+            principal_cache.pop(name)
+    if user_id is not None:
+        # The token may carry an old username or the email address
+        principal_cache.pop_matching(lambda principal: principal.id == user_id)
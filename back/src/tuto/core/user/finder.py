@@ -1,17 +1,57 @@
-import re
-from typing import TYPE_CHECKING, Any
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
 
 import sqlalchemy
-from sqlalchemy import Result, Row, text
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Result, Row, TextClause
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 
-from tuto.core.finder import FinderProtocol, PaginationResult, remove_spaces
-
-if TYPE_CHECKING:
-    from collections.abc import Sequence
+from tuto.core.finder import (
+    DEFAULT_CURSOR_PAGE_SIZE,
+    EQUALITY_OPERATORS,
+    RANGE_OPERATORS,
+    WINDOW_COUNT_COLUMN,
+    CountStrategy,
+    Cursor,
+    FilterField,
+    FinderProtocol,
+    InvalidCursorError,
+    PaginationResult,
+    QueryCompiler,
+    QueryPlan,
+    SortField,
+    StatementRegistry,
+    Watermark,
+    count_exact,
+    count_rows,
+    order_by_clause,
+    read_watermark,
+    seek_condition,
+    to_bool,
+    to_datetime,
+)
 
 
 class UserFinder(FinderProtocol[int]):
+    statements = StatementRegistry()
+    query_compiler = QueryCompiler(
+        filters={
+            "id": FilterField("u.id", EQUALITY_OPERATORS, int),
+            "username": FilterField("u.username", EQUALITY_OPERATORS | {"prefix"}),
+            "email": FilterField("u.email", EQUALITY_OPERATORS | {"prefix"}),
+            "nickname": FilterField("u.nickname", frozenset({"eq", "prefix"})),
+            "is_active": FilterField("u.is_active", frozenset({"eq"}), to_bool),
+            "created_at": FilterField("u.created_at", RANGE_OPERATORS, to_datetime),
+            "updated_at": FilterField("u.updated_at", RANGE_OPERATORS, to_datetime),
+        },
+        # Only columns with an index, so the ORDER BY can be read from it
+        sorts={
+            "id": SortField("u.id", unique=True),
+            "username": SortField("u.username", unique=True),
+            "email": SortField("u.email", unique=True),
+        },
+        default_sort=[("id", True)],
+    )
+
     def __init__(self, asession: AsyncSession) -> None:
         super().__init__()
         self.asession: AsyncSession = asession
@@ -32,20 +72,40 @@ class UserFinder(FinderProtocol[int]):
                 u.id = :pk
             AND u.deleted_at IS NULL
         """
-        sql = remove_spaces(sql)
-
-        result: Result = await self.asession.execute(text(sql), {"pk": pk})
+        result: Result = await self.asession.execute(
+            self.statements.get(sql), {"pk": pk}
+        )
         try:
             return result.one()
         except sqlalchemy.exc.NoResultFound:
             return None
 
+    async def watermark(self) -> Watermark:
+        """Changes whenever a user is created, updated or deleted"""
+        return await read_watermark(self.asession, "user")
+
     async def find(
         self,
         criteria: dict,
         sort: list | None = None,
         query_range: list | None = None,
+        cursor: str | None = None,
+        count_strategy: CountStrategy = CountStrategy.EXACT,
+        unfiltered_total: int | None = None,
     ) -> PaginationResult:
+        """
+        Find users.
+
+        Pages by offset with query_range, or by seeking from cursor (a
+        next_cursor/prev_cursor of a previous result) when one is given. In cursor
+        mode query_range only sets the page size. count_strategy selects how the
+        total is computed, see CountStrategy. unfiltered_total, when the caller
+        already knows it (e.g. Watermark.live_rows), is the total of criteria that
+        filter nothing, and no count is run for them. criteria and sort are
+        compiled by query_compiler, see QueryCompiler.
+        """
+        plan, params = self.query_compiler.compile(criteria, sort)
+
         sql = """
             SELECT
                 u.id,
@@ -60,33 +120,42 @@ class UserFinder(FinderProtocol[int]):
             WHERE
                 u.deleted_at IS NULL
         """
-        params = {}
-
-        count_sql = re.findall(
-            r"SELECT(?:.+)FROM(?:.+)(?:WHERE(?:.*))?",
-            sql,
-            flags=re.IGNORECASE | re.DOTALL,
-        )[0]
-
-        count_sql = re.sub(
-            r"SELECT(.+)FROM",
-            "SELECT COUNT(1) FROM",
-            count_sql,
-            flags=re.IGNORECASE | re.DOTALL,
-        )
-        count_sql = remove_spaces(count_sql)
+        sql += plan.where
+        count_statement = self.statements.count(sql, plan.expanding)
 
-        result: Result = await self.asession.execute(text(count_sql), params=params)
-        total_rows: int = result.scalar_one()
+        decoded_cursor = Cursor.decode(cursor) if cursor else None
+        if decoded_cursor and count_strategy == CountStrategy.WINDOW:
+            # The window would only count the rows past the cursor
+            count_strategy = CountStrategy.CACHED
 
-        if sort and sort[0] in ("id",):
-            sql += f"""
-                ORDER BY u.id {sort[1]}
-            """
-        else:
-            sql += """
-                ORDER BY u.id DESC
-            """
+        total_rows: int | None = None
+        total_is_estimate = False
+        if unfiltered_total is not None and not plan.where:
+            total_rows = unfiltered_total
+        elif count_strategy != CountStrategy.WINDOW:
+            total_rows, total_is_estimate = await count_rows(
+                self.asession,
+                count_strategy,
+                "user",
+                count_statement,
+                params,
+                filtered=bool(params),
+            )
+
+        sort_keys = plan.sort_keys
+
+        if decoded_cursor:
+            return await self._find_by_cursor(
+                sql,
+                params,
+                plan,
+                decoded_cursor,
+                query_range,
+                total_rows,
+                total_is_estimate,
+            )
+
+        sql += plan.order_by
 
         if query_range:
             sql += """
@@ -98,16 +167,167 @@ class UserFinder(FinderProtocol[int]):
             params["offset"] = offset
         else:
             offset = 0
+            end = None
+
+        if total_rows is None:
+            data, total_rows = await self._fetch_with_window_count(
+                self.statements.window_count(sql, plan.expanding), params
+            )
+            if total_rows is None:
+                # No rows on this page, so nothing carried the count
+                total_rows = (
+                    await count_exact(self.asession, count_statement, params)
+                    if offset > 0
+                    else 0
+                )
+        else:
+            result: Result = await self.asession.execute(
+                self.statements.get(sql, plan.expanding), params=params
+            )
+            data: Sequence[Row[tuple[Any, ...]]] = result.all()
+
+        if end is None:
             end = total_rows
 
-        sql = remove_spaces(sql)
+        if total_is_estimate:
+            has_next = len(data) == params.get("limit")
+        else:
+            has_next = offset + len(data) < total_rows
 
-        result: Result = await self.asession.execute(text(sql), params=params)
-        data: Sequence[Row[tuple[Any, ...]]] = result.all()
+        next_cursor = prev_cursor = None
+        if data and has_next:
+            next_cursor = Cursor.from_row(data[-1], sort_keys, offset + len(data))
+        if data and offset > 0:
+            prev_cursor = Cursor.from_row(data[0], sort_keys, offset, backward=True)
 
         return PaginationResult(
             total=total_rows,
             start=offset,
             end=min(end, total_rows),
             data=data,
+            next_cursor=next_cursor and next_cursor.encode(),
+            prev_cursor=prev_cursor and prev_cursor.encode(),
+            total_is_estimate=total_is_estimate,
+        )
+
+    def stream(
+        self,
+        criteria: dict,
+        sort: list | None = None,
+        partition_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row[tuple[Any, ...]]]]:
+        """
+        Stream every user matching criteria in sort order, partition_size rows at
+        a time, through a server-side cursor.
+
+        criteria and sort are compiled right away so that invalid ones raise
+        before anything is streamed. The session stays busy until the iterator is
+        exhausted or closed.
+        """
+        plan, params = self.query_compiler.compile(criteria, sort)
+
+        sql = """
+            SELECT
+                u.id,
+                u.username,
+                u.email,
+                u.nickname,
+                u.is_active,
+                u.created_at,
+                u.updated_at
+            FROM
+                user u
+            WHERE
+                u.deleted_at IS NULL
+        """
+        sql += plan.where + plan.order_by
+        return self._stream(
+            self.statements.get(sql, plan.expanding), params, partition_size
+        )
+
+    async def _stream(
+        self, statement: TextClause, params: dict, partition_size: int
+    ) -> AsyncIterator[Sequence[Row[tuple[Any, ...]]]]:
+        result: AsyncResult = await self.asession.stream(
+            statement,
+            params,
+            execution_options={"yield_per": partition_size},
+        )
+        try:
+            async for partition in result.partitions(partition_size):
+                yield partition
+        finally:
+            await result.close()
+
+    async def _fetch_with_window_count(
+        self, statement: TextClause, params: dict
+    ) -> tuple[Sequence[Row[tuple[Any, ...]]], int | None]:
+        result: Result = await self.asession.execute(statement, params=params)
+        frozen = result.freeze()
+        rows = frozen().all()
+        if not rows:
+            return rows, None
+
+        total_rows: int = rows[0]._mapping[WINDOW_COUNT_COLUMN]
+        columns = [key for key in rows[0]._fields if key != WINDOW_COUNT_COLUMN]
+        return frozen().columns(*columns).all(), total_rows
+
+    async def _find_by_cursor(
+        self,
+        sql: str,
+        params: dict,
+        plan: QueryPlan,
+        cursor: Cursor,
+        query_range: list | None,
+        total_rows: int,
+        total_is_estimate: bool,
+    ) -> PaginationResult:
+        sort_keys = plan.sort_keys
+        if len(cursor.keys) != len(sort_keys):
+            msg = "Cursor does not match the sort order"
+            raise InvalidCursorError(msg)
+
+        if query_range:
+            limit = query_range[1] - query_range[0] + 1
+        else:
+            limit = DEFAULT_CURSOR_PAGE_SIZE
+
+        condition, names = seek_condition(sort_keys, cursor.backward)
+        sql += f" AND {condition}"
+        sql += order_by_clause(sort_keys, cursor.backward)
+        # One extra row tells whether there is a page beyond this one
+        sql += " LIMIT :limit"
+        params.update(zip(names, cursor.keys, strict=True))
+        params["limit"] = limit + 1
+
+        result: Result = await self.asession.execute(
+            self.statements.get(sql, plan.expanding), params=params
+        )
+        data: list[Row[tuple[Any, ...]]] = list(result.all())
+        has_more = len(data) > limit
+        data = data[:limit]
+
+        if cursor.backward:
+            data.reverse()
+            start = max(cursor.offset - len(data), 0) if has_more else 0
+            has_next, has_prev = True, has_more
+        else:
+            start = cursor.offset
+            has_next, has_prev = has_more, start > 0
+
+        next_cursor = prev_cursor = None
+        if data and has_next:
+            next_cursor = Cursor.from_row(data[-1], sort_keys, start + len(data))
+        if data and has_prev:
+            prev_cursor = Cursor.from_row(data[0], sort_keys, start, backward=True)
+
+        return PaginationResult(
+            total=total_rows,
+            start=start,
+            # An empty page is reported as start-start, as by offset
+            end=start + max(len(data) - 1, 0),
+            data=data,
+            next_cursor=next_cursor and next_cursor.encode(),
+            prev_cursor=prev_cursor and prev_cursor.encode(),
+            total_is_estimate=total_is_estimate,
         )
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import ClassVar
 
-from sqlalchemy import Column
+from sqlalchemy import Column, Index
 from sqlalchemy.dialects.mysql import DATETIME, TINYINT, VARCHAR
 from sqlmodel import Field, SQLModel
 
@@ -57,11 +57,15 @@ class UserBase(SQLModel):
 
 class User(TimestampMixin, UserBase, BigPrimaryKeyMixin, table=True):
     __tablename__: str = "user"
-    __table_args__: ClassVar[dict] = {
-        "comment": "ユーザ",
-        "mysql_default_charset": "utf8mb4",
-        "mysql_collate": "utf8mb4_general_ci",
-    }
+    __table_args__: ClassVar[tuple] = (
+        # Covers the watermark of the users list, see read_watermark
+        Index("ix_user_updated_at_deleted_at", "updated_at", "deleted_at"),
+        {
+            "comment": "ユーザ",
+            "mysql_default_charset": "utf8mb4",
+            "mysql_collate": "utf8mb4_general_ci",
+        },
+    )
 
     model_config = {"from_attributes": True}
 
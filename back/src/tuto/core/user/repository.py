@@ -2,7 +2,9 @@ from sqlalchemy import Result
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
+from tuto.core.finder import invalidate_counts
 from tuto.core.repository import RepositoryProtocol
+from tuto.core.user.cache import invalidate_user
 from tuto.core.user.models import User
 
 
@@ -30,18 +32,21 @@ class UserRepository(RepositoryProtocol[int, User]):
     async def create(self, model: User) -> int:
         self.asession.add(model)
         await self.asession.commit()
+        invalidate_counts("user")
         await self.asession.refresh(model)
         return model.id  # type: ignore
 
     async def update(self, model: User) -> None:
         await self.asession.merge(model)
         await self.asession.commit()
+        invalidate_user(model.id, model.username, model.email)
 
     async def delete_by_id(self, pk: int) -> None:
         obj: User = await self.get_by_id(pk)
         if obj:
             await self.asession.delete(obj)
             await self.asession.commit()
+            invalidate_user(pk, obj.username, obj.email)
 
     async def get_by_username(self, username: str) -> User | None:
         result: Result = await self.asession.execute(
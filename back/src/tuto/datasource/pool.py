@@ -0,0 +1,166 @@
+import dataclasses
+import time
+from typing import Any
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import Engine, event, exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import (
+    AsyncAdaptedQueuePool,
+    ConnectionPoolEntry,
+    NullPool,
+    PoolProxiedConnection,
+    QueuePool,
+)
+
+CHECKOUT_SECONDS = Histogram(
+    "tuto_db_pool_checkout_seconds",
+    "Time spent acquiring a pooled connection, including connect and pre-ping",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+CHECKOUT_TIMEOUTS = Counter(
+    "tuto_db_pool_checkout_timeouts_total",
+    "Number of checkouts that gave up waiting for a free connection",
+    ["engine"],
+)
+INVALIDATIONS = Counter(
+    "tuto_db_pool_invalidations_total",
+    "Number of pooled connections invalidated, e.g. after a failed pre-ping",
+    ["engine"],
+)
+CONNECTIONS_IN_USE = Gauge(
+    "tuto_db_pool_connections_in_use",
+    "Number of connections checked out of the pool",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+CONNECTIONS_OVERFLOW = Gauge(
+    "tuto_db_pool_overflow",
+    "Number of connections open beyond the pool size",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+CONNECTIONS_LIMIT = Gauge(
+    "tuto_db_pool_connection_limit",
+    "Maximum number of connections the pool may open (pool size plus overflow)",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+
+# Query returning the server's connection limit, by dialect
+MAX_CONNECTIONS_SQL = {
+    "mysql": "SELECT @@max_connections",
+    "postgresql": "SHOW max_connections",
+}
+
+
+class _InstrumentedPoolMixin(QueuePool):
+    """
+    Records checkout time, timeouts and overflow, labelled by the pool's
+    logging name
+    """
+
+    def connect(self) -> PoolProxiedConnection:
+        name = self.logging_name or "default"
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            CHECKOUT_TIMEOUTS.labels(name).inc()
+            raise
+        finally:
+            CHECKOUT_SECONDS.labels(name).observe(time.perf_counter() - started)
+            CONNECTIONS_OVERFLOW.labels(name).set(max(self.overflow(), 0))
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        super()._do_return_conn(record)
+        # Overflow connections are closed once the pool is full again
+        CONNECTIONS_OVERFLOW.labels(self.logging_name or "default").set(
+            max(self.overflow(), 0)
+        )
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class PoolLimits:
+    pool_size: int
+    max_overflow: int
+
+    @classmethod
+    def derive(
+        cls,
+        max_connections: int,
+        workers: int,
+        reserved: int = 0,
+        pool_size: int = 10,
+    ) -> "PoolLimits":
+        """
+        Split the server's connection limit between the workers.
+
+        :param max_connections: The server's max_connections.
+        :param workers: Processes with a pool against the server.
+        :param reserved: Connections left for admin sessions, migrations and
+            other clients.
+        :param pool_size: Connections kept open per worker, capped by its share.
+        """
+        share = max(1, (max_connections - reserved) // max(workers, 1))
+        size = min(pool_size, share)
+        return cls(pool_size=size, max_overflow=share - size)
+
+    def as_options(self) -> dict[str, int]:
+        return {"pool_size": self.pool_size, "max_overflow": self.max_overflow}
+
+
+def instrument_engine(
+    engine: Engine, name: str, limits: PoolLimits | None = None
+) -> None:
+    """
+    プールのイベントからメトリクスを記録する
+
+    Listeners are set on the engine, so they survive the pool being recreated by
+    engine.dispose().
+    """
+    in_use = CONNECTIONS_IN_USE.labels(name)
+    invalidations = INVALIDATIONS.labels(name)
+
+    def count_checkout(*_: Any) -> None:
+        in_use.inc()
+
+    def count_checkin(*_: Any) -> None:
+        in_use.dec()
+
+    def count_invalidation(*_: Any) -> None:
+        invalidations.inc()
+
+    event.listen(engine, "checkout", count_checkout)
+    event.listen(engine, "checkin", count_checkin)
+    event.listen(engine, "invalidate", count_invalidation)
+    event.listen(engine, "soft_invalidate", count_invalidation)
+
+    if limits is not None:
+        CONNECTIONS_LIMIT.labels(name).set(limits.pool_size + limits.max_overflow)
+
+
+async def fetch_max_connections(url: str) -> int | None:
+    """
+    サーバの max_connections を取得する
+
+    Uses a throwaway connection, so that it does not count against any pool.
+    """
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        sql = MAX_CONNECTIONS_SQL.get(engine.dialect.name)
+        if sql is None:
+            return None
+        async with engine.connect() as conn:
+            return int((await conn.execute(text(sql))).scalar_one())
+    finally:
+        await engine.dispose()
@@ -0,0 +1,163 @@
+import dataclasses
+import logging
+import os
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Statements taking at least this many seconds are candidates for the slow log
+DB_SLOW_QUERY_SECONDS = float(os.environ.get("DB_SLOW_QUERY_SECONDS", "0.5"))
+# Share of the slow statements that are actually logged
+DB_SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("DB_SLOW_QUERY_SAMPLE_RATE", "0.1"))
+# Runs of one statement within a request from which it is reported as N+1
+DB_REPEATED_STATEMENT_THRESHOLD = int(
+    os.environ.get("DB_REPEATED_STATEMENT_THRESHOLD", "2")
+)
+
+
+def _one_line(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+@dataclasses.dataclass
+class QueryProfile:
+    """Statements run while handling one request"""
+
+    count: int = 0
+    seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: str | None = None
+    statements: Counter[str] = dataclasses.field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements that ran at least threshold times, most frequent first"""
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_seconds * 1000:.1f}"
+        )
+
+
+_current_profile: ContextVar[QueryProfile | None] = ContextVar(
+    "query_profile", default=None
+)
+
+
+def current_profile() -> QueryProfile | None:
+    return _current_profile.get()
+
+
+def _before_cursor_execute(
+    conn: Any,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn: Any,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, seconds)
+
+    if seconds >= DB_SLOW_QUERY_SECONDS and random.random() < DB_SLOW_QUERY_SAMPLE_RATE:
+        # Parameters are left out, they may hold personal data
+        logger.warning(f"Slow query ({seconds * 1000:.1f} ms): {_one_line(statement)}")
+
+
+def profile_engine(engine: Engine) -> None:
+    """エンジンの実行時間を計測する"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryProfilerMiddleware:
+    """
+    Profiles the statements of each HTTP request.
+
+    Adds a Server-Timing header with the total DB time and statement count, and
+    logs statements repeated repeated_threshold times or more within the request,
+    which usually means an N+1 pattern or a lookup that could be reused.
+    Statements run after the response started (e.g. streamed bodies) are not in
+    the header but are still checked for repetition.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        repeated_threshold: int = DB_REPEATED_STATEMENT_THRESHOLD,
+    ) -> None:
+        self.app = app
+        self.repeated_threshold = repeated_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = _current_profile.set(profile)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start" and profile.count:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            self._report(scope, profile)
+
+    def _report(self, scope: Scope, profile: QueryProfile) -> None:
+        if not profile.count:
+            return
+        request = f"{scope['method']} {scope['path']}"
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"{request}: {profile.count} queries in "
+                f"{profile.seconds * 1000:.1f} ms, slowest "
+                f"{profile.slowest_seconds * 1000:.1f} ms: "
+                f"{_one_line(profile.slowest_statement or '')}"
+            )
+        if self.repeated_threshold <= 1:
+            return
+        for statement, runs in profile.repeated(self.repeated_threshold):
+            logger.warning(
+                f"Statement ran {runs} times in {request}: {_one_line(statement)}"
+            )
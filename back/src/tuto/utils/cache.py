@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+from prometheus_client import Counter
+
+CACHE_REQUESTS = Counter(
+    "tuto_cache_requests_total",
+    "Number of in-process cache lookups by result",
+    ["cache", "result"],
+)
+CACHE_EVICTIONS = Counter(
+    "tuto_cache_evictions_total",
+    "Number of in-process cache entries dropped because the cache was full",
+    ["cache"],
+)
+
+
+class TTLCache[K, V]:
+    """
+    Size bounded LRU cache whose entries expire at a per-entry deadline.
+
+    The deadline is ttl seconds after the entry was set, or expires_at (epoch
+    seconds) when that comes earlier. A maxsize or ttl of 0 disables the cache.
+    Not thread safe, meant to be used from the event loop.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+        self.name: str = name
+        self.maxsize: int = maxsize
+        self.ttl: float = ttl
+        self._data: OrderedDict[K, tuple[V, float]] = OrderedDict()
+        self._hits = CACHE_REQUESTS.labels(name, "hit")
+        self._misses = CACHE_REQUESTS.labels(name, "miss")
+        self._evictions = CACHE_EVICTIONS.labels(name)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self._misses.inc()
+            return None
+
+        value, deadline = entry
+        if deadline <= time.time():
+            del self._data[key]
+            self._misses.inc()
+            return None
+
+        self._data.move_to_end(key)
+        self._hits.inc()
+        return value
+
+    def set(self, key: K, value: V, expires_at: float | None = None) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+
+        now = time.time()
+        deadline = now + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        if deadline <= now:
+            return
+
+        self._data[key] = (value, deadline)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._evictions.inc()
+
+    def pop(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def pop_matching(self, predicate: Callable[[V], bool]) -> None:
+        for key in [k for k, (v, _) in self._data.items() if predicate(v)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -0,0 +1,249 @@
+import dataclasses
+import heapq
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+
+from starlette._utils import get_route_path
+from starlette.convertors import PathConvertor
+from starlette.datastructures import URL
+from starlette.responses import RedirectResponse
+from starlette.routing import BaseRoute, Match, Mount, Route, WebSocketRoute
+from starlette.types import Receive, Scope, Send
+
+
+@dataclasses.dataclass
+class _Bucket:
+    """
+    Positions of the routes sharing a path pattern, in router order.
+
+    full_candidates() narrows them down to the routes that can fully match a
+    request's method and requested version; the others can only match partially.
+    """
+
+    routes: list[int] = dataclasses.field(default_factory=list)
+    methodless: list[int] = dataclasses.field(default_factory=list)
+    by_method: dict[str, list[int]] = dataclasses.field(default_factory=dict)
+    by_method_version: dict[tuple[str, str | None], list[int]] = dataclasses.field(
+        default_factory=dict
+    )
+    unversioned_by_method: dict[str, list[int]] = dataclasses.field(
+        default_factory=dict
+    )
+    _full: dict[tuple, list[int]] = dataclasses.field(default_factory=dict)
+
+    def add(self, position: int, route: BaseRoute) -> None:
+        self.routes.append(position)
+        methods = getattr(route, "methods", None)
+        if not methods:
+            self.methodless.append(position)
+            return
+        for method in methods:
+            self.by_method.setdefault(method, []).append(position)
+            # VersionedAPIRoute, not imported to keep routing.py importing this
+            if hasattr(route, "api_version"):
+                key = (method, route.api_version)
+                self.by_method_version.setdefault(key, []).append(position)
+            else:
+                self.unversioned_by_method.setdefault(method, []).append(position)
+
+    def full_candidates(self, scope: Scope) -> list[int]:
+        if scope["type"] != "http":
+            return self.methodless
+
+        method = scope["method"]
+        # Without a requested version, versioned routes match their own version
+        versioned = "requested_version" in scope
+        version = scope.get("requested_version")
+        # The method and the version come from the client, so only the ones the
+        # routes declare are cached, which bounds the cache by the routes
+        cacheable = method in self.by_method and (
+            not versioned or (method, version) in self.by_method_version
+        )
+        key = (method, versioned, version)
+        candidates = self._full.get(key) if cacheable else None
+        if candidates is None:
+            if versioned:
+                lists = (
+                    self.by_method_version.get((method, version), []),
+                    self.unversioned_by_method.get(method, []),
+                    self.methodless,
+                )
+            else:
+                lists = (self.by_method.get(method, []), self.methodless)
+            candidates = list(heapq.merge(*lists))
+            if cacheable:
+                self._full[key] = candidates
+        return candidates
+
+
+@dataclasses.dataclass
+class _Node:
+    children: dict[str, "_Node"] = dataclasses.field(default_factory=dict)
+    wildcard: "_Node | None" = None
+    bucket: _Bucket | None = None
+
+
+# Paths whose candidate buckets are remembered per index
+ROUTE_INDEX_CACHE_SIZE = 1024
+
+
+class RouteIndex:
+    """
+    Index of a router's routes by path.
+
+    Parameterless routes are found in a dict, routes with single segment
+    parameters in a trie of path segments, mounts by their path prefix. Routes the
+    index cannot reason about (path convertors, hosts, custom routes) are
+    candidates for every path. The candidates of a path still go through
+    route.matches() in router order, so the first full match and the first partial
+    match (405) are the same as with a linear scan.
+    """
+
+    def __init__(self, routes: Sequence[BaseRoute]) -> None:
+        self.source: Sequence[BaseRoute] = routes
+        self.size: int = len(routes)
+        self.routes: list[BaseRoute] = list(routes)
+        self._static: dict[str, _Bucket] = {}
+        self._trie = _Node()
+        self._prefixes: list[tuple[str, _Bucket]] = []
+        self._fallback = _Bucket()
+        for position, route in enumerate(self.routes):
+            self._add(position, route)
+        self._lookup = lru_cache(maxsize=ROUTE_INDEX_CACHE_SIZE)(self._buckets)
+
+    def is_stale(self, routes: Sequence[BaseRoute]) -> bool:
+        """Whether routes were added or replaced since the index was built"""
+        return routes is not self.source or len(routes) != self.size
+
+    def _add(self, position: int, route: BaseRoute) -> None:
+        if isinstance(route, Mount):
+            if "{" in route.path:
+                self._fallback.add(position, route)
+            else:
+                bucket = _Bucket()
+                bucket.add(position, route)
+                self._prefixes.append((route.path, bucket))
+            return
+
+        if not isinstance(route, Route | WebSocketRoute):
+            self._fallback.add(position, route)
+            return
+
+        convertors = route.param_convertors.values()
+        if not convertors:
+            self._static.setdefault(route.path, _Bucket()).add(position, route)
+        elif any(isinstance(c, PathConvertor) for c in convertors):
+            self._fallback.add(position, route)
+        else:
+            node = self._trie
+            for segment in route.path.split("/"):
+                if "{" in segment:
+                    node.wildcard = node.wildcard or _Node()
+                    node = node.wildcard
+                else:
+                    node = node.children.setdefault(segment, _Node())
+            node.bucket = node.bucket or _Bucket()
+            node.bucket.add(position, route)
+
+    def _buckets(self, route_path: str) -> tuple[_Bucket, ...]:
+        buckets = []
+        if bucket := self._static.get(route_path):
+            buckets.append(bucket)
+
+        nodes = [self._trie]
+        for segment in route_path.split("/"):
+            next_nodes = []
+            for node in nodes:
+                if child := node.children.get(segment):
+                    next_nodes.append(child)
+                if node.wildcard is not None:
+                    next_nodes.append(node.wildcard)
+            nodes = next_nodes
+            if not nodes:
+                break
+        buckets.extend(node.bucket for node in nodes if node.bucket is not None)
+
+        for prefix, bucket in self._prefixes:
+            if route_path == prefix or route_path.startswith(prefix + "/"):
+                buckets.append(bucket)
+
+        if self._fallback.routes:
+            buckets.append(self._fallback)
+        return tuple(buckets)
+
+    @staticmethod
+    def _merge(lists: list[list[int]]) -> Iterable[int]:
+        # Usually a single bucket matches, and its list is already in order
+        if len(lists) == 1:
+            return lists[0]
+        return heapq.merge(*lists)
+
+    def resolve(self, scope: Scope) -> tuple[BaseRoute | None, Match, Scope]:
+        """The first route fully matching scope, else the first partial match"""
+        buckets = self._lookup(get_route_path(scope))
+        routes = self.routes
+
+        for position in self._merge([b.full_candidates(scope) for b in buckets]):
+            route = routes[position]
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return route, match, child_scope
+
+        for position in self._merge([b.routes for b in buckets]):
+            route = routes[position]
+            match, child_scope = route.matches(scope)
+            if match == Match.PARTIAL:
+                return route, match, child_scope
+
+        return None, Match.NONE, {}
+
+    def has_match(self, scope: Scope) -> bool:
+        buckets = self._lookup(get_route_path(scope))
+        return any(
+            self.routes[position].matches(scope)[0] != Match.NONE
+            for position in self._merge([b.routes for b in buckets])
+        )
+
+
+class IndexedRoutingMixin:
+    """
+    Dispatches requests through a RouteIndex instead of trying every route.
+
+    The index is built on the first request, and again after routes were added
+    (e.g. by include_router or mount). Replacing a route in place is not noticed.
+    """
+
+    _route_index: RouteIndex | None = None
+
+    @property
+    def route_index(self) -> RouteIndex:
+        index = self._route_index
+        if index is None or index.is_stale(self.routes):
+            index = RouteIndex(self.routes)
+            self._route_index = index
+        return index
+
+    async def dispatch(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Same as the matching part of starlette's Router.app"""
+        index = self.route_index
+        route, _, child_scope = index.resolve(scope)
+        if route is not None:
+            scope.update(child_scope)
+            await route.handle(scope, receive, send)
+            return
+
+        route_path = get_route_path(scope)
+        if scope["type"] == "http" and self.redirect_slashes and route_path != "/":
+            redirect_scope = dict(scope)
+            if route_path.endswith("/"):
+                redirect_scope["path"] = redirect_scope["path"].rstrip("/")
+            else:
+                redirect_scope["path"] = redirect_scope["path"] + "/"
+
+            if index.has_match(redirect_scope):
+                redirect_url = URL(scope=redirect_scope)
+                response = RedirectResponse(url=str(redirect_url))
+                await response(scope, receive, send)
+                return
+
+        await self.default(scope, receive, send)
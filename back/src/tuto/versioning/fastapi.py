@@ -42,7 +42,8 @@ class CustomHeaderVersionMiddleware:
         version_header: str,
     ) -> None:
         self.app = app
-        self.version_header = version_header.encode()
+        # ASGI header names are lower-cased
+        self.version_header = version_header.lower().encode("latin-1")
 
     async def __call__(
         self,
@@ -51,10 +52,11 @@ class CustomHeaderVersionMiddleware:
         send: Send,
     ) -> None:
         if scope["type"] in ("http", "websocket"):
-            headers: dict[bytes, bytes] = dict(scope["headers"])
             scope["requested_version"] = None
-            if self.version_header in headers:
-                scope["requested_version"] = headers[self.version_header].decode()
+            # The last occurrence wins, as it did when the headers went into a dict
+            for name, value in scope["headers"]:
+                if name == self.version_header:
+                    scope["requested_version"] = value.decode("latin-1")
 
         return await self.app(scope, receive, send)
 
@@ -20,14 +20,42 @@
 #
 # Modified from: https://github.com/tikon93/fastapi-header-versioning
 
+import dataclasses
+import gzip
+import hashlib
+import json
+import logging
+import os
 from collections import defaultdict
+from pathlib import Path
+from typing import Any
 
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
-from starlette.routing import BaseRoute
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import BaseRoute, Route
+from starlette.types import Receive, Scope, Send
 
 from .routing import VersionedAPIRoute
 
+try:
+    import brotli
+except ImportError:  # the "compression" extra is not installed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Most preferred content coding first, "identity" is always available
+_ENCODINGS = ("br", "gzip", "identity")
+
+# Set to false to serve neither the OpenAPI documents nor the docs UIs, e.g. in
+# production. The versioned routes are mounted either way
+API_DOCS_ENABLED = os.environ.get("API_DOCS_ENABLED", "true").lower() == "true"
+# Directory of the documents written by scripts/export_openapi.py. Versions without
+# a file there are generated at startup
+OPENAPI_DIR = os.environ.get("OPENAPI_DIR", "")
+
 
 def get_version_from_route(route: BaseRoute) -> str | None:
     if isinstance(route, VersionedAPIRoute):
@@ -36,10 +64,132 @@ def get_version_from_route(route: BaseRoute) -> str | None:
     return None
 
 
+def document_filename(version: str | None) -> str:
+    """バージョンの OpenAPI ドキュメントのファイル名"""
+    return f"openapi-{version or 'unversioned'}.json"
+
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if quality and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+@dataclasses.dataclass(frozen=True)
+class OpenAPIDocument:
+    """
+    An OpenAPI document serialized once, along with its compressed bodies.
+
+    Served as an ASGI app, picking the body from the request's Accept-Encoding.
+    Each representation has its own strong ETag, so that caches can tell them
+    apart, and requests whose If-None-Match carries it get a 304.
+    """
+
+    bodies: dict[str, bytes]
+    etags: dict[str, str]
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "OpenAPIDocument":
+        bodies = {"identity": body, "gzip": gzip.compress(body, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body, mode=brotli.MODE_TEXT)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        etags = {encoding: f'"{digest}-{encoding}"' for encoding in bodies}
+        etags["identity"] = f'"{digest}"'
+        return cls(bodies=bodies, etags=etags)
+
+    @classmethod
+    def from_schema(cls, schema: dict[str, Any]) -> "OpenAPIDocument":
+        # Serialized the same way as FastAPI's JSONResponse
+        body = json.dumps(
+            schema,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        return cls.from_bytes(body)
+
+    @property
+    def body(self) -> bytes:
+        return self.bodies["identity"]
+
+    def response(self, request: Request) -> Response:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next(
+            e for e in _ENCODINGS if e in self.bodies and e in accepted | {"identity"}
+        )
+        headers = {
+            "ETag": self.etags[encoding],
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "no-cache",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or self.etags[encoding] in tags:
+                return Response(status_code=304, headers=headers)
+
+        return Response(
+            self.bodies[encoding], media_type="application/json", headers=headers
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = self.response(Request(scope))
+        await response(scope, receive, send)
+
+
+def load_document(
+    versioned_app: FastAPI, version: str | None, openapi_dir: str
+) -> OpenAPIDocument:
+    """エクスポート済みのドキュメントを読み込む。なければ生成する"""
+    if openapi_dir:
+        path = Path(openapi_dir) / document_filename(version)
+        if path.is_file():
+            return OpenAPIDocument.from_bytes(path.read_bytes())
+        logger.warning(f"{path} not found, generating the OpenAPI document")
+    return OpenAPIDocument.from_schema(versioned_app.openapi())
+
+
+def serve_document(versioned_app: FastAPI, document: OpenAPIDocument) -> None:
+    """openapi_url のルートを生成済みのドキュメントを返すルートに置き換える"""
+    routes = versioned_app.router.routes
+    for i, route in enumerate(routes):
+        if isinstance(route, Route) and route.path == versioned_app.openapi_url:
+            routes[i] = Route(
+                route.path, document, methods=["GET"], include_in_schema=False
+            )
+
+
 def doc_generation(
     app: FastAPI,
+    docs_enabled: bool = API_DOCS_ENABLED,
+    openapi_dir: str = OPENAPI_DIR,
 ) -> FastAPI:
+    """
+    Mounts an app with the routes of each version under /v{version}, along with
+    its OpenAPI document and docs UIs.
+
+    The documents are built (or loaded from openapi_dir) here rather than on the
+    first request, and are kept in app.state.openapi_documents.
+
+    :param app: app whose router holds the versioned routes
+    :param docs_enabled: mount the routes only, without documents and docs UIs
+    :param openapi_dir: directory of pre-generated documents, empty to generate them
+    """
     parent_app = app
+    parent_app.state.openapi_documents = {}
     version_route_mapping: dict[str | None, list[BaseRoute]] = defaultdict(list)
 
     for route in app.routes:
@@ -50,10 +200,17 @@ def doc_generation(
     for version in versions:
         unique_routes = {}
         version_description = version if version is not None else "Not versioned"
+        prefix = f"/v{version}"
+        if version is None:
+            prefix = "/"
+
         versioned_app = FastAPI(
             title=app.title,
             description=version_description + " " + app.description,
             version=version,
+            # What FastAPI adds on the first request from the mount's root_path
+            servers=[{"url": prefix}] if version is not None else None,
+            openapi_url="/openapi.json" if docs_enabled else None,
         )
         for route in version_route_mapping[version]:
             if isinstance(route, APIRoute):
@@ -64,9 +221,10 @@ def doc_generation(
 
         versioned_app.router.routes.extend(unique_routes.values())
 
-        prefix = f"/v{version}"
-        if version is None:
-            prefix = "/"
+        if docs_enabled:
+            document = load_document(versioned_app, version, openapi_dir)
+            serve_document(versioned_app, document)
+            parent_app.state.openapi_documents[version] = document
 
         parent_app.mount(prefix, versioned_app)
 
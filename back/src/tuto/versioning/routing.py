@@ -35,12 +35,10 @@ from fastapi.types import DecoratedCallable
 from fastapi.utils import (
     generate_unique_id,
 )
-from starlette.datastructures import URL
 from starlette.exceptions import HTTPException
 from starlette.responses import (
     JSONResponse,
     PlainTextResponse,
-    RedirectResponse,
     Response,
 )
 from starlette.routing import (
@@ -49,6 +47,9 @@ from starlette.routing import (
 )
 from starlette.types import Receive, Scope, Send
 
+from .dispatch import IndexedRoutingMixin
+from .versions import VersionResolver
+
 _T = TypeVar("_T")
 
 
@@ -103,7 +104,7 @@ async def handle_non_existing_version(
     await response(scope, receive, send)  # pragma: no cover
 
 
-class VersionedAPIRouter(APIRouter):
+class VersionedAPIRouter(IndexedRoutingMixin, APIRouter):
     def __init__(
         self,
         default_version: str | None = None,
@@ -208,8 +209,21 @@ class VersionedAPIRouter(APIRouter):
 
         self._context_version = None
 
+    async def app(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Same as starlette's Router.app, but matching through the route index"""
+        assert scope["type"] in ("http", "websocket", "lifespan")
+
+        if "router" not in scope:
+            scope["router"] = self
+
+        if scope["type"] == "lifespan":
+            await self.lifespan(scope, receive, send)
+            return
+
+        await self.dispatch(scope, receive, send)
+
 
-class HeaderVersionedAPIRouter(APIRouter):
+class HeaderVersionedAPIRouter(IndexedRoutingMixin, APIRouter):
     def __init__(
         self,
         default_version: str | None = None,
@@ -220,6 +234,7 @@ class HeaderVersionedAPIRouter(APIRouter):
         self._context_version: str | None = None
         self.registered_versions: set[str | None] = set()
         self.registered_versions.add(self.default_version)
+        self._version_resolver: VersionResolver | None = None
         super().__init__(*args, **kwargs)
 
     def version(
@@ -314,6 +329,15 @@ class HeaderVersionedAPIRouter(APIRouter):
 
         self._context_version = None
 
+    @property
+    def version_resolver(self) -> VersionResolver:
+        """Resolver of the registered versions, rebuilt after versions were added"""
+        resolver = self._version_resolver
+        if resolver is None or len(resolver.versions) != len(self.registered_versions):
+            resolver = VersionResolver(self.registered_versions)
+            self._version_resolver = resolver
+        return resolver
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Mostly a duplicate of FastAPI implementation, but with ability to handle partially matched versions.
@@ -328,8 +352,6 @@ class HeaderVersionedAPIRouter(APIRouter):
             await self.lifespan(scope, receive, send)
             return
 
-        partial = None
-        partial_scope = None
         requested_version = scope.get("requested_version")
 
         if (
@@ -342,12 +364,9 @@ class HeaderVersionedAPIRouter(APIRouter):
             # release cycles. Thus, one service may release 100 different API versions and another - just 2. Clients
             # will be able to use same header for requests to both services, not caring a lot about which versions are
             # supported in each service.
-            suitable_versions = []
-            for version in self.registered_versions:
-                if version is not None and version < requested_version:
-                    suitable_versions.append(version)
+            version_to_use = self.version_resolver.resolve(requested_version)
 
-            if not suitable_versions:
+            if version_to_use is None:
                 # this implementation will trigger 406 even on not versioned route if provided version is not registered
                 # however, it covers more real-world scenarios. proper distinguishing between 404 in case of not
                 # versioned route and 406 with not found version requires deep dive into starlette's Mount (used for
@@ -356,44 +375,6 @@ class HeaderVersionedAPIRouter(APIRouter):
                 # it's not really executed as we'll return from function above, but for code readability it's better
                 # to have it
                 return  # pragma: no cover
-            version_to_use = max(suitable_versions)
             scope["requested_version"] = version_to_use
-            # maybe we can generate more narrow set of routes at this point, but it's possible to optimize it later
-
-        for route in self.routes:
-            # Determine if any route matches the incoming scope,
-            # and hand over to the matching route if found.
-            match, child_scope = route.matches(scope)
-            if match == Match.FULL:
-                scope.update(child_scope)
-                await route.handle(scope, receive, send)
-                return  # pragma: no cover
-
-            if match == Match.PARTIAL and partial is None:
-                partial = route
-                partial_scope = child_scope
-
-        if partial is not None:
-            # Handle partial matches. These are cases where an endpoint is
-            # able to handle the request, but is not a preferred option.
-            # We use this in particular to deal with "405 Method Not Allowed".
-            scope.update(partial_scope)  # pyright: ignore[reportGeneralTypeIssues]
-            await partial.handle(scope, receive, send)
-            return  # pragma: no cover
-
-        if scope["type"] == "http" and self.redirect_slashes and scope["path"] != "/":
-            redirect_scope = dict(scope)
-            if scope["path"].endswith("/"):
-                redirect_scope["path"] = redirect_scope["path"].rstrip("/")
-            else:
-                redirect_scope["path"] = redirect_scope["path"] + "/"
-
-            for route in self.routes:
-                match, child_scope = route.matches(redirect_scope)
-                if match != Match.NONE:
-                    redirect_url = URL(scope=redirect_scope)
-                    response = RedirectResponse(url=str(redirect_url))
-                    await response(scope, receive, send)
-                    return
 
-        await self.default(scope, receive, send)
+        await self.dispatch(scope, receive, send)
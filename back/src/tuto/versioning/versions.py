@@ -0,0 +1,58 @@
+import bisect
+from collections.abc import Iterable
+from functools import lru_cache
+
+# Requested versions whose resolution is remembered, per resolver. The header is
+# client controlled, so this has to be bounded
+VERSION_CACHE_SIZE = 256
+
+
+def parse_version(version: str) -> tuple[int, ...] | None:
+    """
+    "1.10.0" -> (1, 10), None when the version is not dot separated numbers.
+
+    Trailing zeros are dropped, so "1", "1.0" and "1.0.0" compare equal.
+    """
+    parts = version.split(".")
+    if not all(part.isdigit() for part in parts):
+        return None
+    key = tuple(int(part) for part in parts)
+    while len(key) > 1 and key[-1] == 0:
+        key = key[:-1]
+    return key
+
+
+class VersionResolver:
+    """
+    Resolves a requested API version to the registered version serving it.
+
+    A registered version is used as is. Otherwise the request falls back to the
+    newest registered version not newer than the requested one, comparing the
+    numeric parts, so that "0.10" is newer than "0.9". Resolutions are cached.
+    """
+
+    def __init__(
+        self, versions: Iterable[str | None], cache_size: int = VERSION_CACHE_SIZE
+    ) -> None:
+        self.versions: frozenset[str | None] = frozenset(versions)
+        parsed = sorted(
+            (key, version)
+            for version in self.versions
+            if version is not None and (key := parse_version(version)) is not None
+        )
+        self._keys: list[tuple[int, ...]] = [key for key, _ in parsed]
+        self._ordered: list[str] = [version for _, version in parsed]
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, requested: str) -> str | None:
+        """The version serving requested, None when there is none"""
+        if requested in self.versions:
+            return requested
+
+        key = parse_version(requested)
+        if key is None:
+            return None
+        position = bisect.bisect_right(self._keys, key)
+        if position == 0:
+            return None
+        return self._ordered[position - 1]
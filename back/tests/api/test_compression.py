@@ -0,0 +1,110 @@
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from starlette.types import Message, Receive, Scope, Send
+
+from tuto.api.compression import CompressionMiddleware
+
+
+def test_cached_bodies_are_per_resource() -> None:
+    def endpoint(text: str) -> Route:
+        def respond(request: Request) -> Response:
+            # Same strong ETag on both, like two files of equal mtime and size
+            return Response(
+                text * 2048, media_type="text/plain", headers={"ETag": '"same"'}
+            )
+
+        return Route(f"/{text}", respond)
+
+    app = Starlette(routes=[endpoint("a"), endpoint("b")])
+    app.add_middleware(CompressionMiddleware)
+    client = TestClient(app)
+
+    for path in ("/a", "/b", "/a", "/b"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["ETag"] == 'W/"same"'
+        assert response.text == path[1:] * 2048
+
+
+def test_start_is_sent_before_a_pathsend() -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain")],
+            }
+        )
+        await send({"type": "http.response.pathsend", "path": "/srv/users.csv"})
+
+    # Collects the sent messages. The app reads no request body, so it never
+    # receives from it
+    messages: asyncio.Queue[Message] = asyncio.Queue()
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/users.csv",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    asyncio.run(CompressionMiddleware(app)(scope, messages.get, messages.put))
+    sent = [messages.get_nowait() for _ in range(messages.qsize())]
+
+    assert [message["type"] for message in sent] == [
+        "http.response.start",
+        "http.response.pathsend",
+    ]
+    assert (b"content-encoding", b"gzip") not in sent[0]["headers"]
+
+
+def counting_middleware(etag: str) -> tuple[CompressionMiddleware, list[object]]:
+    """ETag 付きのレスポンスを返すアプリと、作られた gzip 圧縮器のリスト"""
+
+    def respond(request: Request) -> Response:
+        return Response("x" * 4096, media_type="text/plain", headers={"ETag": etag})
+
+    middleware = CompressionMiddleware(Starlette(routes=[Route("/doc", respond)]))
+    created: list[object] = []
+    make_gzip = middleware.compressors["gzip"]
+
+    def make_counted() -> object:
+        created.append(make_gzip())
+        return created[-1]
+
+    middleware.compressors["gzip"] = make_counted
+    return middleware, created
+
+
+def test_strong_etag_bodies_are_compressed_once() -> None:
+    middleware, created = counting_middleware('"v1"')
+    client = TestClient(middleware)
+
+    for _ in range(3):
+        response = client.get("/doc", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        # The encoded bytes are not the ones the ETag names
+        assert response.headers["ETag"] == 'W/"v1"'
+        assert response.text == "x" * 4096
+    assert len(created) == 1
+
+    response = client.get("/doc", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == '"v1"'
+
+
+def test_weak_etag_bodies_are_compressed_each_time() -> None:
+    middleware, created = counting_middleware('W/"v1"')
+    client = TestClient(middleware)
+
+    for _ in range(3):
+        response = client.get("/doc", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["ETag"] == 'W/"v1"'
+        assert response.text == "x" * 4096
+    assert len(created) == 3
@@ -0,0 +1,31 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from tuto.api.metrics import MetricsMiddleware
+
+
+def count(method: str, route: str, status: str) -> float:
+    labels = {"method": method, "route": route, "api_version": "", "status": status}
+    return REGISTRY.get_sample_value("tuto_http_requests_total", labels) or 0.0
+
+
+def test_unknown_methods_share_a_label() -> None:
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping() -> str:
+        return "ok"
+
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    before_get = count("GET", "/ping", "200")
+    before_other = count("other", "/ping", "405")
+
+    client.get("/ping")
+    client.request("BREW", "/ping")
+    client.request("XYZZY", "/ping")
+
+    assert count("GET", "/ping", "200") == before_get + 1
+    assert count("other", "/ping", "405") == before_other + 2
+    assert count("BREW", "/ping", "405") == 0
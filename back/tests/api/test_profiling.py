@@ -0,0 +1,30 @@
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from tuto.api.profiling import ProfilingMiddleware
+
+
+def test_requests_with_the_token_are_profiled(tmp_path: Path) -> None:
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping() -> str:
+        return "pong"
+
+    app.add_middleware(ProfilingMiddleware, token="secret", directory=tmp_path)
+    client = TestClient(app)
+
+    response = client.get("/ping")
+    assert response.status_code == 200
+    assert "X-Profile-Url" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+    token = {"X-Profile-Token": "secret"}
+    response = client.get("/ping", headers=token)
+    assert response.status_code == 200
+    profile = client.get(response.headers["X-Profile-Url"], headers=token)
+    assert profile.status_code == 200
+    assert "speedscope" in profile.json()["$schema"]
+    assert client.get(response.headers["X-Profile-Url"]).status_code == 404
@@ -0,0 +1,97 @@
+from collections.abc import AsyncIterator, Iterator
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tests.user_db import UserDatabase
+from tuto.api.auth import router as auth_router
+from tuto.api.auth.schemas import Me
+from tuto.api.user.router import router
+from tuto.core.finder import Watermark
+from tuto.core.user.finder import UserFinder
+from tuto.datasource.database import get_read_async_session
+
+LIST = {"filter": "{}", "sort": "['id', 'ASC']", "range": "[0, 9]"}
+FILTERED = {**LIST, "filter": '{"username_prefix": "user"}'}
+
+
+@pytest.fixture
+def watermarks(monkeypatch: pytest.MonkeyPatch) -> list[Watermark]:
+    """Watermarks read by the requests"""
+    read: list[Watermark] = []
+    original = UserFinder.watermark
+
+    async def watermark(self: UserFinder) -> Watermark:
+        read.append(await original(self))
+        return read[-1]
+
+    monkeypatch.setattr(UserFinder, "watermark", watermark)
+    return read
+
+
+@pytest.fixture
+def client(user_db: UserDatabase) -> Iterator[TestClient]:
+    def current_me() -> Me:
+        return Me(id=1, username="user1", email="user1@example.com", nickname="u")
+
+    async def read_session() -> AsyncIterator[AsyncSession]:
+        async with user_db.session() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[auth_router.get_current_me] = current_me
+    app.dependency_overrides[get_read_async_session] = read_session
+    for i in range(3):
+        user_db.add(f"user{i}")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_if_none_match_is_answered_from_the_watermark(
+    client: TestClient, user_db: UserDatabase, watermarks: list[Watermark]
+) -> None:
+    response = client.get("/users", params=LIST)
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert response.headers["Content-Range"].endswith("/3")
+    assert "Last-Modified" not in response.headers
+
+    response = client.get("/users", params=LIST, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    # A hard delete leaves MAX(updated_at) as it was, the row count tells
+    user_db.execute("DELETE FROM user WHERE username = 'user0'")
+    response = client.get("/users", params=LIST, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.headers["Content-Range"].endswith("/2")
+    assert len(watermarks) == 3
+
+
+def test_if_modified_since_alone_is_not_conditional(
+    client: TestClient, watermarks: list[Watermark]
+) -> None:
+    since = {"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+
+    response = client.get("/users", params=FILTERED, headers=since)
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert "Last-Modified" not in response.headers
+    assert watermarks == []
+
+
+def test_unfiltered_total_comes_from_the_watermark(
+    client: TestClient, user_db: UserDatabase, watermarks: list[Watermark]
+) -> None:
+    user_db.add("deleted", deleted=True)
+
+    response = client.get("/users", params=LIST)
+
+    assert response.headers["Content-Range"].endswith("/3")
+    assert [(w.rows, w.live_rows) for w in watermarks] == [(4, 3)]
@@ -0,0 +1,64 @@
+import types
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import botocore.endpoint
+import pytest
+
+from tests.auth.fake_cognito import CLIENT_ID, REGION, USER_POOL_ID, FakeCognito
+from tuto.auth.aws_clients import get_client, reset_clients
+from tuto.auth.cognito_gateway import CognitoGateway
+from tuto.auth.cognito_idp_action import CognitoIdentityProviderWrapper
+from tuto.auth.cognito_protocol import CognitoAuthService
+from tuto.auth.cognito_token_manager import CognitoTokenManager
+
+
+@pytest.fixture
+def backoffs(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """リトライの待ち時間 (実際には待たない)"""
+    delays: list[float] = []
+    monkeypatch.setattr(
+        botocore.endpoint, "time", types.SimpleNamespace(sleep=delays.append)
+    )
+    return delays
+
+
+@pytest.fixture
+def fake_cognito(
+    monkeypatch: pytest.MonkeyPatch, backoffs: list[float]
+) -> Iterator[FakeCognito]:
+    """The fake, answering the shared cognito-idp client of tuto.auth.aws_clients"""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    reset_clients()
+
+    fake = FakeCognito()
+    client = get_client("cognito-idp", REGION)
+    client.meta.events.register("before-send.cognito-identity-provider", fake)
+    yield fake
+    fake.release()
+    reset_clients()
+
+
+@pytest.fixture
+def make_service(
+    fake_cognito: FakeCognito,
+) -> Iterator[Callable[..., CognitoAuthService]]:
+    """CognitoAuthService using the fake, with a gateway built from the arguments"""
+    client = get_client("cognito-idp", REGION)
+    gateways: list[CognitoGateway] = []
+
+    def make(**gateway_options: Any) -> CognitoAuthService:
+        gateway = CognitoGateway(**{"max_workers": 4, **gateway_options})
+        gateways.append(gateway)
+        return CognitoAuthService(
+            wrapper=CognitoIdentityProviderWrapper(client, USER_POOL_ID, CLIENT_ID),
+            manager=CognitoTokenManager(client, USER_POOL_ID, CLIENT_ID, REGION),
+            gateway=gateway,
+        )
+
+    yield make
+    fake_cognito.release()
+    for gateway in gateways:
+        gateway.shutdown()
@@ -0,0 +1,164 @@
+import json
+import threading
+from collections.abc import Iterator
+from typing import Any
+
+from botocore.awsrequest import AWSResponse
+
+REGION = "ap-northeast-1"
+USER_POOL_ID = "ap-northeast-1_fake"
+CLIENT_ID = "fake-client-id"
+
+
+def _session(username: str) -> str:
+    """チャレンジのセッション (Cognito の最小長 20 文字以上)"""
+    return f"fake-session-for-{username}"
+
+
+class _RawBody:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    def stream(self, **kwargs: Any) -> Iterator[bytes]:
+        yield self.body
+
+
+class FakeCognito:
+    """
+    An in-memory Cognito user pool behind a real boto3 client.
+
+    It answers the client's requests from botocore's before-send event, so the
+    client's parameter validation, response parsing, modeled exceptions and
+    retry configuration all run as they do against AWS. Only the operations used
+    by CognitoAuthService are implemented.
+    """
+
+    def __init__(self) -> None:
+        # username -> {"password", "email", "status"}
+        self.users: dict[str, dict[str, str]] = {}
+        # Operation names of the requests received, retries included
+        self.requests: list[str] = []
+        # operation -> error codes returned by the next requests for it
+        self.failures: dict[str, list[str]] = {}
+        # Set to make requests wait until it is cleared by release()
+        self.blocked = threading.Event()
+        self._released = threading.Event()
+        self.email_otp_code = "123456"
+
+    def add_user(self, username: str, password: str, status: str = "CONFIRMED") -> None:
+        self.users[username] = {
+            "password": password,
+            "email": f"{username}@example.com",
+            "status": status,
+        }
+
+    def fail(self, operation: str, *error_codes: str) -> None:
+        """Operation の次のリクエストを error_codes のエラーにする"""
+        self.failures.setdefault(operation, []).extend(error_codes)
+
+    def block(self) -> None:
+        self.blocked.set()
+        self._released.clear()
+
+    def release(self) -> None:
+        self.blocked.clear()
+        self._released.set()
+
+    def __call__(self, request: Any, **kwargs: Any) -> AWSResponse:
+        operation = request.headers["X-Amz-Target"].decode().rpartition(".")[2]
+        self.requests.append(operation)
+        if self.blocked.is_set():
+            self._released.wait(timeout=10)
+
+        failures = self.failures.get(operation)
+        if failures:
+            return self._error(failures.pop(0), "Injected failure")
+
+        handler = getattr(self, f"_{operation}", None)
+        if handler is None:
+            return self._error("InvalidParameterException", f"{operation} is faked")
+        return handler(json.loads(request.body))
+
+    def _response(self, status: int, body: dict) -> AWSResponse:
+        return AWSResponse(
+            f"https://cognito-idp.{REGION}.amazonaws.com/",
+            status,
+            {"Content-Type": "application/x-amz-json-1.1"},
+            _RawBody(json.dumps(body).encode()),
+        )
+
+    def _error(self, code: str, message: str) -> AWSResponse:
+        status = 500 if code == "InternalErrorException" else 400
+        return self._response(status, {"__type": code, "message": message})
+
+    def _tokens(self, username: str) -> dict:
+        return {
+            "AuthenticationResult": {
+                "AccessToken": f"access-{username}",
+                "IdToken": f"id-{username}",
+                "RefreshToken": f"refresh-{username}",
+                "TokenType": "Bearer",
+                "ExpiresIn": 3600,
+            }
+        }
+
+    def _AdminInitiateAuth(self, params: dict) -> AWSResponse:
+        username = params["AuthParameters"]["USERNAME"]
+        user = self.users.get(username)
+        if user is None:
+            return self._error("UserNotFoundException", "User does not exist.")
+        if user["password"] != params["AuthParameters"]["PASSWORD"]:
+            return self._error(
+                "NotAuthorizedException", "Incorrect username or password."
+            )
+        if user["status"] == "FORCE_CHANGE_PASSWORD":
+            return self._response(
+                200,
+                {
+                    "ChallengeName": "NEW_PASSWORD_REQUIRED",
+                    "Session": _session(username),
+                    "ChallengeParameters": {},
+                },
+            )
+        return self._response(200, self._tokens(username))
+
+    def _AdminRespondToAuthChallenge(self, params: dict) -> AWSResponse:
+        responses = params["ChallengeResponses"]
+        username = responses["USERNAME"]
+        if params["Session"] != _session(username):
+            return self._error("NotAuthorizedException", "Invalid session.")
+        if params["ChallengeName"] == "NEW_PASSWORD_REQUIRED":
+            self.users[username]["password"] = responses["NEW_PASSWORD"]
+            self.users[username]["status"] = "CONFIRMED"
+            return self._response(
+                200,
+                {
+                    "ChallengeName": "EMAIL_OTP",
+                    "Session": _session(username),
+                    "ChallengeParameters": {},
+                },
+            )
+        if responses["EMAIL_OTP_CODE"] != self.email_otp_code:
+            return self._error("CodeMismatchException", "Invalid code received.")
+        return self._response(200, self._tokens(username))
+
+    def _AdminSetUserPassword(self, params: dict) -> AWSResponse:
+        user = self.users.get(params["Username"])
+        if user is None:
+            return self._error("UserNotFoundException", "User does not exist.")
+        user["password"] = params["Password"]
+        user["status"] = "CONFIRMED" if params["Permanent"] else "FORCE_CHANGE_PASSWORD"
+        return self._response(200, {})
+
+    def _AdminGetUser(self, params: dict) -> AWSResponse:
+        user = self.users.get(params["Username"])
+        if user is None:
+            return self._error("UserNotFoundException", "User does not exist.")
+        return self._response(
+            200,
+            {
+                "Username": params["Username"],
+                "UserAttributes": [{"Name": "email", "Value": user["email"]}],
+                "UserStatus": user["status"],
+            },
+        )
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tuto.auth import auth_helper, cookie_codec
+
+DATA = {"at": "header.payload.signature", "exp": "3600", "user": "alice"}
+
+
+def configured_format(**env: str) -> subprocess.CompletedProcess[str]:
+    """Imports auth_helper with env as the only cookie settings"""
+    environ = {k: v for k, v in os.environ.items() if not k.startswith("AUTH_COOKIE_")}
+    return subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from tuto.auth import auth_helper; print(auth_helper.AUTH_COOKIE_FORMAT)",
+        ],
+        env={**environ, "PYTHONPATH": "src", **env},
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+
+def test_b1_requires_a_key() -> None:
+    result = configured_format(AUTH_COOKIE_FORMAT="b1")
+
+    assert result.returncode != 0
+    assert "AUTH_COOKIE_FORMAT=b1 requires AUTH_COOKIE_KEY" in result.stderr
+
+
+@pytest.mark.parametrize(
+    ("env", "expected"),
+    [
+        ({}, "gzip"),
+        ({"AUTH_COOKIE_KEY": "k" * 64}, "b1"),
+        ({"AUTH_COOKIE_KEY": "k" * 64, "AUTH_COOKIE_FORMAT": "gzip"}, "gzip"),
+    ],
+)
+def test_format_defaults_to_b1_with_a_key(env: dict, expected: str) -> None:
+    result = configured_format(**env)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == expected
+
+
+def test_b1_cookies_are_signed_with_the_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(auth_helper, "AUTH_COOKIE_FORMAT", "b1")
+    monkeypatch.setattr(auth_helper, "_cookie_key", cookie_codec.derive_key("k"))
+
+    cookie = auth_helper.encode_cookie_data(DATA)
+    assert cookie.startswith(cookie_codec.BINARY_PREFIX)
+    assert auth_helper.decode_cookie_data(cookie) == DATA
+
+    forged = cookie_codec.encode_binary(DATA, cookie_codec.derive_key("other"))
+    assert auth_helper.decode_cookie_data(forged) == {}
+
+
+def test_b1_cookies_are_rejected_without_a_key(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(auth_helper, "AUTH_COOKIE_FORMAT", "gzip")
+    monkeypatch.setattr(auth_helper, "_cookie_key", None)
+    # Signed with the SECRET_KEY constant, the fallback key before
+    forged = cookie_codec.encode_binary(
+        DATA, cookie_codec.derive_key(auth_helper.SECRET_KEY)
+    )
+
+    assert auth_helper.decode_cookie_data(forged) == {}
+    cookie = auth_helper.encode_cookie_data(DATA)
+    assert auth_helper.decode_cookie_data(cookie) == DATA
@@ -0,0 +1,198 @@
+import asyncio
+from collections.abc import Callable
+
+import pytest
+from fastapi import HTTPException
+
+from tests.auth.fake_cognito import FakeCognito
+from tuto.auth.aws_clients import AWS_MAX_ATTEMPTS
+from tuto.auth.cognito_protocol import CognitoAuthService
+from tuto.auth.exceptions import (
+    CodeMismatchError,
+    NotAuthorizedError,
+    UserNotFoundError,
+)
+from tuto.auth.protocol import Challenge, Token
+
+MakeService = Callable[..., CognitoAuthService]
+
+
+def test_signin_returns_tokens(
+    fake_cognito: FakeCognito, make_service: MakeService
+) -> None:
+    fake_cognito.add_user("alice", "Passw0rd!")
+    service = make_service()
+
+    token = asyncio.run(service.signin("alice", "Passw0rd!"))
+
+    assert isinstance(token, Token)
+    assert token.access_token == "access-alice"
+    assert token.refresh_token == "refresh-alice"
+    assert fake_cognito.requests == ["AdminInitiateAuth"]
+
+
+def test_signin_maps_modeled_exceptions(
+    fake_cognito: FakeCognito, make_service: MakeService
+) -> None:
+    fake_cognito.add_user("alice", "Passw0rd!")
+    service = make_service()
+
+    with pytest.raises(UserNotFoundError):
+        asyncio.run(service.signin("bob", "Passw0rd!"))
+    with pytest.raises(NotAuthorizedError):
+        asyncio.run(service.signin("alice", "wrong"))
+
+
+def test_new_password_and_email_otp_challenges(
+    fake_cognito: FakeCognito, make_service: MakeService
+) -> None:
+    fake_cognito.add_user("alice", "Temp0rary!", status="FORCE_CHANGE_PASSWORD")
+    service = make_service()
+
+    async def sign_in() -> Token:
+        challenge = await service.signin("alice", "Temp0rary!")
+        assert isinstance(challenge, Challenge)
+        assert challenge.challenge_name == "NEW_PASSWORD_REQUIRED"
+
+        challenge = await service.respond_to_new_password_challenge(
+            "alice", challenge.session, " N3wPassword! "
+        )
+        assert isinstance(challenge, Challenge)
+        assert challenge.challenge_name == "EMAIL_OTP"
+
+        with pytest.raises(CodeMismatchError):
+            await service.respond_to_email_otp_challenge(
+                "alice", challenge.session, "000000"
+            )
+        return await service.respond_to_email_otp_challenge(
+            "alice", challenge.session, fake_cognito.email_otp_code
+        )
+
+    token = asyncio.run(sign_in())
+
+    assert token.access_token == "access-alice"
+    assert fake_cognito.users["alice"]["password"] == "N3wPassword!"
+
+
+def test_new_password_challenge_with_bad_session_is_401(
+    fake_cognito: FakeCognito, make_service: MakeService
+) -> None:
+    fake_cognito.add_user("alice", "Temp0rary!", status="FORCE_CHANGE_PASSWORD")
+    service = make_service()
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(
+            service.respond_to_new_password_challenge(
+                "alice", "stale-session-0000000000", "N3w!"
+            )
+        )
+
+    assert excinfo.value.status_code == 401
+    assert excinfo.value.detail.startswith("NotAuthorizedException: ")
+
+
+def test_throttled_calls_are_retried(
+    fake_cognito: FakeCognito, make_service: MakeService, backoffs: list[float]
+) -> None:
+    fake_cognito.add_user("alice", "Passw0rd!")
+    fake_cognito.fail("AdminInitiateAuth", "TooManyRequestsException")
+    fake_cognito.fail("AdminInitiateAuth", "InternalErrorException")
+    service = make_service()
+
+    token = asyncio.run(service.signin("alice", "Passw0rd!"))
+
+    assert token.access_token == "access-alice"
+    assert fake_cognito.requests == ["AdminInitiateAuth"] * 3
+    assert len(backoffs) == 2
+
+
+def test_retries_stop_at_max_attempts(
+    fake_cognito: FakeCognito, make_service: MakeService
+) -> None:
+    fake_cognito.add_user("alice", "Passw0rd!")
+    fake_cognito.fail("AdminInitiateAuth", *["TooManyRequestsException"] * 10)
+    service = make_service()
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(service.signin("alice", "Passw0rd!"))
+
+    assert excinfo.value.status_code == 500
+    assert fake_cognito.requests == ["AdminInitiateAuth"] * AWS_MAX_ATTEMPTS
+
+
+def test_modeled_client_errors_are_not_retried(
+    fake_cognito: FakeCognito, make_service: MakeService, backoffs: list[float]
+) -> None:
+    fake_cognito.add_user("alice", "Passw0rd!")
+    service = make_service()
+
+    with pytest.raises(NotAuthorizedError):
+        asyncio.run(service.signin("alice", "wrong"))
+
+    assert fake_cognito.requests == ["AdminInitiateAuth"]
+    assert backoffs == []
+
+
+def test_call_timeout_is_503(
+    fake_cognito: FakeCognito, make_service: MakeService
+) -> None:
+    fake_cognito.add_user("alice", "Passw0rd!")
+    fake_cognito.block()
+    service = make_service(timeout=0.1)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(service.signin("alice", "Passw0rd!"))
+
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "1"}
+
+
+def test_timed_out_call_keeps_its_slot(
+    fake_cognito: FakeCognito, make_service: MakeService
+) -> None:
+    fake_cognito.add_user("alice", "Passw0rd!")
+    service = make_service(max_concurrency=1, timeout=0.1)
+
+    async def sign_in_twice() -> Token:
+        fake_cognito.block()
+        with pytest.raises(HTTPException) as first:
+            await service.signin("alice", "Passw0rd!")
+        assert first.value.status_code == 503
+
+        # The blocked request still runs, so the next call cannot get the slot
+        with pytest.raises(HTTPException) as second:
+            await service.signin("alice", "Passw0rd!")
+        assert second.value.status_code == 503
+        assert fake_cognito.requests == ["AdminInitiateAuth"]
+
+        fake_cognito.release()
+        return await service.signin("alice", "Passw0rd!")
+
+    token = asyncio.run(sign_in_twice())
+
+    assert token.access_token == "access-alice"
+
+
+def test_forgot_password_runs_each_call_through_the_gateway(
+    fake_cognito: FakeCognito,
+    make_service: MakeService,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    sent: list[tuple[str, str, str]] = []
+    monkeypatch.setattr(
+        "tuto.auth.utils.email_sender.send_temporary_password_email",
+        lambda email, username, password: (
+            sent.append((email, username, password)) or "message-id"
+        ),
+    )
+    fake_cognito.add_user("alice", "Passw0rd!")
+    service = make_service()
+
+    result = asyncio.run(service.forgot_password("alice", "alice@example.com"))
+
+    assert result["delivery"]["Destination"] == "al***@***.com"
+    assert fake_cognito.requests == ["AdminSetUserPassword", "AdminGetUser"]
+    assert fake_cognito.users["alice"]["status"] == "FORCE_CHANGE_PASSWORD"
+    assert sent == [
+        ("alice@example.com", "alice", fake_cognito.users["alice"]["password"])
+    ]
@@ -0,0 +1,13 @@
+from pathlib import Path
+
+import pytest
+
+from tests.user_db import UserDatabase
+from tuto.core.finder import count_cache
+
+
+@pytest.fixture
+def user_db(tmp_path: Path) -> UserDatabase:
+    """An empty user table, with no counts cached from other tests"""
+    count_cache.clear()
+    return UserDatabase(tmp_path / "tuto.sqlite3")
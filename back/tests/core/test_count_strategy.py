@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+from sqlalchemy import TextClause
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tests.user_db import UserDatabase
+from tuto.core import finder
+from tuto.core.finder import (
+    CountStrategy,
+    PaginationResult,
+    estimate_count,
+    invalidate_counts,
+)
+from tuto.core.user import finder as user_finder
+from tuto.core.user.finder import UserFinder
+
+BY_ID = ["id", "ASC"]
+FILTERED = {"username_prefix": "user"}
+
+
+@pytest.fixture
+def users(user_db: UserDatabase) -> UserDatabase:
+    for i in range(3):
+        user_db.add(f"user{i}")
+    user_db.add("deleted", deleted=True)
+    return user_db
+
+
+@pytest.fixture
+def exact_counts(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """COUNT queries run by the finders"""
+    counted: list[str] = []
+
+    async def count_exact(
+        asession: AsyncSession, statement: TextClause, params: dict
+    ) -> int:
+        counted.append(statement.text)
+        return await original(asession, statement, params)
+
+    original = finder.count_exact
+    monkeypatch.setattr(finder, "count_exact", count_exact)
+    monkeypatch.setattr(user_finder, "count_exact", count_exact)
+    return counted
+
+
+@pytest.fixture
+def statistics(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Tables whose statistics were read, which report 100 rows"""
+    read: list[str] = []
+
+    async def estimate(asession: AsyncSession, table: str) -> int:
+        read.append(table)
+        return await asyncio.sleep(0, result=100)
+
+    monkeypatch.setattr(finder, "estimate_count", estimate)
+    return read
+
+
+def find(
+    user_db: UserDatabase, criteria: dict | None = None, **kwargs: object
+) -> PaginationResult:
+    async def run() -> PaginationResult:
+        async with user_db.session() as session:
+            return await UserFinder(session).find(criteria or {}, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_exact_counts_every_time(users: UserDatabase, exact_counts: list[str]) -> None:
+    strategy = CountStrategy.EXACT
+
+    assert find(users, count_strategy=strategy).total == 3
+    users.add("user3")
+    assert find(users, count_strategy=strategy).total == 4
+    assert len(exact_counts) == 2
+
+
+def test_cached_count_lasts_until_a_write(
+    users: UserDatabase, exact_counts: list[str]
+) -> None:
+    strategy = CountStrategy.CACHED
+
+    assert find(users, count_strategy=strategy).total == 3
+    assert find(users, FILTERED, count_strategy=strategy).total == 3
+    users.add("user3")
+    # Written behind the finder's back, so the cached counts are served
+    assert find(users, count_strategy=strategy).total == 3
+    assert find(users, FILTERED, count_strategy=strategy).total == 3
+    assert len(exact_counts) == 2
+
+    invalidate_counts("user")
+    result = find(users, count_strategy=strategy)
+    assert (result.total, result.total_is_estimate) == (4, False)
+    assert len(exact_counts) == 3
+
+
+def test_estimated_count_reads_the_statistics(
+    users: UserDatabase, statistics: list[str], exact_counts: list[str]
+) -> None:
+    result = find(
+        users, sort=BY_ID, query_range=[0, 1], count_strategy=CountStrategy.ESTIMATED
+    )
+
+    assert (result.total, result.total_is_estimate) == (100, True)
+    assert (result.start, result.end) == (0, 1)
+    assert result.next_cursor is not None
+    assert statistics == ["user"]
+    assert exact_counts == []
+
+    # A short page ends the result, whatever the estimate says
+    result = find(
+        users, sort=BY_ID, query_range=[2, 3], count_strategy=CountStrategy.ESTIMATED
+    )
+    assert len(result.data) == 1
+    assert result.next_cursor is None
+
+
+def test_estimated_count_of_a_filter_is_cached(
+    users: UserDatabase, statistics: list[str], exact_counts: list[str]
+) -> None:
+    strategy = CountStrategy.ESTIMATED
+
+    for _ in range(2):
+        result = find(users, FILTERED, count_strategy=strategy)
+        assert (result.total, result.total_is_estimate) == (3, False)
+
+    assert statistics == []
+    assert len(exact_counts) == 1
+
+
+def test_estimated_count_without_statistics_is_cached(
+    users: UserDatabase, exact_counts: list[str]
+) -> None:
+    async def estimate() -> int | None:
+        async with users.session() as session:
+            return await estimate_count(session, "user")
+
+    # SQLite has no table statistics
+    assert asyncio.run(estimate()) is None
+    for _ in range(2):
+        result = find(users, count_strategy=CountStrategy.ESTIMATED)
+        assert (result.total, result.total_is_estimate) == (3, False)
+    assert len(exact_counts) == 1
+
+
+def test_window_count_comes_with_the_page(
+    users: UserDatabase, exact_counts: list[str]
+) -> None:
+    strategy = CountStrategy.WINDOW
+
+    result = find(users, sort=BY_ID, query_range=[0, 1], count_strategy=strategy)
+    assert [row.id for row in result.data] == [1, 2]
+    assert (result.total, result.total_is_estimate) == (3, False)
+    assert result.next_cursor is not None
+
+    result = find(users, FILTERED, sort=BY_ID, count_strategy=strategy)
+    assert (len(result.data), result.total) == (3, 3)
+    assert result.next_cursor is None
+    assert exact_counts == []
+
+
+def test_window_count_of_an_empty_page(
+    users: UserDatabase, exact_counts: list[str]
+) -> None:
+    strategy = CountStrategy.WINDOW
+
+    # Past the end no row carries the count, which is then run on its own
+    result = find(users, sort=BY_ID, query_range=[5, 9], count_strategy=strategy)
+    assert (result.data, result.total) == ([], 3)
+    assert len(exact_counts) == 1
+
+    # Nothing matches from the first row on, so there is nothing to count
+    result = find(users, {"username": "nobody"}, count_strategy=strategy)
+    assert (result.data, result.total) == ([], 0)
+    assert len(exact_counts) == 1
+
+
+def test_window_count_with_a_cursor_is_cached(
+    users: UserDatabase, exact_counts: list[str]
+) -> None:
+    page = {"sort": BY_ID, "query_range": [0, 1]}
+    first = find(users, **page, count_strategy=CountStrategy.WINDOW)
+
+    # The window would only count the rows after the cursor
+    for _ in range(2):
+        result = find(
+            users, **page, cursor=first.next_cursor, count_strategy=CountStrategy.WINDOW
+        )
+        assert ([row.id for row in result.data], result.total) == ([3], 3)
+    assert len(exact_counts) == 1
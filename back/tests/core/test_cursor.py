@@ -0,0 +1,124 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from tests.user_db import UserDatabase
+from tuto.core.finder import (
+    Cursor,
+    InvalidCursorError,
+    InvalidQueryError,
+    PaginationResult,
+    SortKey,
+    seek_condition,
+)
+from tuto.core.user.finder import UserFinder
+
+BY_ID = ["id", "ASC"]
+
+
+def encode(payload: object) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def find(user_db: UserDatabase, **kwargs: object) -> PaginationResult:
+    async def run() -> PaginationResult:
+        async with user_db.session() as session:
+            return await UserFinder(session).find({}, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_cursor_round_trip() -> None:
+    cursor = Cursor(("alice", 3), 10, backward=True)
+
+    encoded = cursor.encode()
+
+    assert "=" not in encoded
+    assert Cursor.decode(encoded) == cursor
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "not a cursor",
+        encode({"keys": [1]}),
+        encode([[1], "ten", False]),
+        encode([[1], 10]),
+    ],
+)
+def test_tampered_cursor_is_rejected(value: str) -> None:
+    with pytest.raises(InvalidCursorError):
+        Cursor.decode(value)
+
+
+def test_cursor_of_another_sort_order_is_rejected(user_db: UserDatabase) -> None:
+    user_db.add("user0")
+    cursor = Cursor(("user0", 1), 1).encode()
+
+    # A client error, answered with 400 like the other invalid queries
+    with pytest.raises(InvalidQueryError):
+        find(user_db, sort=BY_ID, cursor=cursor)
+
+
+def test_seek_condition() -> None:
+    id_key = SortKey("id", "u.id")
+    name_key = SortKey("username", "u.username")
+    newest_key = SortKey("created_at", "u.created_at", descending=True)
+
+    assert seek_condition([id_key]) == ("u.id > :cursor_0", ["cursor_0"])
+    assert seek_condition([id_key], backward=True)[0] == "u.id < :cursor_0"
+    assert seek_condition([name_key, id_key])[0] == (
+        "(u.username, u.id) > (:cursor_0, :cursor_1)"
+    )
+    # Mixed directions cannot use a row value comparison
+    assert seek_condition([newest_key, id_key]) == (
+        "((u.created_at < :cursor_0)"
+        " OR (u.created_at = :cursor_0 AND u.id > :cursor_1))",
+        ["cursor_0", "cursor_1"],
+    )
+    assert seek_condition([newest_key, id_key], backward=True)[0] == (
+        "((u.created_at > :cursor_0)"
+        " OR (u.created_at = :cursor_0 AND u.id < :cursor_1))"
+    )
+
+
+def test_paging_forward_and_backward(user_db: UserDatabase) -> None:
+    for i in range(5):
+        user_db.add(f"user{i}")
+    page = {"sort": BY_ID, "query_range": [0, 1]}
+
+    first = find(user_db, **page)
+    second = find(user_db, **page, cursor=first.next_cursor)
+    last = find(user_db, **page, cursor=second.next_cursor)
+
+    assert [row.id for row in first.data] == [1, 2]
+    assert [row.id for row in second.data] == [3, 4]
+    assert [row.id for row in last.data] == [5]
+    assert (last.start, last.end, last.total) == (4, 4, 5)
+    assert last.next_cursor is None
+
+    back = find(user_db, **page, cursor=last.prev_cursor)
+    assert [row.id for row in back.data] == [3, 4]
+    assert (back.start, back.end) == (2, 3)
+
+    back = find(user_db, **page, cursor=back.prev_cursor)
+    assert [row.id for row in back.data] == [1, 2]
+    assert (back.start, back.end) == (0, 1)
+    assert back.prev_cursor is None
+    assert back.next_cursor is not None
+
+
+def test_empty_page_range_does_not_end_before_it_starts(
+    user_db: UserDatabase,
+) -> None:
+    for i in range(5):
+        user_db.add(f"user{i}")
+
+    # The rows after the cursor were deleted since it was issued
+    result = find(user_db, sort=BY_ID, cursor=Cursor((5,), 5).encode())
+
+    assert result.data == []
+    assert (result.start, result.end, result.total) == (5, 5, 5)
+    assert result.next_cursor is None
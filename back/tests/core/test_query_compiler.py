@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from tests.user_db import UserDatabase
+from tuto.core.finder import (
+    EQUALITY_OPERATORS,
+    RANGE_OPERATORS,
+    FilterField,
+    InvalidQueryError,
+    PaginationResult,
+    QueryCompiler,
+    SortField,
+    SortKey,
+    to_datetime,
+)
+from tuto.core.user.finder import UserFinder
+
+
+@pytest.fixture
+def compiler() -> QueryCompiler:
+    """Sorts on columns that are not unique, unlike UserFinder's"""
+    return QueryCompiler(
+        filters={
+            "id": FilterField("u.id", EQUALITY_OPERATORS, int),
+            "username": FilterField("u.username", EQUALITY_OPERATORS | {"prefix"}),
+            "nickname": FilterField("u.nickname", frozenset({"eq"})),
+            "created_at": FilterField("u.created_at", RANGE_OPERATORS, to_datetime),
+        },
+        sorts={
+            "id": SortField("u.id", unique=True),
+            "username": SortField("u.username", unique=True),
+            "nickname": SortField("u.nickname"),
+            "created_at": SortField("u.created_at"),
+        },
+        default_sort=[("created_at", True)],
+    )
+
+
+def sort_keys(compiler: QueryCompiler, sort: list | None) -> list[SortKey]:
+    plan, _ = compiler.compile({}, sort)
+    return list(plan.sort_keys)
+
+
+def test_sort_keys_end_with_a_unique_field(compiler: QueryCompiler) -> None:
+    nickname = SortKey("nickname", "u.nickname")
+    newest = SortKey("created_at", "u.created_at", descending=True)
+
+    assert sort_keys(compiler, ["nickname", "ASC", "created_at", "DESC"]) == [
+        nickname,
+        newest,
+        SortKey("id", "u.id", descending=True),
+    ]
+    assert sort_keys(compiler, [["nickname", "ASC"], ["username", "DESC"]]) == [
+        nickname,
+        SortKey("username", "u.username", descending=True),
+    ]
+    # Keys after a unique one cannot change the order
+    assert sort_keys(compiler, ["username", "ASC", "nickname", "ASC"]) == [
+        SortKey("username", "u.username")
+    ]
+    assert sort_keys(compiler, ["nickname", "ASC", "nickname", "DESC"]) == [
+        nickname,
+        SortKey("id", "u.id"),
+    ]
+
+
+def test_unsortable_fields_fall_back_to_the_default(compiler: QueryCompiler) -> None:
+    default = [
+        SortKey("created_at", "u.created_at", descending=True),
+        SortKey("id", "u.id", descending=True),
+    ]
+
+    assert sort_keys(compiler, None) == default
+    assert sort_keys(compiler, ["email", "ASC"]) == default
+    with pytest.raises(InvalidQueryError, match="Invalid sort order"):
+        compiler.compile({}, ["nickname", "UP"])
+
+
+@pytest.mark.parametrize(
+    ("criteria", "message"),
+    [
+        ({"email": "a@example.com"}, "Unknown filter: email"),
+        ({"nickname_prefix": "a"}, "Unsupported filter: nickname_prefix"),
+        ({"nickname": ["a", "b"]}, "Unsupported filter: nickname"),
+        ({"id_gte": 1}, "Unsupported filter: id_gte"),
+        ({"id": [1], "id_in": [2]}, "Duplicate filter: id_in"),
+        ({"created_at_gte": "yesterday"}, "Invalid value for filter created_at"),
+    ],
+)
+def test_invalid_filters_are_rejected(
+    compiler: QueryCompiler, criteria: dict, message: str
+) -> None:
+    with pytest.raises(InvalidQueryError, match=message):
+        compiler.compile(criteria)
+
+
+def test_prefix_escapes_like_wildcards(compiler: QueryCompiler) -> None:
+    plan, params = compiler.compile({"username_prefix": "50%_off!"})
+
+    assert plan.where == " AND u.username LIKE :filter_username_prefix ESCAPE '!'"
+    assert params == {"filter_username_prefix": "50!%!_off!!%"}
+
+
+def test_plans_are_reused_for_the_same_shape(compiler: QueryCompiler) -> None:
+    sort = ["nickname", "DESC"]
+
+    plan, params = compiler.compile({"id": [1, 2], "username": "a"}, sort)
+    same, other_params = compiler.compile({"username": "b", "id": [3]}, sort)
+
+    assert same is plan
+    assert plan.expanding == ("filter_id_in",)
+    assert params == {"filter_id_in": [1, 2], "filter_username_eq": "a"}
+    assert other_params == {"filter_id_in": [3], "filter_username_eq": "b"}
+    assert compiler._plan.cache_info().hits == 1
+
+    assert compiler.compile({"id": 1}, sort)[0] is not plan
+    assert compiler.compile({"id": [1, 2], "username": "a"})[0] is not plan
+
+
+def test_cursor_pages_through_ties(
+    compiler: QueryCompiler, user_db: UserDatabase, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(UserFinder, "query_compiler", compiler)
+    for i in range(7):
+        user_db.add(f"user{i}", nickname=f"nick{i % 2}")
+    page = {"sort": ["nickname", "DESC"], "query_range": [0, 2]}
+
+    async def pages() -> list[PaginationResult]:
+        async with user_db.session() as session:
+            finder = UserFinder(session)
+            results = [await finder.find({}, **page)]
+            while results[-1].next_cursor:
+                cursor = results[-1].next_cursor
+                results.append(await finder.find({}, **page, cursor=cursor))
+            cursor = results[-1].prev_cursor
+            results.append(await finder.find({}, **page, cursor=cursor))
+            return results
+
+    results = asyncio.run(pages())
+
+    # nick1 then nick0, ids descending within the same nickname
+    assert [[row.id for row in result.data] for result in results] == [
+        [6, 4, 2],
+        [7, 5, 3],
+        [1],
+        [7, 5, 3],
+    ]
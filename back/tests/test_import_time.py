@@ -0,0 +1,10 @@
+import pytest
+from check_import_time import LAZY_MODULES, measure
+
+
+@pytest.mark.parametrize("module", ["tuto.api.app"])
+def test_heavy_dependencies_are_imported_lazily(module: str) -> None:
+    imported = {name for _, _, name in measure(module)}
+
+    assert module in imported
+    assert [name for name in LAZY_MODULES if name in imported] == []
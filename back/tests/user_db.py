@@ -0,0 +1,86 @@
+import contextlib
+import sqlite3
+from collections.abc import AsyncGenerator
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+# The user table as migrated, in SQLite types (create_all cannot map the MySQL
+# TINYINT columns)
+USER_DDL = """
+    CREATE TABLE user (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE,
+        email TEXT NOT NULL UNIQUE,
+        nickname TEXT NOT NULL,
+        is_active INTEGER NOT NULL DEFAULT 1,
+        auth_method TEXT NOT NULL DEFAULT 'local',
+        password_is_temporary INTEGER NOT NULL DEFAULT 0,
+        password_expires_at DATETIME,
+        hashed_password TEXT,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME NOT NULL,
+        deleted_at DATETIME
+    )
+"""
+USER_INDEX_DDL = (
+    "CREATE INDEX ix_user_updated_at_deleted_at ON user (updated_at, deleted_at)"
+)
+
+CREATED_AT = datetime(2024, 1, 1)
+
+
+class UserDatabase:
+    """
+    A SQLite file with the user table, written synchronously by the tests and
+    read through aiosqlite sessions, one engine per event loop.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.url = f"sqlite+aiosqlite:///{path}"
+        with self._connect() as connection:
+            connection.execute(USER_DDL)
+            connection.execute(USER_INDEX_DDL)
+
+    def _connect(self) -> contextlib.closing[sqlite3.Connection]:
+        return contextlib.closing(sqlite3.connect(self.path, autocommit=True))
+
+    def add(self, username: str, deleted: bool = False, **columns: object) -> int:
+        """ユーザを追加して id を返す (作成日時は id 順に 1 分ずつずらす)"""
+        with self._connect() as connection:
+            (count,) = connection.execute("SELECT COUNT(1) FROM user").fetchone()
+            created_at = CREATED_AT + timedelta(minutes=count)
+            values = {
+                "username": username,
+                "email": f"{username}@example.com",
+                "nickname": username,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "deleted_at": created_at if deleted else None,
+                **columns,
+            }
+            cursor = connection.execute(
+                f"INSERT INTO user ({', '.join(values)}) "
+                f"VALUES ({', '.join('?' * len(values))})",
+                [
+                    value.isoformat(" ") if isinstance(value, datetime) else value
+                    for value in values.values()
+                ],
+            )
+            return cursor.lastrowid
+
+    def execute(self, sql: str, *params: object) -> None:
+        with self._connect() as connection:
+            connection.execute(sql, params)
+
+    @contextlib.asynccontextmanager
+    async def session(self) -> AsyncGenerator[AsyncSession]:
+        engine = create_async_engine(self.url, poolclass=NullPool)
+        try:
+            async with AsyncSession(engine) as session:
+                yield session
+        finally:
+            await engine.dispose()
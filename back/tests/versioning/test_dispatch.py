@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from tuto.versioning.dispatch import _Bucket
+
+
+def make_bucket() -> _Bucket:
+    bucket = _Bucket()
+    bucket.add(0, SimpleNamespace(methods={"GET"}, api_version="0.1"))
+    bucket.add(1, SimpleNamespace(methods={"GET"}, api_version="0.2"))
+    bucket.add(2, SimpleNamespace(methods={"POST"}))
+    bucket.add(3, SimpleNamespace(methods=None))
+    return bucket
+
+
+def test_full_candidates() -> None:
+    bucket = make_bucket()
+
+    def candidates(method: str, **scope: str) -> list[int]:
+        return bucket.full_candidates({"type": "http", "method": method, **scope})
+
+    assert candidates("GET") == [0, 1, 3]
+    assert candidates("GET", requested_version="0.2") == [1, 3]
+    assert candidates("POST", requested_version="0.2") == [2, 3]
+    assert candidates("BREW", requested_version="0.2") == [3]
+    assert bucket.full_candidates({"type": "websocket"}) == [3]
+
+
+def test_full_candidates_caches_declared_methods_and_versions_only() -> None:
+    bucket = make_bucket()
+
+    for i in range(100):
+        scope = {"type": "http", "method": f"M{i}", "requested_version": f"9.{i}"}
+        assert bucket.full_candidates(scope) == [3]
+        scope = {"type": "http", "method": "GET", "requested_version": f"9.{i}"}
+        assert bucket.full_candidates(scope) == [3]
+    bucket.full_candidates({"type": "http", "method": "GET"})
+    bucket.full_candidates(
+        {"type": "http", "method": "GET", "requested_version": "0.1"}
+    )
+
+    assert set(bucket._full) == {("GET", False, None), ("GET", True, "0.1")}
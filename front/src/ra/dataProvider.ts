@@ -33,7 +33,8 @@ const baseDataProvider = {
       credentials: 'include'
     }).then(({ headers, json }) => ({
       data: json["data"],
-      total: parseInt(headers.get('content-range')!.split('/').pop()!, 10),
+      // "~" marks an approximate total
+      total: parseInt(headers.get('content-range')!.split('/').pop()!.replace(/^~/, ''), 10),
     }));
   },
   // @ts-ignore